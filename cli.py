@@ -1,16 +1,26 @@
 from datetime import datetime
 from typing import List, Optional, Tuple
 
+from graph import Graph
 from routing import (
-    load_default_graph,
-    find_route,
     resolve_stop,
     parse_time_to_minutes,
     minutes_to_hhmm,
     find_nearest_stop,
 )
 from geocoding import geocode_address
-from osm_routing import find_osm_route, RouteNotFoundError
+from intermodal import find_intermodal_route, load_walk_network
+from transfers import compute_footpaths
+from snapshot import TimetableStore
+from route_cache import RouteCache
+from osm_routing import RouteNotFoundError
+from multimodal_network import (
+    compare_modes,
+    find_multimodal_route,
+    load_multimodal_network,
+)
+from pipeline import QueryPipeline
+from departures import format_departure, next_departures
 from visualization_osmnx import save_route_map, save_coords_map
 
 
@@ -49,22 +59,101 @@ def classify_query(query: str, stop_names: List[str]) -> Tuple[Optional[str], Op
     coords = geocode_address(query)
     return None, coords
 
+
+def resolve_coords(
+    query: str, graph: Graph, stop_names: List[str]
+) -> Tuple[float, float]:
+    """Return the coordinates of a stop name or address (see ``classify_query``)."""
+    stop, coords = classify_query(query, stop_names)
+    if stop is not None:
+        node = graph.nodes.get(stop)
+        if not node or node.lat is None or node.lon is None:
+            raise ValueError(f"No coordinates for stop '{stop}'")
+        coords = (node.lat, node.lon)
+    return coords
+
+
+def _print_transit_path(path: List[Tuple]) -> None:
+    print("Found path:")
+    start_stop_name = path[0][0]
+    print(f"Start at {start_stop_name}")
+    for step in path[1:]:
+        if len(step) == 3:
+            stop, line, arr = step
+            line_str = line if line is not None else "start"
+            arrival = minutes_to_hhmm(arr, show_day=True)
+            print(f"Take {line_str} to {stop} arriving at {arrival}")
+        else:
+            stop, line = step
+            line_str = line if line is not None else "start"
+            print(f"Take {line_str} to {stop}")
+
+
+def _map_saved(filename: str, seconds: float) -> None:
+    print(f"Map saved to {filename} ({seconds:.2f} s)")
+
+
+def _map_failed(exc: Exception) -> None:
+    print(f"Writing the map failed: {exc}")
+
+
 def run_cli(network_type: str = "drive") -> None:
     """Interactive command line interface for different routing modes."""
 
-    graph = load_default_graph()
-    stop_names = list(graph.nodes.keys())
+    store = TimetableStore.from_default(prepare=compute_footpaths)
+    store.watch()
+    route_cache = RouteCache()
+    pipeline = QueryPipeline()
 
     while True:
+        # keep one snapshot for the whole query, reloads swap in the next one
+        graph = store.graph
+        stop_names = list(graph.nodes.keys())
+
         mode = input(
-            "Verkehrsmittel [auto/rad/fuss/bahn] ('exit' zum Beenden): "
+            "Verkehrsmittel [auto/rad/fuss/vergleich/bahn/tuer/abfahrten] ('exit' zum Beenden): "
         ).strip().lower()
         if mode == "exit":
             break
-        if mode not in {"auto", "rad", "fuss", "bahn"}:
+        if mode not in {"auto", "rad", "fuss", "vergleich", "bahn", "tuer", "abfahrten"}:
             print("Ungültige Wahl.")
             continue
 
+        if mode == "abfahrten":
+            stop_query = input("Haltestelle ('reset'/'exit'): ").strip()
+            if stop_query.lower() == "exit":
+                break
+            if stop_query.lower() == "reset":
+                continue
+            stop = resolve_stop(stop_query, stop_names, cutoff=0.85)
+            if not stop:
+                stop = resolve_stop(stop_query, stop_names, cutoff=0.6)
+            if not stop:
+                print(f"Unbekannte Haltestelle '{stop_query}'")
+                continue
+            time_str = input("Ab (HH:MM, Enter = jetzt, 'reset'/'exit'): ").strip()
+            if time_str.lower() == "exit":
+                break
+            if time_str.lower() == "reset":
+                continue
+            now = datetime.now()
+            if time_str:
+                try:
+                    after = parse_time_to_minutes(time_str)
+                except ValueError as exc:
+                    print(f"Ungültige Zeitangabe: {exc}")
+                    continue
+            else:
+                after = now.hour * 60 + now.minute + now.second / 60.0
+            departures = next_departures(graph, stop, after, date=now.date())
+            if not departures:
+                print(f"Keine Abfahrten ab {stop}.")
+                continue
+            print(f"Abfahrten ab {stop}:")
+            for departure in departures:
+                print("  " + format_departure(departure))
+            continue
+
         if mode == "bahn":
             start_query = input("Start-Haltestelle ('reset'/'exit'): ").strip()
             if start_query.lower() == "exit":
@@ -133,32 +222,47 @@ def run_cli(network_type: str = "drive") -> None:
             if choice == "reset":
                 continue
 
-            path = find_route(
-                graph,
-                start_stop,
-                goal_stop,
-                start_minutes,
-                reverse=reverse,
-                sort_by=choice,
-            )
-
-            if path:
-                print("Found path:")
-                start_stop_name = path[0][0]
-                print(f"Start at {start_stop_name}")
-                for step in path[1:]:
-                    if len(step) == 3:
-                        stop, line, arr = step
-                        line_str = line if line is not None else "start"
-                        print(f"Take {line_str} to {stop} arriving at {minutes_to_hhmm(arr)}")
-                    else:
-                        stop, line = step
-                        line_str = line if line is not None else "start"
-                        print(f"Take {line_str} to {stop}")
-
-                filename = save_route_map(graph, path, network_type="walk")
-                if filename:
-                    print(f"Map saved to {filename}")
+            alt_str = input("Anzahl Alternativen (Enter = 1, 'reset'/'exit'): ").strip().lower()
+            if alt_str == "exit":
+                break
+            if alt_str == "reset":
+                continue
+            alternatives = int(alt_str) if alt_str.isdigit() else 1
+
+            # alternatives come from one multi-label search and bypass the cache
+            extra = {"k": alternatives} if alternatives > 1 else {}
+            pipeline.begin()
+            with pipeline.stage("Route"):
+                paths = route_cache.find_route(
+                    graph,
+                    start_stop,
+                    goal_stop,
+                    start_minutes,
+                    reverse=reverse,
+                    sort_by=choice,
+                    date=datetime.now().date(),
+                    days=2,
+                    **extra,
+                )
+            if alternatives <= 1:
+                paths = [paths] if paths else []
+
+            if paths:
+                path = paths[0]
+                for number, alternative in enumerate(paths, 1):
+                    if len(paths) > 1:
+                        print(f"Alternative {number}:")
+                    _print_transit_path(alternative)
+
+                print(pipeline.report())
+                pipeline.write_map(
+                    save_route_map,
+                    graph,
+                    path,
+                    network_type="walk",
+                    on_done=_map_saved,
+                    on_error=_map_failed,
+                )
             else:
                 print("No path found.")
             continue
@@ -175,51 +279,103 @@ def run_cli(network_type: str = "drive") -> None:
         if goal_query.lower() == "reset":
             continue
 
-        if mode in {"auto", "rad", "fuss"}:
-            try:
-                start_coords = geocode_address(start_query)
-            except Exception as exc:
-                print(f"Failed to geocode '{start_query}': {exc}")
-                continue
+        pipeline.begin()
+        road_mode = mode in {"auto", "rad", "fuss", "vergleich"}
+        walk_futures = {}
 
-            try:
-                goal_coords = geocode_address(goal_query)
-            except Exception as exc:
-                print(f"Failed to geocode '{goal_query}': {exc}")
-                continue
+        if road_mode:
+            resolve = geocode_address
+            on_resolved = None
         else:
-            try:
-                start, start_coords = classify_query(start_query, stop_names)
-            except Exception as exc:
-                print(f"Failed to resolve '{start_query}': {exc}")
+            def resolve(query: str) -> Tuple[float, float]:
+                return resolve_coords(query, graph, stop_names)
+
+            def on_resolved(index: int, coords: Tuple[float, float]) -> None:
+                # fetch the walk network around this side while the other resolves
+                walk_futures[index] = pipeline.submit(load_walk_network, coords, 1000)
+
+        futures = pipeline.resolve_pair(resolve, start_query, goal_query, on_resolved)
+        verb = "geocode" if road_mode else "resolve"
+        try:
+            start_coords = futures[0].result()
+        except Exception as exc:
+            print(f"Failed to {verb} '{start_query}': {exc}")
+            continue
+        try:
+            goal_coords = futures[1].result()
+        except Exception as exc:
+            print(f"Failed to {verb} '{goal_query}': {exc}")
+            continue
+
+        if mode == "tuer":
+            walk_networks = []
+            with pipeline.stage("Netz"):
+                for index in (0, 1):
+                    try:
+                        walk_networks.append(walk_futures[index].result())
+                    except Exception as exc:
+                        print(f"Walk network unavailable ({exc}); using straight-line distances")
+                        walk_networks.append(None)
+
+            now = datetime.now()
+            start_minutes = now.hour * 60 + now.minute + now.second / 60.0
+            with pipeline.stage("Route"):
+                path, route_graph = find_intermodal_route(
+                    graph,
+                    start_coords,
+                    goal_coords,
+                    start_minutes,
+                    date=now.date(),
+                    start_walk_network=walk_networks[0],
+                    goal_walk_network=walk_networks[1],
+                )
+            if not path:
+                print("No path found.")
                 continue
 
+            _print_transit_path(path)
+            print(pipeline.report())
+
+            pipeline.write_map(
+                save_route_map,
+                route_graph,
+                path,
+                network_type="walk",
+                on_done=_map_saved,
+                on_error=_map_failed,
+            )
+            continue
+
+        with pipeline.stage("Netz"):
             try:
-                goal, goal_coords = classify_query(goal_query, stop_names)
+                load_multimodal_network(start_coords, goal_coords)
             except Exception as exc:
-                print(f"Failed to resolve '{goal_query}': {exc}")
+                print(f"Loading the road network failed: {exc}")
                 continue
 
-            if start is not None:
-                node = graph.nodes.get(start)
-                if not node or node.lat is None or node.lon is None:
-                    print(f"No coordinates for stop '{start}'")
-                    continue
-                start_coords = (node.lat, node.lon)
-
-            if goal is not None:
-                node = graph.nodes.get(goal)
-                if not node or node.lat is None or node.lon is None:
-                    print(f"No coordinates for stop '{goal}'")
+        nt_map = {"auto": "drive", "rad": "bike", "fuss": "walk"}
+        if mode == "vergleich":
+            # one shared network, one search per mode
+            now = datetime.now()
+            start_minutes = now.hour * 60 + now.minute + now.second / 60.0
+            with pipeline.stage("Route"):
+                results = compare_modes(start_coords, goal_coords)
+            for name, result in results.items():
+                label = next(k for k, v in nt_map.items() if v == name)
+                if result is None:
+                    print(f"{label}: keine Route")
                     continue
-                goal_coords = (node.lat, node.lon)
+                arrival = start_minutes + result[1]
+                print(f"{label}: {result[1]:.0f} min, Ankunft {minutes_to_hhmm(arrival)}")
+            print(pipeline.report())
+            continue
 
-        nt_map = {"auto": "drive", "rad": "bike", "fuss": "walk"}
         nt = nt_map[mode]
         try:
-            coords_path, travel_time = find_osm_route(
-                start_coords, goal_coords, network_type=nt
-            )
+            with pipeline.stage("Route"):
+                coords_path, travel_time = find_multimodal_route(
+                    start_coords, goal_coords, network_type=nt
+                )
         except RouteNotFoundError as exc:
             print(exc)
             continue
@@ -232,10 +388,14 @@ def run_cli(network_type: str = "drive") -> None:
         start_minutes = now.hour * 60 + now.minute + now.second / 60.0
         arrival = start_minutes + travel_time
         print(f"Estimated arrival: {minutes_to_hhmm(arrival)}")
+        print(pipeline.report())
+
+        pipeline.write_map(
+            save_coords_map, coords_path, network_type=nt, on_done=_map_saved, on_error=_map_failed
+        )
 
-        filename = save_coords_map(coords_path, network_type=nt)
-        if filename:
-            print(f"Map saved to {filename}")
+    pipeline.close()
+    store.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,150 @@
+"""Departure boards: the next departures from a stop.
+
+:class:`DepartureBoard` keeps, per stop, all departures sorted by time, so
+the next ``n`` departures after a time are found by a binary search and a
+short scan instead of scanning and sorting all edges of the stop.  Stops
+are indexed on their first request.  The board belongs to one version of a
+graph; :func:`board_for` returns a current board for a graph.
+"""
+
+import threading
+import weakref
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from graph import Day, Edge, Graph
+from routing import minutes_to_hhmm
+
+
+@dataclass(frozen=True)
+class Departure:
+    time: float
+    line: str
+    # destination of the trip, from the feed or the trip's last stop
+    headsign: str
+    next_stop: str
+    trip_id: Optional[str] = None
+    # delay in minutes already contained in ``time``
+    delay: float = 0.0
+
+
+class DepartureBoard:
+    """Time-sorted departures per stop, deduplicated by trip."""
+
+    def __init__(self, graph: Graph) -> None:
+        # a proxy, so that cached boards do not keep replaced graphs alive
+        self.graph = weakref.proxy(graph)
+        self.version = graph.version
+        self._stops: Dict[str, Tuple[List[float], List[Departure]]] = {}
+        self._destinations: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def headsign(self, edge: Edge) -> str:
+        """Return the destination of the trip ``edge`` belongs to."""
+        if edge.trip_id is None:
+            return edge.target
+        headsign = self.graph.headsigns.get(edge.trip_id)
+        if headsign:
+            return headsign
+        destination = self._destinations.get(edge.trip_id)
+        if destination is None:
+            entries = self.graph.trips.get(edge.trip_id)
+            if not entries:
+                return edge.target
+            destination = max(entries, key=lambda entry: entry[0])[2].target
+            self._destinations[edge.trip_id] = destination
+        return destination
+
+    def _index(self, stop: str) -> Tuple[List[float], List[Departure]]:
+        indexed = self._stops.get(stop)
+        if indexed is not None:
+            return indexed
+        node = self.graph.nodes.get(stop)
+        edges = node.edges if node is not None else []
+        if not self.graph.edges_sorted:
+            edges = sorted(edges, key=lambda e: e.departure)
+        seen = set()
+        departures: List[Departure] = []
+        for edge in edges:
+            # copies of one trip from overlapping timetable periods count once
+            key = (edge.line, edge.departure, edge.target)
+            if key in seen:
+                continue
+            seen.add(key)
+            departures.append(
+                Departure(
+                    edge.departure,
+                    edge.line,
+                    self.headsign(edge),
+                    edge.target,
+                    edge.trip_id,
+                    edge.delay,
+                )
+            )
+        indexed = ([d.time for d in departures], departures)
+        with self._lock:
+            self._stops[stop] = indexed
+        return indexed
+
+    def next_departures(self, stop: str, after: float, limit: int = 10) -> List[Departure]:
+        """Return up to ``limit`` departures from ``stop`` at or after ``after``.
+
+        A trip serving the stop twice (loops) is listed at its next departure
+        only.
+        """
+        times, departures = self._index(stop)
+        result: List[Departure] = []
+        trips = set()
+        for i in range(bisect_left(times, after), len(departures)):
+            if len(result) >= limit:
+                break
+            departure = departures[i]
+            if departure.trip_id is not None:
+                if departure.trip_id in trips:
+                    continue
+                trips.add(departure.trip_id)
+            result.append(departure)
+        return result
+
+
+_boards: "weakref.WeakKeyDictionary[Graph, DepartureBoard]" = weakref.WeakKeyDictionary()
+_boards_lock = threading.Lock()
+_MAX_BOARDS = 4
+
+
+def board_for(graph: Graph) -> DepartureBoard:
+    """Return the board of ``graph``, rebuilt once its version changed.
+
+    Boards of the last few graphs (e.g. day slices) are kept.  Graphs are
+    referenced weakly, so a replaced timetable is freed with its boards.
+    """
+    with _boards_lock:
+        board = _boards.pop(graph, None)
+        if board is None or board.version != graph.version:
+            board = DepartureBoard(graph)
+        _boards[graph] = board
+        while len(_boards) > _MAX_BOARDS:
+            del _boards[next(iter(_boards))]
+        return board
+
+
+def format_departure(departure: Departure) -> str:
+    """Return one line of a printed departure board."""
+    text = f"{minutes_to_hhmm(departure.time)}  {departure.line:<6} {departure.headsign}"
+    if departure.delay:
+        text += f" (+{departure.delay:.0f})"
+    return text
+
+
+def next_departures(
+    graph: Graph, stop: str, after: float, limit: int = 10, date: Optional[Day] = None
+) -> List[Departure]:
+    """Return the next ``limit`` departures from ``stop`` at or after ``after``.
+
+    With ``date`` only trips running on that day are listed, see
+    :meth:`graph.Graph.for_day`.
+    """
+    if date is not None:
+        graph = graph.for_day(date)
+    return board_for(graph).next_departures(stop, after, limit)
@@ -0,0 +1,160 @@
+"""Streaming export of many routes as GeoJSON or newline-delimited GeoJSON.
+
+Each route becomes one ``Feature`` with a ``LineString`` geometry.  Features
+are written to the file one by one, so exporting thousands of routes needs
+only as much memory as a single route.  The resulting file can be shown with
+:func:`visualization_osmnx.save_geojson_map`, which references the file
+instead of embedding the routes in the HTML map.
+"""
+
+import json
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from graph import Graph
+from routing import minutes_to_hhmm
+
+Feature = Dict[str, Any]
+
+
+def transit_route_feature(
+    graph: Graph,
+    path: List[Tuple[str, Optional[str], float]],
+    properties: Optional[Dict[str, Any]] = None,
+    precision: int = 6,
+) -> Optional[Feature]:
+    """Return a feature for a path from :func:`routing.find_route`.
+
+    The properties list the stops together with their times and lines.
+    ``None`` is returned if a stop has no coordinates.
+    """
+    coords = []
+    for stop, _, _ in path:
+        node = graph.nodes.get(stop)
+        if not node or node.lat is None or node.lon is None:
+            return None
+        coords.append([round(node.lon, precision), round(node.lat, precision)])
+
+    lines = [line for _, line, _ in path]
+    legs = [line for prev, line in zip([None] + lines, lines) if line is not None and line != prev]
+    props: Dict[str, Any] = {
+        "mode": "transit",
+        "stops": [stop for stop, _, _ in path],
+        "times": [minutes_to_hhmm(t) for _, _, t in path],
+        "lines": lines,
+        "departure": minutes_to_hhmm(path[0][2]),
+        "arrival": minutes_to_hhmm(path[-1][2]),
+        "transfers": max(len(legs) - 1, 0),
+    }
+    if properties:
+        props.update(properties)
+    return {
+        "type": "Feature",
+        "geometry": {"type": "LineString", "coordinates": coords},
+        "properties": props,
+    }
+
+
+def coords_route_feature(
+    coords: Sequence[Tuple[float, float]],
+    travel_time: Optional[float] = None,
+    properties: Optional[Dict[str, Any]] = None,
+    precision: int = 6,
+) -> Feature:
+    """Return a feature for an OSM route given as ``(lat, lon)`` pairs."""
+    props: Dict[str, Any] = {"mode": "osm"}
+    if travel_time is not None:
+        props["travel_time_min"] = round(travel_time, 2)
+    if properties:
+        props.update(properties)
+    return {
+        "type": "Feature",
+        "geometry": {
+            "type": "LineString",
+            "coordinates": [[round(lon, precision), round(lat, precision)] for lat, lon in coords],
+        },
+        "properties": props,
+    }
+
+
+class FeatureWriter:
+    """Write features incrementally to a GeoJSON or NDJSON file.
+
+    ``fmt`` is ``"geojson"`` for a ``FeatureCollection`` or ``"ndjson"`` for
+    one feature per line.  Without ``fmt`` it is derived from the file
+    extension (``.ndjson``/``.jsonl`` select NDJSON).  The bounding box of
+    all written features is tracked in :attr:`bbox` as
+    ``(west, south, east, north)``.
+    """
+
+    def __init__(self, filename: str, fmt: Optional[str] = None) -> None:
+        if fmt is None:
+            fmt = "ndjson" if filename.endswith((".ndjson", ".jsonl")) else "geojson"
+        if fmt not in {"geojson", "ndjson"}:
+            raise ValueError(f"Invalid export format: {fmt}")
+        self.filename = filename
+        self.fmt = fmt
+        self.count = 0
+        self.bbox: Optional[List[float]] = None
+        self._fh = open(filename, "w", encoding="utf-8")
+        if fmt == "geojson":
+            self._fh.write('{"type":"FeatureCollection","features":[\n')
+
+    def __enter__(self) -> "FeatureWriter":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def _extend_bbox(self, feature: Feature) -> None:
+        coords = feature["geometry"]["coordinates"]
+        if not coords:
+            return
+        lons = [c[0] for c in coords]
+        lats = [c[1] for c in coords]
+        box = [min(lons), min(lats), max(lons), max(lats)]
+        if self.bbox is None:
+            self.bbox = box
+        else:
+            self.bbox = [
+                min(self.bbox[0], box[0]),
+                min(self.bbox[1], box[1]),
+                max(self.bbox[2], box[2]),
+                max(self.bbox[3], box[3]),
+            ]
+
+    def write(self, feature: Feature) -> None:
+        text = json.dumps(feature, ensure_ascii=False, separators=(",", ":"))
+        if self.fmt == "geojson" and self.count:
+            self._fh.write(",\n")
+        self._fh.write(text)
+        if self.fmt == "ndjson":
+            self._fh.write("\n")
+        self._extend_bbox(feature)
+        self.count += 1
+
+    def close(self) -> None:
+        if self._fh.closed:
+            return
+        if self.fmt == "geojson":
+            self._fh.write("\n]")
+            if self.bbox is not None:
+                self._fh.write(',"bbox":' + json.dumps(self.bbox))
+            self._fh.write("}\n")
+        self._fh.close()
+
+
+def export_routes(
+    features: Iterable[Optional[Feature]],
+    filename: str,
+    fmt: Optional[str] = None,
+) -> FeatureWriter:
+    """Stream ``features`` into ``filename`` and return the closed writer.
+
+    ``features`` may be a generator; ``None`` entries (routes without
+    coordinates) are skipped.
+    """
+    with FeatureWriter(filename, fmt) as writer:
+        for feature in features:
+            if feature is not None:
+                writer.write(feature)
+    return writer
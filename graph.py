@@ -1,5 +1,19 @@
+import itertools
+from bisect import bisect_left, bisect_right
 from dataclasses import dataclass
-from typing import Dict, List, Optional
+from datetime import date
+from operator import attrgetter
+from typing import Dict, FrozenSet, List, Optional, Tuple, Union
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+Day = Union[date, int]
+
+# Line name used for footpath transfers between nearby stops
+WALK_LINE = "walk"
+
+_departure = attrgetter("departure")
+_versions = itertools.count()
 
 
 @dataclass
@@ -8,6 +22,10 @@ class Edge:
     line: str
     departure: float
     travel_time: float
+    service_id: Optional[str] = None
+    trip_id: Optional[str] = None
+    # delay in minutes already contained in ``departure``
+    delay: float = 0.0
 
 
 @dataclass
@@ -23,6 +41,138 @@ class Graph:
 
     def __init__(self) -> None:
         self.nodes: Dict[str, Node] = {}
+        # service_id -> bitmask of weekdays (bit 0 = Monday)
+        self.services: Dict[str, int] = {}
+        self.service_ranges: Dict[str, Tuple[date, date]] = {}
+        self.service_exceptions: Dict[date, Dict[str, bool]] = {}
+        # source stop -> [(target stop, walking time in minutes)]
+        self.footpaths: Dict[str, List[Tuple[str, float]]] = {}
+        # trip_id -> [(stop_sequence, source stop, edge)] in stop order
+        self.trips: Dict[str, List[Tuple[int, str, Edge]]] = {}
+        # trip_id -> destination shown on the vehicle, if the feed has one
+        self.headsigns: Dict[str, str] = {}
+        # unique per graph and bumped whenever the timetable changes
+        self.version = next(_versions)
+        self.edges_sorted = True
+        self._day_slices: Dict[FrozenSet[str], "Graph"] = {}
+
+    def touch(self) -> None:
+        """Mark the timetable as changed and drop derived day slices."""
+        self.version = next(_versions)
+        self._day_slices.clear()
+
+    def sort_edges(self) -> None:
+        """Sort the edges of every stop by departure time."""
+        for node in self.nodes.values():
+            node.edges.sort(key=_departure)
+        self.edges_sorted = True
+
+    def move_edge(self, source: str, edge: Edge, departure: float) -> None:
+        """Change the departure of ``edge`` keeping the stop's edges sorted.
+
+        Only the edge itself is moved; requires :meth:`sort_edges` order.
+        """
+        edges = self.nodes[source].edges
+        i = bisect_left(edges, edge.departure, key=_departure)
+        while edges[i] is not edge:
+            i += 1
+        del edges[i]
+        edge.departure = departure
+        edges.insert(bisect_right(edges, departure, key=_departure), edge)
+
+    def add_service(
+        self,
+        service_id: str,
+        weekdays: List[bool],
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+    ) -> None:
+        """Register the operating days of ``service_id``.
+
+        ``weekdays`` holds seven flags starting with Monday.  ``start`` and
+        ``end`` optionally restrict the service to a date range.
+        """
+        mask = 0
+        for i, active in enumerate(weekdays):
+            if active:
+                mask |= 1 << i
+        self.services[service_id] = mask
+        if start is not None and end is not None:
+            self.service_ranges[service_id] = (start, end)
+
+    def add_service_exception(self, service_id: str, day: date, active: bool) -> None:
+        """Add or remove ``service_id`` on a single ``day``."""
+        self.service_exceptions.setdefault(day, {})[service_id] = active
+
+    def service_active(self, service_id: Optional[str], day: Day) -> bool:
+        """Return whether ``service_id`` runs on ``day``.
+
+        ``day`` is either a :class:`datetime.date` or a weekday number
+        (``0`` = Monday).  Edges without a known service always run.
+        """
+        if service_id is None or service_id not in self.services:
+            return True
+        if isinstance(day, date):
+            override = self.service_exceptions.get(day, {}).get(service_id)
+            if override is not None:
+                return override
+            valid = self.service_ranges.get(service_id)
+            if valid is not None and not valid[0] <= day <= valid[1]:
+                return False
+            weekday = day.weekday()
+        else:
+            weekday = day % 7
+        return bool(self.services[service_id] >> weekday & 1)
+
+    def overlay(self) -> "Graph":
+        """Return a shallow copy that can be extended without touching this graph.
+
+        Nodes, edges and service tables are shared; the node and footpath
+        tables are copied so that temporary stops and footpaths can be added.
+        """
+        view = Graph()
+        view.nodes = dict(self.nodes)
+        view.services = self.services
+        view.service_ranges = self.service_ranges
+        view.service_exceptions = self.service_exceptions
+        view.footpaths = dict(self.footpaths)
+        view.trips = self.trips
+        view.headsigns = self.headsigns
+        view.version = self.version
+        view.edges_sorted = self.edges_sorted
+        return view
+
+    def for_day(self, day: Day) -> "Graph":
+        """Return the sub-timetable of all trips running on ``day``.
+
+        Slices are derived lazily and cached by the set of active services,
+        so all days with the same services share one slice.  The slice
+        shares its ``Edge`` objects with this graph.
+        """
+        active = frozenset(s for s in self.services if self.service_active(s, day))
+        cached = self._day_slices.get(active)
+        if cached is not None:
+            return cached
+
+        sliced = Graph()
+        sliced.services = self.services
+        sliced.service_ranges = self.service_ranges
+        sliced.service_exceptions = self.service_exceptions
+        sliced.footpaths = self.footpaths
+        sliced.trips = self.trips
+        sliced.headsigns = self.headsigns
+        sliced.edges_sorted = self.edges_sorted
+        for name, node in self.nodes.items():
+            edges = [
+                e
+                for e in node.edges
+                if e.service_id is None
+                or e.service_id not in self.services
+                or e.service_id in active
+            ]
+            sliced.nodes[name] = Node(name=name, edges=edges, lat=node.lat, lon=node.lon)
+        self._day_slices[active] = sliced
+        return sliced
 
     def add_edge(
         self,
@@ -35,6 +185,9 @@ class Graph:
         source_lon: Optional[float] = None,
         target_lat: Optional[float] = None,
         target_lon: Optional[float] = None,
+        service_id: Optional[str] = None,
+        trip_id: Optional[str] = None,
+        stop_sequence: Optional[int] = None,
     ) -> None:
         if source not in self.nodes:
             self.nodes[source] = Node(name=source, edges=[], lat=source_lat, lon=source_lon)
@@ -50,9 +203,33 @@ class Graph:
                 self.nodes[target].lat = target_lat
             if target_lon is not None:
                 self.nodes[target].lon = target_lon
-        self.nodes[source].edges.append(
-            Edge(target=target, line=line, departure=departure, travel_time=travel_time)
+        edge = Edge(
+            target=target,
+            line=line,
+            departure=departure,
+            travel_time=travel_time,
+            service_id=service_id,
+            trip_id=trip_id,
         )
+        edges = self.nodes[source].edges
+        if edges and edges[-1].departure > departure:
+            self.edges_sorted = False
+        edges.append(edge)
+        if trip_id is not None:
+            trip = self.trips.setdefault(trip_id, [])
+            seq = stop_sequence if stop_sequence is not None else len(trip) + 1
+            trip.append((seq, source, edge))
+
+    def add_footpath(self, source: str, target: str, walk_time: float) -> None:
+        """Add a walking transfer of ``walk_time`` minutes from ``source``.
+
+        Like :meth:`add_edge` this does not :meth:`touch` the graph; call it
+        once after changing a graph that may already have been searched.
+        """
+        self.footpaths.setdefault(source, []).append((target, walk_time))
+
+    def walking_neighbors(self, node: str) -> List[Tuple[str, float]]:
+        return self.footpaths.get(node, [])
 
     def neighbors(self, node: str) -> List[Edge]:
         return list(self.nodes.get(node, Node(name=node, edges=[])).edges)
@@ -64,10 +241,23 @@ class Graph:
         at the original target stop.
         """
         rev = Graph()
+        rev.services = self.services
+        rev.service_ranges = self.service_ranges
+        rev.service_exceptions = self.service_exceptions
         for source, node in self.nodes.items():
             for edge in node.edges:
                 arrival = edge.departure + edge.travel_time
-                rev.add_edge(edge.target, source, edge.line, arrival, edge.travel_time)
+                rev.add_edge(
+                    edge.target,
+                    source,
+                    edge.line,
+                    arrival,
+                    edge.travel_time,
+                    service_id=edge.service_id,
+                )
+        for source, paths in self.footpaths.items():
+            for target, walk_time in paths:
+                rev.add_footpath(target, source, walk_time)
         return rev
 
 
@@ -0,0 +1,147 @@
+"""Load the transit graph directly from a standard GTFS feed.
+
+In contrast to :func:`routing.load_graph_from_csv` no pre-joined CSV is
+required.  The small lookup tables (``stops.txt``, ``routes.txt``,
+``trips.txt`` and ``calendar.txt``) are read into dictionaries,
+``stop_times.txt`` is streamed straight out of the zip archive and processed
+trip by trip.
+"""
+
+import csv
+import io
+import zipfile
+from datetime import date, datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from graph import Graph, WEEKDAYS
+from routing import parse_time_to_minutes
+
+Stop = Tuple[str, Optional[float], Optional[float]]
+
+
+def _read_table(archive: zipfile.ZipFile, name: str) -> Iterator[Dict[str, str]]:
+    """Yield the rows of ``name`` from ``archive`` without extracting it."""
+    with archive.open(name) as raw:
+        text = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+        for row in csv.DictReader(text):
+            yield row
+
+
+def _float_or_none(value: Optional[str]) -> Optional[float]:
+    return float(value) if value else None
+
+
+def _load_stops(archive: zipfile.ZipFile) -> Dict[str, Stop]:
+    stops: Dict[str, Stop] = {}
+    for row in _read_table(archive, "stops.txt"):
+        stops[row["stop_id"]] = (
+            row["stop_name"],
+            _float_or_none(row.get("stop_lat")),
+            _float_or_none(row.get("stop_lon")),
+        )
+    return stops
+
+
+def _load_trip_lines(
+    archive: zipfile.ZipFile, headsigns: Dict[str, str]
+) -> Dict[str, Tuple[str, Optional[str]]]:
+    """Return a mapping ``trip_id -> (line name, service_id)``.
+
+    Non-empty ``trip_headsign`` values are stored in ``headsigns``.
+    """
+    lines: Dict[str, str] = {}
+    for row in _read_table(archive, "routes.txt"):
+        lines[row["route_id"]] = (
+            row.get("route_short_name") or row.get("route_long_name") or row["route_id"]
+        )
+    trips: Dict[str, Tuple[str, Optional[str]]] = {}
+    for row in _read_table(archive, "trips.txt"):
+        line = lines.get(row["route_id"], row["route_id"])
+        trips[row["trip_id"]] = (line, row.get("service_id") or None)
+        if row.get("trip_headsign"):
+            headsigns[row["trip_id"]] = row["trip_headsign"]
+    return trips
+
+
+def _parse_date(value: str) -> date:
+    return datetime.strptime(value, "%Y%m%d").date()
+
+
+def _load_calendar(archive: zipfile.ZipFile, g: Graph) -> None:
+    """Register services from ``calendar.txt`` and ``calendar_dates.txt``."""
+    names = set(archive.namelist())
+    if "calendar.txt" in names:
+        for row in _read_table(archive, "calendar.txt"):
+            start = _parse_date(row["start_date"]) if row.get("start_date") else None
+            end = _parse_date(row["end_date"]) if row.get("end_date") else None
+            g.add_service(row["service_id"], [row[d] == "1" for d in WEEKDAYS], start, end)
+    if "calendar_dates.txt" in names:
+        for row in _read_table(archive, "calendar_dates.txt"):
+            if row["service_id"] not in g.services:
+                # services defined only by exceptions run on no regular weekday
+                g.add_service(row["service_id"], [False] * 7)
+            g.add_service_exception(
+                row["service_id"], _parse_date(row["date"]), row["exception_type"] == "1"
+            )
+
+
+def _iter_trips(archive: zipfile.ZipFile) -> Iterator[Tuple[str, List[Dict[str, str]]]]:
+    """Yield ``(trip_id, rows)`` groups from ``stop_times.txt``.
+
+    Feeds list the stop times of one trip in consecutive rows, so only a
+    single trip is kept in memory at a time.  Within a trip the rows are
+    ordered by ``stop_sequence``.
+    """
+    current: Optional[str] = None
+    rows: List[Dict[str, str]] = []
+    for row in _read_table(archive, "stop_times.txt"):
+        if row["trip_id"] != current:
+            if rows:
+                yield current, sorted(rows, key=lambda r: int(r["stop_sequence"]))
+            current = row["trip_id"]
+            rows = []
+        rows.append(row)
+    if rows:
+        yield current, sorted(rows, key=lambda r: int(r["stop_sequence"]))
+
+
+def load_graph_from_gtfs(path: str) -> Graph:
+    """Create a graph from a GTFS zip archive.
+
+    The result is equivalent to :func:`routing.load_graph_from_csv` on the
+    pre-joined CSV of the same feed.  Stop times without departure or arrival
+    time are skipped.
+    """
+    g = Graph()
+    with zipfile.ZipFile(path) as archive:
+        stops = _load_stops(archive)
+        trip_lines = _load_trip_lines(archive, g.headsigns)
+        _load_calendar(archive, g)
+
+        for trip_id, rows in _iter_trips(archive):
+            if trip_id not in trip_lines:
+                continue
+            line, service_id = trip_lines[trip_id]
+            timed = [r for r in rows if r["departure_time"] and r["arrival_time"]]
+            for prev, row in zip(timed, timed[1:]):
+                s_name, s_lat, s_lon = stops[prev["stop_id"]]
+                t_name, t_lat, t_lon = stops[row["stop_id"]]
+                departure = parse_time_to_minutes(prev["departure_time"])
+                travel_time = parse_time_to_minutes(row["arrival_time"]) - departure
+                g.add_edge(
+                    s_name,
+                    t_name,
+                    line,
+                    departure,
+                    travel_time,
+                    s_lat,
+                    s_lon,
+                    t_lat,
+                    t_lon,
+                    service_id=service_id,
+                    trip_id=trip_id,
+                    stop_sequence=int(prev["stop_sequence"]),
+                )
+    g.sort_edges()
+    g.touch()
+    return g
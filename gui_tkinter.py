@@ -6,19 +6,85 @@ import webbrowser
 from cli import classify_query
 from geocoding import geocode_address
 from routing import (
-    load_default_graph,
-    find_route,
     parse_time_to_minutes,
     minutes_to_hhmm,
 )
-from osm_routing import find_osm_route, RouteNotFoundError
+from transfers import compute_footpaths
+from snapshot import TimetableStore
+from route_cache import RouteCache
+from intermodal import find_intermodal_route, load_walk_network
+from osm_routing import RouteNotFoundError
+from multimodal_network import (
+    compare_modes,
+    find_multimodal_route,
+    load_multimodal_network,
+)
+from pipeline import QueryPipeline
+from departures import format_departure, next_departures
+from stop_index import StopIndex
 from visualization_osmnx import save_route_map, save_coords_map
 
 
+class StopAutocomplete:
+    """Suggestion list shown below an entry while typing a stop name."""
+
+    def __init__(self, entry: tk.Entry, suggest, limit: int = 8) -> None:
+        self.entry = entry
+        self.suggest = suggest
+        self.listbox = tk.Listbox(entry.master, height=limit, exportselection=False)
+        entry.bind("<KeyRelease>", self.on_key)
+        entry.bind("<Down>", self.focus_list)
+        entry.bind("<FocusOut>", lambda event: entry.after(150, self.hide_unless_focused))
+        self.listbox.bind("<Return>", self.choose)
+        self.listbox.bind("<ButtonRelease-1>", self.choose)
+        self.listbox.bind("<Escape>", lambda event: self.hide())
+
+    def on_key(self, event) -> None:
+        if event.keysym in {"Down", "Up", "Return", "Escape", "Tab"}:
+            if event.keysym == "Escape":
+                self.hide()
+            return
+        names = self.suggest(self.entry.get())
+        if not names:
+            self.hide()
+            return
+        self.listbox.delete(0, tk.END)
+        for name in names:
+            self.listbox.insert(tk.END, name)
+        self.listbox.configure(height=len(names))
+        self.listbox.place(in_=self.entry, relx=0, rely=1, relwidth=1)
+        self.listbox.lift()
+
+    def focus_list(self, event=None) -> None:
+        if self.listbox.winfo_ismapped():
+            self.listbox.focus_set()
+            self.listbox.selection_set(0)
+
+    def choose(self, event=None) -> None:
+        selection = self.listbox.curselection()
+        if selection:
+            self.entry.delete(0, tk.END)
+            self.entry.insert(0, self.listbox.get(selection[0]))
+        self.hide()
+        self.entry.focus_set()
+        self.entry.icursor(tk.END)
+
+    def hide_unless_focused(self) -> None:
+        if self.entry.focus_get() is not self.listbox:
+            self.hide()
+
+    def hide(self) -> None:
+        self.listbox.place_forget()
+
+
 class RoutingGUI:
     def __init__(self) -> None:
-        self.graph = load_default_graph()
-        self.stop_names = list(self.graph.nodes.keys())
+        self.store = TimetableStore.from_default(prepare=compute_footpaths)
+        self.store.watch()
+        self.route_cache = RouteCache()
+        self.pipeline = QueryPipeline()
+        self._stop_index = None
+        self._indexed_graph = None
 
         self.root = tk.Tk()
         self.root.title("Routing GUI")
@@ -30,9 +96,15 @@ class RoutingGUI:
         tk.Label(self.root, text="Ziel").grid(row=1, column=0, sticky="e")
         self.goal_entry = tk.Entry(self.root, width=40)
         self.goal_entry.grid(row=1, column=1, padx=5, pady=2)
+        self.start_suggestions = StopAutocomplete(self.start_entry, self.suggest_stops)
+        self.goal_suggestions = StopAutocomplete(self.goal_entry, self.suggest_stops)
 
         tk.Label(self.root, text="Verkehrsmittel").grid(row=2, column=0, sticky="e")
-        self.mode_combo = ttk.Combobox(self.root, values=["auto", "rad", "fuss", "bahn"], state="readonly")
+        self.mode_combo = ttk.Combobox(
+            self.root,
+            values=["auto", "rad", "fuss", "vergleich", "bahn", "tuer", "abfahrten"],
+            state="readonly",
+        )
         self.mode_combo.current(0)
         self.mode_combo.grid(row=2, column=1, padx=5, pady=2, sticky="w")
 
@@ -59,15 +131,27 @@ class RoutingGUI:
         self.sort_combo.grid(row=5, column=1, sticky="w", padx=5, pady=2)
 
         self.route_button = tk.Button(self.root, text="Route berechnen", command=self.compute_route)
-        self.route_button.grid(row=6, column=0, columnspan=2, pady=5)
+        tk.Label(self.root, text="Alternativen").grid(row=6, column=0, sticky="e")
+        self.alternatives_spin = tk.Spinbox(self.root, from_=1, to=5, width=5)
+        self.alternatives_spin.grid(row=6, column=1, sticky="w", padx=5, pady=2)
+
+        self.route_button.grid(row=7, column=0, columnspan=2, pady=5)
 
         self.output = tk.Text(self.root, width=60, height=15)
-        self.output.grid(row=7, column=0, columnspan=2, padx=5, pady=5)
+        self.output.grid(row=8, column=0, columnspan=2, padx=5, pady=5)
 
     def log(self, text: str) -> None:
         self.output.insert(tk.END, text + "\n")
         self.output.see(tk.END)
 
+    def suggest_stops(self, query: str):
+        graph = self.store.graph
+        if graph is not self._indexed_graph:
+            # a reloaded timetable may have new stops
+            self._stop_index = StopIndex.from_graph(graph)
+            self._indexed_graph = graph
+        return self._stop_index.suggest(query)
+
     def on_time_mode_changed(self, event=None) -> None:
         mode = self.time_mode.get()
         if mode == "now":
@@ -79,52 +163,97 @@ class RoutingGUI:
 
     def compute_route(self) -> None:
         self.output.delete("1.0", tk.END)
+        # one snapshot per request, a reload in the background swaps the next one
+        graph = self.store.graph
+        stop_names = list(graph.nodes.keys())
         start_q = self.start_entry.get().strip()
         goal_q = self.goal_entry.get().strip()
         mode = self.mode_combo.get()
 
+        if mode == "abfahrten":
+            self.show_departures(graph, start_q)
+            return
+
         if not start_q or not goal_q:
             self.log("Bitte Start und Ziel eingeben.")
             return
 
-        if mode == "bahn":
-            try:
-                start_stop, start_coords = classify_query(start_q, self.stop_names)
-            except Exception as exc:
-                self.log(f"Fehler bei Start: {exc}")
-                return
-            try:
-                goal_stop, goal_coords = classify_query(goal_q, self.stop_names)
-            except Exception as exc:
-                self.log(f"Fehler bei Ziel: {exc}")
-                return
+        self.pipeline.begin()
+        walk_futures = {}
+        if mode in {"bahn", "tuer"}:
+
+            def resolve(query):
+                stop, coords = classify_query(query, stop_names)
+                if stop is not None:
+                    node = graph.nodes.get(stop)
+                    if not node or node.lat is None or node.lon is None:
+                        raise ValueError(f"Keine Koordinaten f\u00fcr {stop}")
+                    coords = (node.lat, node.lon)
+                return stop, coords
+
+            def on_resolved(index, result):
+                # load the walk network of this side while the other one resolves
+                if mode == "tuer":
+                    walk_futures[index] = self.pipeline.submit(load_walk_network, result[1], 1000)
+
         else:
-            try:
-                start_coords = geocode_address(start_q)
-            except Exception as exc:
-                self.log(f"Fehler bei Start: {exc}")
-                return
-            try:
-                goal_coords = geocode_address(goal_q)
-            except Exception as exc:
-                self.log(f"Fehler bei Ziel: {exc}")
-                return
-            start_stop = goal_stop = None
 
-        if start_stop is not None:
-            node = self.graph.nodes.get(start_stop)
-            if not node or node.lat is None or node.lon is None:
-                self.log(f"Keine Koordinaten f\u00fcr {start_stop}")
-                return
-            start_coords = (node.lat, node.lon)
-        if goal_stop is not None:
-            node = self.graph.nodes.get(goal_stop)
-            if not node or node.lat is None or node.lon is None:
-                self.log(f"Keine Koordinaten f\u00fcr {goal_stop}")
-                return
-            goal_coords = (node.lat, node.lon)
+            def resolve(query):
+                return None, geocode_address(query)
+
+            on_resolved = None
+
+        futures = self.pipeline.resolve_pair(resolve, start_q, goal_q, on_resolved)
+        try:
+            start_stop, start_coords = futures[0].result()
+        except Exception as exc:
+            self.log(f"Fehler bei Start: {exc}")
+            return
+        try:
+            goal_stop, goal_coords = futures[1].result()
+        except Exception as exc:
+            self.log(f"Fehler bei Ziel: {exc}")
+            return
 
-        if mode == "bahn":
+        if mode == "tuer":
+            walk_networks = []
+            with self.pipeline.stage("Netz"):
+                for index in (0, 1):
+                    try:
+                        walk_networks.append(walk_futures[index].result())
+                    except Exception as exc:
+                        self.log(f"Fu\u00dfwegenetz nicht verf\u00fcgbar: {exc}")
+                        walk_networks.append(None)
+            now = datetime.now()
+            start_minutes = now.hour * 60 + now.minute + now.second / 60.0
+            with self.pipeline.stage("Route"):
+                path, route_graph = find_intermodal_route(
+                    graph,
+                    start_coords,
+                    goal_coords,
+                    start_minutes,
+                    sort_by=self.sort_combo.get(),
+                    date=now.date(),
+                    start_walk_network=walk_networks[0],
+                    goal_walk_network=walk_networks[1],
+                )
+            if not path:
+                self.log("Keine Route gefunden.")
+                return
+            self.log("Gefundene Route:")
+            for stop, line, arr in path:
+                line_str = line if line is not None else "start"
+                self.log(f"{line_str} -> {stop} {minutes_to_hhmm(arr, show_day=True)}")
+            self.log(self.pipeline.report())
+            self.pipeline.write_map(
+                save_route_map,
+                route_graph,
+                path,
+                network_type="walk",
+                on_done=self.map_saved,
+                on_error=self.map_failed,
+            )
+        elif mode == "bahn":
             if start_stop is None or goal_stop is None:
                 self.log("Bitte Haltestellennamen f\u00fcr den Bahnmodus eingeben.")
                 return
@@ -141,31 +270,72 @@ class RoutingGUI:
                     return
                 reverse = choice == "anreise"
             sort_by = self.sort_combo.get()
-            path = find_route(
-                self.graph,
-                start_stop,
-                goal_stop,
-                start_minutes,
-                reverse=reverse,
-                sort_by=sort_by,
-            )
-            if not path:
+            try:
+                alternatives = int(self.alternatives_spin.get())
+            except ValueError:
+                alternatives = 1
+            # alternatives come from one multi-label search and bypass the cache
+            extra = {"k": alternatives} if alternatives > 1 else {}
+            with self.pipeline.stage("Route"):
+                paths = self.route_cache.find_route(
+                    graph,
+                    start_stop,
+                    goal_stop,
+                    start_minutes,
+                    reverse=reverse,
+                    sort_by=sort_by,
+                    date=datetime.now().date(),
+                    days=2,
+                    **extra,
+                )
+            if alternatives <= 1:
+                paths = [paths] if paths else []
+            if not paths:
                 self.log("Keine Route gefunden.")
                 return
-            self.log("Gefundene Route:")
-            for stop, line, arr in path:
-                line_str = line if line is not None else "start"
-                self.log(f"{line_str} -> {stop} {minutes_to_hhmm(arr)}")
-            filename = save_route_map(self.graph, path, network_type="walk")
-            if filename:
-                webbrowser.open(filename)
+            path = paths[0]
+            for number, alternative in enumerate(paths, 1):
+                self.log("Gefundene Route:" if len(paths) == 1 else f"Alternative {number}:")
+                for stop, line, arr in alternative:
+                    line_str = line if line is not None else "start"
+                    self.log(f"{line_str} -> {stop} {minutes_to_hhmm(arr, show_day=True)}")
+            self.log(self.pipeline.report())
+            self.pipeline.write_map(
+                save_route_map,
+                graph,
+                path,
+                network_type="walk",
+                on_done=self.map_saved,
+                on_error=self.map_failed,
+            )
         else:
+            with self.pipeline.stage("Netz"):
+                try:
+                    load_multimodal_network(start_coords, goal_coords)
+                except Exception as exc:
+                    self.log(f"Stra\u00dfennetz nicht verf\u00fcgbar: {exc}")
+                    return
             nt_map = {"auto": "drive", "rad": "bike", "fuss": "walk"}
+            if mode == "vergleich":
+                now = datetime.now()
+                start_minutes = now.hour * 60 + now.minute + now.second / 60.0
+                with self.pipeline.stage("Route"):
+                    results = compare_modes(start_coords, goal_coords)
+                for name, result in results.items():
+                    label = next(k for k, v in nt_map.items() if v == name)
+                    if result is None:
+                        self.log(f"{label}: keine Route")
+                        continue
+                    arrival = minutes_to_hhmm(start_minutes + result[1])
+                    self.log(f"{label}: {result[1]:.0f} min, Ankunft gegen {arrival}")
+                self.log(self.pipeline.report())
+                return
             nt = nt_map[mode]
             try:
-                coords_path, travel_time = find_osm_route(
-                    start_coords, goal_coords, network_type=nt
-                )
+                with self.pipeline.stage("Route"):
+                    coords_path, travel_time = find_multimodal_route(
+                        start_coords, goal_coords, network_type=nt
+                    )
             except RouteNotFoundError as exc:
                 self.log(str(exc))
                 return
@@ -176,12 +346,56 @@ class RoutingGUI:
             start_minutes = now.hour * 60 + now.minute + now.second / 60.0
             arrival = start_minutes + travel_time
             self.log(f"Ankunft gegen {minutes_to_hhmm(arrival)}")
-            filename = save_coords_map(coords_path, network_type=nt)
-            if filename:
-                webbrowser.open(filename)
+            self.log(self.pipeline.report())
+            self.pipeline.write_map(
+                save_coords_map,
+                coords_path,
+                network_type=nt,
+                on_done=self.map_saved,
+                on_error=self.map_failed,
+            )
+
+    def show_departures(self, graph, query: str) -> None:
+        """List the next departures from the stop in the Start field."""
+        if query in graph.nodes:
+            stop = [query]
+        else:
+            stop = self.suggest_stops(query)[:1] if query else []
+        if not stop:
+            self.log("Bitte eine Haltestelle als Start eingeben.")
+            return
+        now = datetime.now()
+        if self.time_mode.get() == "now":
+            after = now.hour * 60 + now.minute + now.second / 60.0
+        else:
+            try:
+                after = parse_time_to_minutes(self.time_entry.get())
+            except ValueError as exc:
+                self.log(f"Ung\u00fcltige Zeitangabe: {exc}")
+                return
+        departures = next_departures(graph, stop[0], after, date=now.date())
+        if not departures:
+            self.log(f"Keine Abfahrten ab {stop[0]}.")
+            return
+        self.log(f"Abfahrten ab {stop[0]}:")
+        for departure in departures:
+            self.log(format_departure(departure))
+
+    def map_saved(self, filename: str, seconds: float) -> None:
+        # called from the map writer thread, Tk must only be used from the main loop
+        def show() -> None:
+            self.log(f"Karte gespeichert ({seconds:.2f} s)")
+            webbrowser.open(filename)
+
+        self.root.after(0, show)
+
+    def map_failed(self, exc: Exception) -> None:
+        self.root.after(0, lambda: self.log(f"Karte konnte nicht gespeichert werden: {exc}"))
 
     def run(self) -> None:
         self.root.mainloop()
+        self.pipeline.close()
+        self.store.close()
 
 
 if __name__ == "__main__":
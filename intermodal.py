@@ -0,0 +1,126 @@
+"""Door-to-door journeys combining walking and public transport.
+
+Both addresses are connected to all stops within walking range.  The walking
+times are computed with a single one-to-many search per address, either on
+an OSM walk network or as the crow flies.  The access and egress walks are
+added as temporary footpaths to an overlay of the timetable, so one transit
+search starting at the address considers all access stops at once.
+"""
+
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from graph import Day, Graph, Node
+from routing import find_route, haversine
+from transfers import StopGrid
+
+Coords = Tuple[float, float]
+Path = List[Tuple[str, Optional[str], float]]
+
+
+@lru_cache(maxsize=8)
+def _cached_walk_network(lat: float, lon: float, dist: int) -> Any:
+    import osmnx as ox
+
+    return ox.graph_from_point((lat, lon), dist=dist, network_type="walk")
+
+
+def load_walk_network(coords: Coords, dist: float) -> Any:
+    """Return an OSM walk network around ``coords``.
+
+    Networks are cached per location (rounded to about 100 m), so repeated
+    queries from the same address do not download the network again.
+    """
+    return _cached_walk_network(round(coords[0], 3), round(coords[1], 3), int(dist))
+
+
+def walking_times(
+    graph: Graph,
+    coords: Coords,
+    radius_m: float = 800.0,
+    walk_speed_kmh: float = 4.5,
+    walk_network: Optional[Any] = None,
+    grid: Optional[StopGrid] = None,
+) -> Dict[str, float]:
+    """Return walking minutes from ``coords`` to all stops within ``radius_m``.
+
+    With ``walk_network`` one Dijkstra search from the node nearest to
+    ``coords`` yields the network distance to all candidate stops.  Walk
+    networks of OSMnx are bidirectional, so the same times apply for the
+    egress walk to an address.
+    """
+    if grid is None:
+        grid = StopGrid.from_graph(graph, radius_m)
+    candidates = dict(grid.within(coords[0], coords[1], radius_m))
+    metres_per_minute = walk_speed_kmh * 1000.0 / 60.0
+
+    if walk_network is not None and candidates:
+        import networkx as nx
+        import osmnx as ox
+
+        names = list(candidates)
+        source = ox.nearest_nodes(walk_network, coords[1], coords[0])
+        lengths = nx.single_source_dijkstra_path_length(
+            walk_network, source, cutoff=radius_m, weight="length"
+        )
+        stop_nodes = ox.nearest_nodes(
+            walk_network,
+            [graph.nodes[n].lon for n in names],
+            [graph.nodes[n].lat for n in names],
+        )
+        candidates = {
+            name: lengths[node] for name, node in zip(names, stop_nodes) if node in lengths
+        }
+
+    return {name: dist / metres_per_minute for name, dist in candidates.items()}
+
+
+def find_intermodal_route(
+    graph: Graph,
+    start_coords: Coords,
+    goal_coords: Coords,
+    start_minutes: float,
+    *,
+    reverse: bool = False,
+    sort_by: str = "time",
+    date: Optional[Day] = None,
+    radius_m: float = 800.0,
+    walk_speed_kmh: float = 4.5,
+    start_walk_network: Optional[Any] = None,
+    goal_walk_network: Optional[Any] = None,
+    start_label: str = "Start",
+    goal_label: str = "Ziel",
+) -> Tuple[Optional[Path], Graph]:
+    """Return a walk + transit + walk journey between two coordinates.
+
+    The result is the path in the format of :func:`routing.find_route`
+    (walking legs use the line ``"walk"``) together with the graph it refers
+    to.  That graph contains the two addresses as stops ``start_label`` and
+    ``goal_label``, so it can be passed to ``save_route_map`` directly.
+    """
+    base = graph.for_day(date) if date is not None else graph
+    grid = StopGrid.from_graph(base, radius_m)
+    access = walking_times(base, start_coords, radius_m, walk_speed_kmh, start_walk_network, grid)
+    egress = walking_times(base, goal_coords, radius_m, walk_speed_kmh, goal_walk_network, grid)
+
+    view = base.overlay()
+    view.nodes[start_label] = Node(start_label, [], start_coords[0], start_coords[1])
+    view.nodes[goal_label] = Node(goal_label, [], goal_coords[0], goal_coords[1])
+    view.footpaths[start_label] = list(access.items())
+    for stop, minutes in egress.items():
+        view.footpaths[stop] = view.footpaths.get(stop, []) + [(goal_label, minutes)]
+
+    direct = haversine(*start_coords, *goal_coords) * 1000.0
+    if direct <= radius_m:
+        view.footpaths[start_label].append((goal_label, direct / (walk_speed_kmh * 1000.0 / 60.0)))
+
+    path = find_route(
+        view,
+        start_label,
+        goal_label,
+        start_minutes,
+        reverse=reverse,
+        sort_by=sort_by,
+        reuse=False,
+    )
+    return path, view
@@ -0,0 +1,191 @@
+"""One road network shared by car, bike and walking routes.
+
+Instead of loading a separate OSM network per ``network_type``, a single
+superset network (OSMnx ``network_type="all"`` or a local extract) is loaded
+per region.  Every edge carries one travel time per mode; edges a mode may
+not use get ``inf``.  :meth:`MultimodalRoadNetwork.view` returns a
+:class:`road_csr.CSRRoadGraph` sharing the node and edge arrays with only
+the mode's travel times swapped in, so comparing all three modes costs one
+load and three searches.
+"""
+
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from osm_routing import RouteNotFoundError, load_osm_network
+from road_csr import (
+    CSRRoadGraph,
+    Coords,
+    cached_network,
+    csr_layout,
+    osm_way_edges,
+    read_osm_file,
+    way_allowed,
+    way_speed,
+)
+from routing import haversine
+
+MODES = ("drive", "bike", "walk")
+# (u, v, mode, seconds)
+ModeEdge = Tuple[Hashable, Hashable, str, float]
+_TAG_KEYS = ("highway", "maxspeed", "access", "service", "junction", "area")
+
+
+def _first(value: Any) -> Any:
+    # simplified OSMnx edges may carry a list of values of the merged ways
+    return value[0] if isinstance(value, list) and value else value
+
+
+def _edge_tags(data: Dict[str, Any]) -> Dict[str, str]:
+    return {key: str(_first(data[key])) for key in _TAG_KEYS if data.get(key) is not None}
+
+
+def _networkx_edges(G: Any) -> Iterator[ModeEdge]:
+    """Yield per-mode edges of an OSMnx ``"all"`` network."""
+    for u, v, data in G.edges(data=True):
+        tags = _edge_tags(data)
+        length = data.get("length")
+        if length is None:
+            length = haversine(
+                G.nodes[u]["y"], G.nodes[u]["x"], G.nodes[v]["y"], G.nodes[v]["x"]
+            ) * 1000.0
+        oneway = bool(data.get("oneway", False))
+        for mode in MODES:
+            if not way_allowed(tags, mode):
+                continue
+            if mode == "drive" and data.get("travel_time") is not None:
+                seconds = float(data["travel_time"])
+            else:
+                speed = data.get("speed_kph") if mode == "drive" else None
+                seconds = length / ((speed or way_speed(tags, mode)) / 3.6)
+            yield u, v, mode, seconds
+            if oneway and mode == "walk":
+                # OSMnx only keeps the legal driving direction of oneway streets
+                yield v, u, mode, seconds
+
+
+class MultimodalRoadNetwork:
+    """Shared road network with per-mode access and travel times."""
+
+    def __init__(self, base: CSRRoadGraph, weights: Dict[str, Sequence[float]]) -> None:
+        self.base = base
+        self.weights = weights
+        self._views: Dict[str, CSRRoadGraph] = {}
+
+    @classmethod
+    def from_mode_edges(
+        cls, coords: Dict[Hashable, Coords], edges: Iterable[ModeEdge]
+    ) -> "MultimodalRoadNetwork":
+        """Build the network from ``(u, v, mode, seconds)`` edges.
+
+        Parallel edges are collapsed per mode to the fastest one.
+        """
+        best: Dict[Tuple[Hashable, Hashable], List[float]] = {}
+        column = {mode: i for i, mode in enumerate(MODES)}
+        for u, v, mode, seconds in edges:
+            times = best.setdefault((u, v), [float("inf")] * len(MODES))
+            i = column[mode]
+            if seconds < times[i]:
+                times[i] = seconds
+
+        ids, offsets, targets, slots = csr_layout(list(best))
+        weights = {mode: [float("inf")] * len(slots) for mode in MODES}
+        for k, times in zip(slots, best.values()):
+            for mode, seconds in zip(MODES, times):
+                weights[mode][k] = seconds
+        base = CSRRoadGraph(
+            ids,
+            [coords[n][0] for n in ids],
+            [coords[n][1] for n in ids],
+            offsets,
+            targets,
+            weights["drive"],
+        )
+        return cls(base, weights)
+
+    @classmethod
+    def from_networkx(cls, G: Any) -> "MultimodalRoadNetwork":
+        """Convert an OSMnx graph loaded with ``network_type="all"``."""
+        coords = {n: (data["y"], data["x"]) for n, data in G.nodes(data=True)}
+        return cls.from_mode_edges(coords, _networkx_edges(G))
+
+    @classmethod
+    def from_osm_file(cls, path: str) -> "MultimodalRoadNetwork":
+        """Build the network of a local ``.osm`` or ``.pbf`` extract."""
+        coords, ways = read_osm_file(path)
+        return cls.from_mode_edges(coords, osm_way_edges(coords, ways, MODES))
+
+    def view(self, network_type: str) -> CSRRoadGraph:
+        """Return the road graph of one mode (``"drive"``, ``"bike"``, ``"walk"``)."""
+        if network_type not in self.weights:
+            raise ValueError(f"Invalid network type: {network_type}")
+        view = self._views.get(network_type)
+        if view is None:
+            view = self.base.with_weights(self.weights[network_type])
+            self._views[network_type] = view
+        return view
+
+    def covers(self, coords: Coords, margin: float = 0.0) -> bool:
+        return self.base.covers(coords, margin)
+
+    def route(
+        self, start_coords: Coords, goal_coords: Coords, network_type: str
+    ) -> Tuple[List[Coords], float]:
+        """Return ``(coords, travel_time_min)`` for one mode."""
+        return self.view(network_type).route(start_coords, goal_coords)
+
+
+def load_multimodal_network(
+    start_coords: Coords,
+    goal_coords: Coords,
+    *,
+    osm_file: Optional[str] = None,
+    box_margin: float = 0.02,
+    fallback_dist: int = 3000,
+) -> MultimodalRoadNetwork:
+    """Return the shared network covering both points, loading it only once."""
+
+    def build() -> MultimodalRoadNetwork:
+        if osm_file is not None:
+            return MultimodalRoadNetwork.from_osm_file(osm_file)
+        G = load_osm_network(
+            start_coords,
+            goal_coords,
+            "all",
+            box_margin=box_margin,
+            fallback_dist=fallback_dist,
+        )
+        return MultimodalRoadNetwork.from_networkx(G)
+
+    margin = 0.0 if osm_file is not None else box_margin / 2
+    return cached_network(("all", osm_file), start_coords, goal_coords, margin, build)
+
+
+def find_multimodal_route(
+    start_coords: Coords,
+    goal_coords: Coords,
+    network_type: str = "drive",
+    **kwargs: Any,
+) -> Tuple[List[Coords], float]:
+    """Like :func:`osm_routing.find_osm_route` but on the shared network."""
+    network = load_multimodal_network(start_coords, goal_coords, **kwargs)
+    return network.route(start_coords, goal_coords, network_type)
+
+
+def compare_modes(
+    start_coords: Coords,
+    goal_coords: Coords,
+    modes: Sequence[str] = MODES,
+    **kwargs: Any,
+) -> Dict[str, Optional[Tuple[List[Coords], float]]]:
+    """Route all ``modes`` on one shared network.
+
+    Modes without a route map to ``None``.
+    """
+    network = load_multimodal_network(start_coords, goal_coords, **kwargs)
+    results: Dict[str, Optional[Tuple[List[Coords], float]]] = {}
+    for mode in modes:
+        try:
+            results[mode] = network.route(start_coords, goal_coords, mode)
+        except RouteNotFoundError:
+            results[mode] = None
+    return results
@@ -23,23 +23,15 @@ def _route_travel_time(G: Any, path: List[Any]) -> float:
     return total
 
 
-def find_osm_route(
+def load_osm_network(
     start_coords: Tuple[float, float],
     goal_coords: Tuple[float, float],
     network_type: str = "drive",
     *,
     box_margin: float = 0.02,
     fallback_dist: int = 3000,
-) -> Tuple[List[Tuple[float, float]], float]:
-    """Return fastest route and travel time between two coordinates.
-
-    ``start_coords`` and ``goal_coords`` are ``(lat, lon)`` tuples.  The
-    function loads an OSM network covering both points, enriches it with
-    speed and travel time estimates and computes the fastest path between the
-    two points.  The resulting route is returned as a list of ``(lat, lon)``
-    coordinates together with the estimated travel time in minutes.
-    """
-
+) -> Any:
+    """Load the OSM network covering both points with travel times added."""
     north = max(start_coords[0], goal_coords[0]) + box_margin
     south = min(start_coords[0], goal_coords[0]) - box_margin
     east = max(start_coords[1], goal_coords[1]) + box_margin
@@ -67,6 +59,33 @@ def find_osm_route(
     # add speed and travel time information for each edge
     G = ox.add_edge_speeds(G)
     G = ox.add_edge_travel_times(G)
+    return G
+
+
+def find_osm_route(
+    start_coords: Tuple[float, float],
+    goal_coords: Tuple[float, float],
+    network_type: str = "drive",
+    *,
+    box_margin: float = 0.02,
+    fallback_dist: int = 3000,
+) -> Tuple[List[Tuple[float, float]], float]:
+    """Return fastest route and travel time between two coordinates.
+
+    ``start_coords`` and ``goal_coords`` are ``(lat, lon)`` tuples.  The
+    function loads an OSM network covering both points, enriches it with
+    speed and travel time estimates and computes the fastest path between the
+    two points.  The resulting route is returned as a list of ``(lat, lon)``
+    coordinates together with the estimated travel time in minutes.
+    """
+
+    G = load_osm_network(
+        start_coords,
+        goal_coords,
+        network_type,
+        box_margin=box_margin,
+        fallback_dist=fallback_dist,
+    )
 
     try:
         orig_node = ox.nearest_nodes(G, start_coords[1], start_coords[0])
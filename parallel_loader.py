@@ -0,0 +1,95 @@
+"""Load large timetable CSVs with several worker processes.
+
+The file is split into byte ranges whose boundaries are moved forward to the
+first row of a new trip, because edges are only formed between consecutive
+rows of the same trip.  Every range is parsed into plain edge tuples in a
+worker process; the main process then adds the tuples chunk by chunk to one
+graph, so the stops are keyed by name exactly as in
+:func:`routing.load_graph_from_csv`.
+"""
+
+import csv
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from graph import Graph
+from routing import EdgeArgs, csv_edges
+
+Chunk = Tuple[List[EdgeArgs], Dict[str, List[bool]], Dict[str, str]]
+
+
+def _trip_of(line: bytes, column: int) -> Optional[str]:
+    fields = next(csv.reader([line.decode("utf-8")]), None)
+    return fields[column] if fields and len(fields) > column else None
+
+
+def chunk_offsets(path: str, chunks: int) -> Tuple[List[str], List[Tuple[int, int]]]:
+    """Return the CSV header and ``chunks`` byte ranges aligned on trips."""
+    size = os.path.getsize(path)
+    with open(path, "rb") as fh:
+        header_line = fh.readline()
+        header = next(csv.reader([header_line.decode("utf-8-sig")]))
+        column = header.index("trip_id")
+        data_start = fh.tell()
+
+        offsets = [data_start]
+        for i in range(1, chunks):
+            target = data_start + (size - data_start) * i // chunks
+            if target <= offsets[-1]:
+                continue
+            fh.seek(target - 1)
+            fh.readline()  # move to the start of the next full row
+            first = fh.readline()
+            if not first:
+                break
+            trip = _trip_of(first, column)
+            while True:
+                pos = fh.tell()
+                line = fh.readline()
+                if not line or _trip_of(line, column) != trip:
+                    break
+            if offsets[-1] < pos < size:
+                offsets.append(pos)
+    offsets.append(size)
+    return header, list(zip(offsets, offsets[1:]))
+
+
+def _parse_chunk(path: str, header: List[str], start: int, end: int) -> Chunk:
+    with open(path, "rb") as fh:
+        fh.seek(start)
+        data = fh.read(end - start)
+    reader = csv.DictReader(io.StringIO(data.decode("utf-8"), newline=""), fieldnames=header)
+    services: Dict[str, List[bool]] = {}
+    headsigns: Dict[str, str] = {}
+    return list(csv_edges(reader, services, headsigns)), services, headsigns
+
+
+def load_graph_from_csv_parallel(path: str, workers: Optional[int] = None) -> Graph:
+    """Parallel variant of :func:`routing.load_graph_from_csv`.
+
+    ``workers`` defaults to the number of CPUs.  The resulting graph is the
+    same as the one of the sequential loader.
+    """
+    workers = workers or os.cpu_count() or 1
+    header, ranges = chunk_offsets(path, workers)
+
+    if workers == 1 or len(ranges) == 1:
+        results = [_parse_chunk(path, header, start, end) for start, end in ranges]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_parse_chunk, path, header, s, e) for s, e in ranges]
+            results = [f.result() for f in futures]
+
+    g = Graph()
+    for edges, services, headsigns in results:
+        for args in edges:
+            g.add_edge(*args)
+        for service_id, weekdays in services.items():
+            if service_id not in g.services:
+                g.add_service(service_id, weekdays)
+        g.headsigns.update(headsigns)
+    g.sort_edges()
+    g.touch()
+    return g
@@ -0,0 +1,364 @@
+"""Split the timetable into regional cells served by separate processes.
+
+:func:`partition_graph` divides the stops geographically into cells by
+recursive median bisection.  Connections between cells are *cut* edges; the
+stops at either end are the *boundary* stops of their cell.
+
+Every cell is handed to its own worker process (standing in for a separate
+node), which precomputes a time-dependent travel time table between all
+boundary stops of the cell.  :class:`PartitionedRouter` answers a query by
+
+1. a local search in the start cell from the start stop to its boundary,
+2. a search over the boundary stops using the cell tables and cut edges,
+3. a local search in the goal cell from its boundary stops to the goal,
+
+and asks the workers to unpack the resulting legs into a full path.  The
+earliest arrival is the same as that of a search on the whole graph.
+"""
+
+import heapq
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from graph import Edge, Graph, Node, WALK_LINE
+from routing import ArrivalTree, State, earliest_arrival_search
+
+Path = List[Tuple[str, Optional[str], float]]
+# (departure, arrival) pairs sorted by departure, both increasing
+Profile = List[Tuple[float, float]]
+
+
+@dataclass
+class Cell:
+    """One region of a partitioned timetable."""
+
+    index: int
+    graph: Graph
+    boundary: Set[str] = field(default_factory=set)
+
+
+@dataclass
+class Partitioning:
+    cells: List[Cell]
+    cell_of: Dict[str, int]
+    # connections between cells by source stop
+    cut_edges: Dict[str, List[Edge]] = field(default_factory=dict)
+    cut_walks: Dict[str, List[Tuple[str, float]]] = field(default_factory=dict)
+
+
+def _bisect_stops(stops: List[Tuple[str, float, float]], parts: int) -> List[List[str]]:
+    """Split ``stops`` into ``parts`` groups by alternating median cuts."""
+    if parts <= 1 or len(stops) <= 1:
+        return [[name for name, _, _ in stops]]
+    lats = [lat for _, lat, _ in stops]
+    lons = [lon for _, _, lon in stops]
+    axis = 1 if max(lats) - min(lats) >= max(lons) - min(lons) else 2
+    ordered = sorted(stops, key=lambda s: s[axis])
+    left_parts = parts // 2
+    mid = len(ordered) * left_parts // parts
+    return _bisect_stops(ordered[:mid], left_parts) + _bisect_stops(
+        ordered[mid:], parts - left_parts
+    )
+
+
+def partition_graph(graph: Graph, parts: int = 4) -> Partitioning:
+    """Partition ``graph`` into ``parts`` geographic cells of similar size.
+
+    Stops without coordinates are put into the first cell.
+    """
+    located = [
+        (name, node.lat, node.lon)
+        for name, node in graph.nodes.items()
+        if node.lat is not None and node.lon is not None
+    ]
+    groups = [g for g in _bisect_stops(located, parts) if g]
+    cell_of: Dict[str, int] = {}
+    for i, names in enumerate(groups):
+        for name in names:
+            cell_of[name] = i
+    for name in graph.nodes:
+        cell_of.setdefault(name, 0)
+    if not groups:
+        groups = [[]]
+
+    cells = []
+    for i in range(len(groups)):
+        sub = Graph()
+        sub.services = graph.services
+        sub.service_ranges = graph.service_ranges
+        sub.service_exceptions = graph.service_exceptions
+        cells.append(Cell(i, sub))
+
+    result = Partitioning(cells, cell_of)
+    for name, node in graph.nodes.items():
+        sub = cells[cell_of[name]].graph
+        sub.nodes[name] = Node(name=name, edges=[], lat=node.lat, lon=node.lon)
+
+    for name, node in graph.nodes.items():
+        c = cell_of[name]
+        for edge in node.edges:
+            if cell_of[edge.target] == c:
+                cells[c].graph.nodes[name].edges.append(edge)
+            else:
+                result.cut_edges.setdefault(name, []).append(edge)
+                cells[c].boundary.add(name)
+                cells[cell_of[edge.target]].boundary.add(edge.target)
+        for target, walk_time in graph.walking_neighbors(name):
+            if cell_of[target] == c:
+                cells[c].graph.add_footpath(name, target, walk_time)
+            else:
+                result.cut_walks.setdefault(name, []).append((target, walk_time))
+                cells[c].boundary.add(name)
+                cells[cell_of[target]].boundary.add(target)
+
+    for cell in cells:
+        cell.graph.sort_edges()
+    return result
+
+
+# --- worker side -----------------------------------------------------------
+
+_CELL: Optional[Cell] = None
+
+
+def _init_worker(cell: Cell) -> None:
+    global _CELL
+    _CELL = cell
+
+
+def _departure_candidates(graph: Graph, stop: str, walked: bool) -> List[float]:
+    """All times at which a journey from ``stop`` may usefully start.
+
+    A stop reached on foot (``walked``) can only be left by a vehicle.
+    """
+    times = {e.departure for e in graph.neighbors(stop)}
+    if not walked:
+        for target, walk_time in graph.walking_neighbors(stop):
+            times.update(e.departure - walk_time for e in graph.neighbors(target))
+    return sorted(times)
+
+
+def _search(
+    graph: Graph, sources: Dict[State, float], targets: Optional[List[str]] = None
+) -> ArrivalTree:
+    return earliest_arrival_search(
+        graph,
+        {stop: t for (stop, walked), t in sources.items() if not walked},
+        targets,
+        walked_sources={stop: t for (stop, walked), t in sources.items() if walked},
+    )
+
+
+def _pareto(entries: List[Tuple[float, float]]) -> Profile:
+    """Drop the entries dominated by a later departure."""
+    pareto: Profile = []
+    best = float("inf")
+    for dep, arr in reversed(entries):
+        if arr < best:
+            pareto.append((dep, arr))
+            best = arr
+    return list(reversed(pareto))
+
+
+def _worker_tables() -> Tuple[Dict[State, Dict[State, Profile]], Dict[str, Dict[str, float]]]:
+    """Compute the boundary-to-boundary tables of the worker's cell.
+
+    Returns the profiles of vehicle journeys between boundary states and
+    the constant walking times (journeys consisting only of a footpath)
+    between boundary stops.  Both ends of a profile are ``(stop, walked)``
+    states, so that the coordinator never chains two footpaths.
+    """
+    cell = _CELL
+    profiles: Dict[State, Dict[State, Profile]] = {}
+    walks: Dict[str, Dict[str, float]] = {}
+    for b in cell.boundary:
+        others = cell.boundary - {b}
+        walks[b] = {t: w for t, w in cell.graph.walking_neighbors(b) if t in others}
+        for walked in (False, True):
+            raw: Dict[State, List[Tuple[float, float]]] = {}
+            for dep in _departure_candidates(cell.graph, b, walked):
+                labels = _search(cell.graph, {(b, walked): dep}).labels
+                for state, arrival in labels.items():
+                    if state[0] in others:
+                        raw.setdefault(state, []).append((dep, arrival))
+            profiles[(b, walked)] = {state: _pareto(entries) for state, entries in raw.items()}
+    return profiles, walks
+
+
+def _worker_search(
+    sources: Dict[State, float], targets: List[str]
+) -> Dict[State, Tuple[float, State]]:
+    """Earliest arrival and originating source for each state of the targets."""
+    tree = _search(_CELL.graph, sources)
+    result = {}
+    for target in targets:
+        for state in ((target, False), (target, True)):
+            if state in tree.labels:
+                result[state] = (tree.labels[state], tree.root(*state))
+    return result
+
+
+def _worker_path(source: State, start: float, target: State) -> Optional[Path]:
+    # without targets, so that both labels of the target are final
+    return _search(_CELL.graph, {source: start}).path(*target)
+
+
+# --- coordinator -------------------------------------------------------------
+
+
+def _profile_lookup(profile: Profile, t: float) -> Optional[Tuple[float, float]]:
+    i = bisect_left(profile, (t, float("-inf")))
+    return profile[i] if i < len(profile) else None
+
+
+class PartitionedRouter:
+    """Answer earliest-arrival queries with one worker process per cell."""
+
+    def __init__(self, graph: Graph, parts: int = 4) -> None:
+        self.partitioning = partition_graph(graph, parts)
+        self.cells = self.partitioning.cells
+        self.cell_of = self.partitioning.cell_of
+        self.workers = [
+            ProcessPoolExecutor(max_workers=1, initializer=_init_worker, initargs=(cell,))
+            for cell in self.cells
+        ]
+        futures = [w.submit(_worker_tables) for w in self.workers]
+        self.profiles: Dict[str, Dict[str, Profile]] = {}
+        self.walks: Dict[str, Dict[str, float]] = {}
+        for future in futures:
+            profiles, walks = future.result()
+            self.profiles.update(profiles)
+            self.walks.update(walks)
+        for edges in self.partitioning.cut_edges.values():
+            edges.sort(key=lambda e: e.departure)
+
+    def close(self) -> None:
+        for worker in self.workers:
+            worker.shutdown()
+
+    def __enter__(self) -> "PartitionedRouter":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def _boundary_search(
+        self, start: str, start_minutes: float
+    ) -> Tuple[Dict[State, float], Dict[State, Tuple[State, str, float]]]:
+        """Earliest arrivals at all boundary states ``(stop, walked)``.
+
+        The parents are ``(previous state, kind, departure)`` with ``kind``
+        one of ``"local"`` (inside a cell), ``"edge"`` or ``"walk"``.  As in
+        :func:`routing.astar` no footpath is taken from a stop reached on
+        foot.
+        """
+        cs = self.cell_of[start]
+        source = (start, False)
+        local = self.workers[cs].submit(
+            _worker_search, {source: start_minutes}, sorted(self.cells[cs].boundary)
+        ).result()
+        labels = {state: arr for state, (arr, _) in local.items()}
+        parents = {state: (source, "local", start_minutes) for state in local if state != source}
+        heap = [(arr, stop, walked) for (stop, walked), arr in labels.items()]
+        heapq.heapify(heap)
+        done: Set[State] = set()
+        inf = float("inf")
+
+        while heap:
+            t, b, walked = heapq.heappop(heap)
+            state = (b, walked)
+            if state in done:
+                continue
+            done.add(state)
+
+            relax: List[Tuple[State, float, str, float]] = []
+            for other, profile in self.profiles.get(state, {}).items():
+                entry = _profile_lookup(profile, t)
+                if entry is not None:
+                    relax.append((other, entry[1], "local", t))
+            for edge in self.partitioning.cut_edges.get(b, []):
+                if edge.departure >= t:
+                    arr = edge.departure + edge.travel_time
+                    relax.append(((edge.target, False), arr, "edge", edge.departure))
+            if not walked:
+                for other, walk_time in self.walks.get(b, {}).items():
+                    relax.append(((other, True), t + walk_time, "local", t))
+                for other, walk_time in self.partitioning.cut_walks.get(b, []):
+                    relax.append(((other, True), t + walk_time, "walk", t))
+
+            for other, arr, kind, dep in relax:
+                # arriving on foot is only useful before arriving by vehicle
+                if other[1] and arr >= labels.get((other[0], False), inf):
+                    continue
+                if arr < labels.get(other, inf):
+                    labels[other] = arr
+                    parents[other] = (state, kind, dep)
+                    heapq.heappush(heap, (arr, other[0], other[1]))
+        return labels, parents
+
+    def _solve(self, start: str, goal: str, start_minutes: float):
+        cs, cg = self.cell_of[start], self.cell_of[goal]
+        labels, parents = self._boundary_search(start, start_minutes)
+        reached = [s for s in ((goal, False), (goal, True)) if s in labels]
+        if reached:
+            target = min(reached, key=labels.__getitem__)
+            return labels[target], target, target, labels, parents
+        sources = {s: t for s, t in labels.items() if self.cell_of[s[0]] == cg}
+        if cs == cg:
+            sources[(start, False)] = start_minutes
+        found = self.workers[cg].submit(_worker_search, sources, [goal]).result()
+        if not found:
+            return None
+        target = min(found, key=lambda s: found[s][0])
+        arrival, root = found[target]
+        return arrival, root, target, labels, parents
+
+    def earliest_arrival(self, start: str, goal: str, start_minutes: float) -> Optional[float]:
+        """Return the earliest arrival at ``goal`` or ``None``."""
+        if start not in self.cell_of or goal not in self.cell_of:
+            return None
+        if start == goal:
+            return start_minutes
+        solved = self._solve(start, goal, start_minutes)
+        return solved[0] if solved else None
+
+    def find_route(self, start: str, goal: str, start_minutes: float) -> Optional[Path]:
+        """Return the earliest arrival path in the format of ``find_route``."""
+        if start not in self.cell_of or goal not in self.cell_of:
+            return None
+        solved = self._solve(start, goal, start_minutes)
+        if solved is None:
+            return None
+        _, root, target, labels, parents = solved
+
+        # legs from the goal back to the start: (source, departure, target, kind)
+        legs = []
+        if root != target:
+            legs.append((root, labels.get(root, start_minutes), target, "local"))
+        state = root
+        while state != (start, False) and state in parents:
+            prev, kind, dep = parents[state]
+            legs.append((prev, dep, state, kind))
+            state = prev
+        legs.reverse()
+
+        path: Path = [(start, None, start_minutes)]
+        for source, dep, target, kind in legs:
+            if kind == "local":
+                cell = self.cell_of[source[0]]
+                sub = self.workers[cell].submit(_worker_path, source, dep, target).result()
+                path.extend(sub[1:])
+            elif kind == "edge":
+                line = self._cut_line(source[0], target[0], dep)
+                path.append((target[0], line, labels[target]))
+            else:
+                path.append((target[0], WALK_LINE, labels[target]))
+        return path
+
+    def _cut_line(self, source: str, target: str, departure: float) -> str:
+        for edge in self.partitioning.cut_edges[source]:
+            if edge.target == target and edge.departure == departure:
+                return edge.line
+        raise KeyError((source, target, departure))
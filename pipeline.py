@@ -0,0 +1,115 @@
+"""Overlap the stages of a routing request.
+
+A request runs through resolving start and goal, loading the road or walk
+network, the search and writing the map.  :class:`QueryPipeline` runs the
+independent parts concurrently: both addresses are geocoded at the same
+time, a network is fetched as soon as the area it has to cover is known, and
+the folium map is written in the background after the route was already
+returned.  The time the request spent waiting in each stage is recorded in
+:attr:`QueryPipeline.timings`.
+"""
+
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+
+class QueryPipeline:
+    """Thread pools and stage timings for interactive routing requests."""
+
+    def __init__(self, workers: int = 4) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="query")
+        # a single writer keeps map files of consecutive requests in order
+        self._map_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="map-writer")
+        self.timings: Dict[str, float] = {}
+        self._started = time.perf_counter()
+
+    def begin(self) -> None:
+        """Start timing a new request."""
+        self.timings = {}
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Record the wall-clock time spent in the ``with`` block as ``name``."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - started
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> "Future[Any]":
+        """Run ``fn`` in the background, e.g. to prefetch a network."""
+        return self._executor.submit(fn, *args, **kwargs)
+
+    def resolve_pair(
+        self,
+        resolve: Callable[[str], Any],
+        start_query: str,
+        goal_query: str,
+        on_resolved: Optional[Callable[[int, Any], None]] = None,
+    ) -> Tuple["Future[Any]", "Future[Any]"]:
+        """Resolve start and goal concurrently and wait for both.
+
+        ``on_resolved(index, result)`` is called as soon as one side is known
+        (0 = start, 1 = goal), so work depending only on that side can start
+        while the other one is still being resolved.  The finished futures
+        are returned; their ``result()`` raises if resolving failed.
+        """
+
+        def job(index: int, query: str) -> Any:
+            result = resolve(query)
+            # runs before the future completes, so the caller sees its effects
+            if on_resolved is not None:
+                on_resolved(index, result)
+            return result
+
+        with self.stage("Geokodierung"):
+            futures = (
+                self._executor.submit(job, 0, start_query),
+                self._executor.submit(job, 1, goal_query),
+            )
+            wait(futures)
+        return futures
+
+    def write_map(
+        self,
+        fn: Callable[..., Optional[str]],
+        *args: Any,
+        on_done: Optional[Callable[[str, float], None]] = None,
+        on_error: Optional[Callable[[Exception], None]] = None,
+        **kwargs: Any,
+    ) -> "Future[Optional[str]]":
+        """Write a map in the background.
+
+        ``on_done(filename, seconds)`` is called from the writer thread once
+        a file was written, ``on_error(exc)`` if writing failed.  Since
+        usually nobody waits for the map, the callbacks are the place to
+        report the outcome; the returned future carries the error as well.
+        """
+
+        def job() -> Optional[str]:
+            started = time.perf_counter()
+            try:
+                filename = fn(*args, **kwargs)
+            except Exception as exc:
+                if on_error is not None:
+                    on_error(exc)
+                raise
+            if filename and on_done is not None:
+                on_done(filename, time.perf_counter() - started)
+            return filename
+
+        return self._map_writer.submit(job)
+
+    def report(self) -> str:
+        """Return the stage timings of the current request as one line."""
+        parts = [f"{name} {seconds:.2f} s" for name, seconds in self.timings.items()]
+        parts.append(f"gesamt {time.perf_counter() - self._started:.2f} s")
+        return "Zeiten: " + ", ".join(parts)
+
+    def close(self) -> None:
+        """Wait for pending map writes and stop the worker threads."""
+        self._map_writer.shutdown(wait=True)
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,137 @@
+"""Apply live delay information to a loaded timetable.
+
+Delay records are read from a local feed file and patched into the departure
+times of the affected edges in place.  Every changed edge is moved to its new
+position within the departure-sorted edge list of its stop, so no stop has to
+be re-sorted as a whole.
+"""
+
+import json
+from dataclasses import dataclass
+from itertools import groupby
+from operator import attrgetter
+from typing import Any, Dict, Iterable, List, Optional
+
+from graph import Graph
+
+
+@dataclass
+class DelayUpdate:
+    """Delay of ``trip_id`` in minutes from ``stop_sequence`` onwards.
+
+    Without ``stop_sequence`` the delay applies to the whole trip.
+    """
+
+    trip_id: str
+    delay: float
+    stop_sequence: Optional[int] = None
+
+
+def _parse_gtfs_rt_entity(entity: Dict[str, Any]) -> List[DelayUpdate]:
+    """Convert a GTFS-Realtime ``TripUpdate`` entity (JSON form)."""
+    trip_update = entity.get("trip_update") or entity.get("tripUpdate")
+    if not trip_update:
+        return []
+    trip_id = trip_update["trip"].get("trip_id") or trip_update["trip"].get("tripId")
+    stop_updates = trip_update.get("stop_time_update") or trip_update.get("stopTimeUpdate") or []
+    updates = []
+    for stu in stop_updates:
+        event = stu.get("departure") or stu.get("arrival") or {}
+        if "delay" not in event:
+            continue
+        seq = stu.get("stop_sequence", stu.get("stopSequence"))
+        updates.append(DelayUpdate(trip_id, event["delay"] / 60.0, seq))
+    if not updates and "delay" in trip_update:
+        updates.append(DelayUpdate(trip_id, trip_update["delay"] / 60.0))
+    return updates
+
+
+def _load_protobuf(path: str) -> List[DelayUpdate]:
+    try:
+        from google.protobuf.json_format import MessageToDict
+        from google.transit import gtfs_realtime_pb2
+    except ImportError as exc:  # pragma: no cover - optional dependency
+        raise RuntimeError(
+            "gtfs-realtime-bindings is required to read protobuf feeds"
+        ) from exc
+
+    feed = gtfs_realtime_pb2.FeedMessage()
+    with open(path, "rb") as fh:
+        feed.ParseFromString(fh.read())
+    data = MessageToDict(feed, preserving_proto_field_name=True)
+    updates: List[DelayUpdate] = []
+    for entity in data.get("entity", []):
+        updates.extend(_parse_gtfs_rt_entity(entity))
+    return updates
+
+
+def load_delay_feed(path: str) -> List[DelayUpdate]:
+    """Read delay records from a local feed file.
+
+    Supported are JSON files with a list of ``{"trip_id", "delay",
+    "stop_sequence"}`` records (delay in minutes), the JSON form of a
+    GTFS-Realtime feed (``{"entity": [...]}``, delays in seconds) and, if
+    ``gtfs-realtime-bindings`` is installed, binary ``.pb`` feeds.
+    """
+    if path.endswith(".pb"):
+        return _load_protobuf(path)
+
+    with open(path, encoding="utf-8") as fh:
+        data = json.load(fh)
+
+    if isinstance(data, dict) and "entity" in data:
+        updates: List[DelayUpdate] = []
+        for entity in data["entity"]:
+            updates.extend(_parse_gtfs_rt_entity(entity))
+        return updates
+
+    records = data["updates"] if isinstance(data, dict) else data
+    return [
+        DelayUpdate(r["trip_id"], float(r["delay"]), r.get("stop_sequence"))
+        for r in records
+    ]
+
+
+def apply_delays(graph: Graph, updates: Iterable[DelayUpdate]) -> int:
+    """Patch the departure times of all edges affected by ``updates``.
+
+    A delay holds from its stop sequence until the next update of the same
+    trip.  Edges before the first update of a trip keep their current delay.
+    Unknown trips are ignored.  Returns the number of edges changed.
+    """
+    if not graph.edges_sorted:
+        graph.sort_edges()
+
+    changed = 0
+    by_trip = sorted(updates, key=attrgetter("trip_id"))
+    for trip_id, group in groupby(by_trip, key=attrgetter("trip_id")):
+        entries = graph.trips.get(trip_id)
+        if not entries:
+            continue
+        trip_updates = sorted(
+            group, key=lambda u: u.stop_sequence if u.stop_sequence is not None else -1
+        )
+        pos = -1
+        for seq, source, edge in entries:
+            while pos + 1 < len(trip_updates) and (
+                trip_updates[pos + 1].stop_sequence is None
+                or trip_updates[pos + 1].stop_sequence <= seq
+            ):
+                pos += 1
+            if pos < 0:
+                continue
+            delay = trip_updates[pos].delay
+            shift = delay - edge.delay
+            if shift:
+                graph.move_edge(source, edge, edge.departure + shift)
+                edge.delay = delay
+                changed += 1
+
+    if changed:
+        graph.touch()
+    return changed
+
+
+def apply_delay_feed(graph: Graph, path: str) -> int:
+    """Read ``path`` with :func:`load_delay_feed` and apply it to ``graph``."""
+    return apply_delays(graph, load_delay_feed(path))
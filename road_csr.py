@@ -0,0 +1,572 @@
+"""Road routing on compact arrays instead of networkx graphs.
+
+A :class:`CSRRoadGraph` stores the road network in compressed sparse row
+form: nodes are numbered ``0..n-1`` and the outgoing edges of node ``i`` are
+``targets[offsets[i]:offsets[i + 1]]`` with their travel times in seconds in
+``weights``.  Parallel edges are collapsed to the fastest one while the graph
+is built, so a search never has to look at them again.
+
+Graphs are created from an OSMnx graph (downloaded or loaded with
+``ox.load_graphml``) or directly from a local ``.osm`` extract; ``.pbf``
+files additionally need the optional ``osmium`` package.
+"""
+
+import copy
+import heapq
+import xml.etree.ElementTree as ET
+from array import array
+from math import cos, radians, sin, sqrt
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from osm_routing import RouteNotFoundError, load_osm_network
+from routing import haversine
+
+Coords = Tuple[float, float]
+_EARTH_M = 6_371_000.0
+# node ids and tags of an OSM way
+Way = Tuple[List[int], Dict[str, str]]
+# lat step, lon step, (min row, max row, min col, max col), nodes per cell
+_NodeGrid = Tuple[float, float, Tuple[int, int, int, int], Dict[Tuple[int, int], List[int]]]
+
+# Highway types usable per network type, following the OSMnx filters
+_EXCLUDED_HIGHWAYS = {
+    "drive": {
+        "abandoned", "bridleway", "bus_guideway", "construction", "corridor", "cycleway",
+        "elevator", "escalator", "footway", "path", "pedestrian", "planned", "platform",
+        "proposed", "raceway", "steps", "track",
+    },
+    "bike": {
+        "abandoned", "bridleway", "bus_guideway", "construction", "corridor", "elevator",
+        "escalator", "footway", "motorway", "motorway_link", "planned", "platform",
+        "proposed", "raceway", "steps",
+    },
+    "walk": {
+        "abandoned", "bus_guideway", "construction", "cycleway", "motorway", "motorway_link",
+        "planned", "platform", "proposed", "raceway",
+    },
+}
+_MODE_ACCESS_TAG = {"drive": "motor_vehicle", "bike": "bicycle", "walk": "foot"}
+_EXCLUDED_SERVICE = {"parking", "parking_aisle", "driveway", "private", "emergency_access"}
+
+# km/h for roads without a usable ``maxspeed`` tag
+_DEFAULT_SPEEDS = {
+    "motorway": 120.0, "motorway_link": 60.0, "trunk": 90.0, "trunk_link": 50.0,
+    "primary": 70.0, "primary_link": 50.0, "secondary": 60.0, "secondary_link": 50.0,
+    "tertiary": 50.0, "tertiary_link": 40.0, "unclassified": 40.0, "road": 40.0,
+    "residential": 30.0, "living_street": 7.0, "service": 20.0,
+}
+_MODE_SPEEDS = {"bike": 15.0, "walk": 4.5}
+_ZONE_SPEEDS = {"urban": 50.0, "rural": 100.0, "motorway": 130.0, "living_street": 7.0}
+
+
+def way_allowed(tags: Dict[str, str], network_type: str) -> bool:
+    """Return whether a way with ``tags`` belongs to the ``network_type`` network."""
+    highway = tags.get("highway")
+    if highway is None or tags.get("area") == "yes":
+        return False
+    if highway in _EXCLUDED_HIGHWAYS[network_type]:
+        # footways and pedestrian zones may still be signed for bikes
+        return network_type == "bike" and tags.get("bicycle") in {"yes", "designated"}
+    if tags.get("access") in {"no", "private"}:
+        return False
+    if tags.get(_MODE_ACCESS_TAG[network_type]) == "no":
+        return False
+    if network_type == "drive":
+        return tags.get("motorcar") != "no" and tags.get("service") not in _EXCLUDED_SERVICE
+    return True
+
+
+def _parse_maxspeed(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    value = value.split(";")[0].strip().lower()
+    if ":" in value:  # zone values such as "DE:urban"
+        return _ZONE_SPEEDS.get(value.split(":", 1)[1])
+    if value == "none":
+        return _ZONE_SPEEDS["motorway"]
+    factor = 1.609344 if value.endswith("mph") else 1.0
+    try:
+        return float(value.replace("mph", "").replace("km/h", "").strip()) * factor
+    except ValueError:
+        return None
+
+
+def way_speed(tags: Dict[str, str], network_type: str) -> float:
+    """Return the assumed speed in km/h on a way of ``network_type``."""
+    if network_type in _MODE_SPEEDS:
+        return _MODE_SPEEDS[network_type]
+    speed = _parse_maxspeed(tags.get("maxspeed"))
+    return speed or _DEFAULT_SPEEDS.get(tags.get("highway", ""), 30.0)
+
+
+def way_direction(tags: Dict[str, str], network_type: str) -> int:
+    """Return ``1`` (forward only), ``-1`` (backward only) or ``0`` (both)."""
+    if network_type == "walk":
+        return 0
+    oneway = tags.get("oneway")
+    if network_type == "bike" and tags.get("oneway:bicycle") == "no":
+        return 0
+    if oneway in {"yes", "true", "1"}:
+        return 1
+    if oneway == "-1":
+        return -1
+    if oneway is None and tags.get("junction") == "roundabout":
+        return 1
+    if oneway is None and tags.get("highway") == "motorway":
+        return 1
+    return 0
+
+
+def _read_osm_xml(path: str) -> Tuple[Dict[int, Coords], List[Way]]:
+    coords: Dict[int, Coords] = {}
+    ways: List[Way] = []
+    refs: List[int] = []
+    tags: Dict[str, str] = {}
+    for _, elem in ET.iterparse(path, events=("end",)):
+        if elem.tag == "node":
+            coords[int(elem.get("id"))] = (float(elem.get("lat")), float(elem.get("lon")))
+            elem.clear()
+        elif elem.tag == "nd":
+            refs.append(int(elem.get("ref")))
+        elif elem.tag == "tag":
+            tags[elem.get("k")] = elem.get("v")
+        elif elem.tag == "way":
+            if "highway" in tags:
+                ways.append((refs, tags))
+            refs, tags = [], {}
+            elem.clear()
+        elif elem.tag == "relation":
+            refs, tags = [], {}
+            elem.clear()
+    return coords, ways
+
+
+def _read_osm_pbf(path: str) -> Tuple[Dict[int, Coords], List[Way]]:
+    import osmium
+
+    coords: Dict[int, Coords] = {}
+    ways: List[Way] = []
+
+    class Handler(osmium.SimpleHandler):
+        def way(self, w: Any) -> None:
+            if "highway" not in w.tags:
+                return
+            refs = []
+            for n in w.nodes:
+                if n.location.valid():
+                    coords[n.ref] = (n.location.lat, n.location.lon)
+                    refs.append(n.ref)
+            ways.append((refs, {t.k: t.v for t in w.tags}))
+
+    Handler().apply_file(path, locations=True)
+    return coords, ways
+
+
+def read_osm_file(path: str) -> Tuple[Dict[int, Coords], List[Way]]:
+    """Return node coordinates and highway ways of a ``.osm`` or ``.pbf`` file."""
+    reader = _read_osm_pbf if path.endswith(".pbf") else _read_osm_xml
+    return reader(path)
+
+
+def osm_way_edges(
+    coords: Dict[int, Coords], ways: Iterable[Way], modes: Sequence[str]
+) -> Iterator[Tuple[int, int, str, float]]:
+    """Yield ``(u, v, mode, seconds)`` between consecutive nodes of usable ways."""
+    for refs, tags in ways:
+        for mode in modes:
+            if not way_allowed(tags, mode):
+                continue
+            metres_per_second = way_speed(tags, mode) / 3.6
+            direction = way_direction(tags, mode)
+            for u, v in zip(refs, refs[1:]):
+                if u not in coords or v not in coords or u == v:
+                    continue
+                seconds = haversine(*coords[u], *coords[v]) * 1000.0 / metres_per_second
+                if direction >= 0:
+                    yield u, v, mode, seconds
+                if direction <= 0:
+                    yield v, u, mode, seconds
+
+
+def csr_layout(
+    pairs: Sequence[Tuple[Hashable, Hashable]]
+) -> Tuple[List[Hashable], List[int], List[int], List[int]]:
+    """Number the nodes of the ``(u, v)`` edges and order the edges by source.
+
+    Returns the node ids, the CSR offsets and targets and for every pair its
+    position in the edge arrays.
+    """
+    index: Dict[Hashable, int] = {}
+    for u, v in pairs:
+        index.setdefault(u, len(index))
+        index.setdefault(v, len(index))
+
+    offsets = [0] * (len(index) + 1)
+    for u, _ in pairs:
+        offsets[index[u] + 1] += 1
+    for i in range(len(index)):
+        offsets[i + 1] += offsets[i]
+    fill = offsets[:-1]
+    targets = [0] * len(pairs)
+    slots = []
+    for u, v in pairs:
+        k = fill[index[u]]
+        targets[k] = index[v]
+        slots.append(k)
+        fill[index[u]] = k + 1
+    return list(index), offsets, targets, slots
+
+
+class CSRRoadGraph:
+    """Directed road network with travel times in seconds stored as flat arrays."""
+
+    def __init__(
+        self,
+        ids: Sequence[Hashable],
+        lats: Sequence[float],
+        lons: Sequence[float],
+        offsets: Sequence[int],
+        targets: Sequence[int],
+        weights: Sequence[float],
+    ) -> None:
+        self.ids = list(ids)
+        self.index = {osm_id: i for i, osm_id in enumerate(self.ids)}
+        self.lats = array("d", lats)
+        self.lons = array("d", lons)
+        self.offsets = array("l", offsets)
+        self.targets = array("l", targets)
+        self.weights = array("d", weights)
+        self.bbox = (
+            (min(self.lats), min(self.lons), max(self.lats), max(self.lons)) if self.ids else None
+        )
+        self._max_speed: Optional[float] = None
+        self._xyz = array("d")
+        self._usable: Optional[bytearray] = None
+        # lazily built by nearest_node, see _node_grid
+        self._grid: Optional[_NodeGrid] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.targets)
+
+    @classmethod
+    def from_edges(
+        cls,
+        coords: Dict[Hashable, Coords],
+        edges: Iterable[Tuple[Hashable, Hashable, float]],
+    ) -> "CSRRoadGraph":
+        """Build the arrays from ``(u, v, seconds)`` edges between ``coords`` nodes.
+
+        Only nodes touched by an edge are kept; of parallel edges the fastest
+        one is used.
+        """
+        best: Dict[Tuple[Hashable, Hashable], float] = {}
+        for u, v, seconds in edges:
+            key = (u, v)
+            if seconds < best.get(key, float("inf")):
+                best[key] = seconds
+
+        ids, offsets, targets, slots = csr_layout(list(best))
+        weights = [0.0] * len(slots)
+        for k, seconds in zip(slots, best.values()):
+            weights[k] = seconds
+        return cls(
+            ids,
+            [coords[n][0] for n in ids],
+            [coords[n][1] for n in ids],
+            offsets,
+            targets,
+            weights,
+        )
+
+    def with_weights(self, weights: Sequence[float]) -> "CSRRoadGraph":
+        """Return a graph sharing the node and edge arrays with other weights.
+
+        Edges weighted ``inf`` are never used by a search.
+        """
+        view = copy.copy(self)
+        view.weights = array("d", weights)
+        view._max_speed = None
+        # only snap to nodes that have at least one usable edge
+        usable = bytearray(len(self.ids))
+        for u in range(len(self.ids)):
+            for k in range(self.offsets[u], self.offsets[u + 1]):
+                if view.weights[k] != float("inf"):
+                    usable[u] = usable[self.targets[k]] = 1
+        view._usable = usable
+        view._grid = None
+        return view
+
+    @classmethod
+    def from_networkx(cls, G: Any, weight: str = "travel_time") -> "CSRRoadGraph":
+        """Convert an OSMnx graph with ``weight`` in seconds on every edge."""
+        coords = {n: (data["y"], data["x"]) for n, data in G.nodes(data=True)}
+        edges = ((u, v, t if t is not None else 0.0) for u, v, t in G.edges(data=weight))
+        return cls.from_edges(coords, edges)
+
+    @classmethod
+    def from_osm_file(cls, path: str, network_type: str = "drive") -> "CSRRoadGraph":
+        """Build the ``network_type`` road network of a local OSM extract."""
+        if network_type not in _EXCLUDED_HIGHWAYS:
+            raise ValueError(f"Invalid network type: {network_type}")
+        coords, ways = read_osm_file(path)
+        edges = osm_way_edges(coords, ways, (network_type,))
+        return cls.from_edges(coords, ((u, v, seconds) for u, v, _, seconds in edges))
+
+    def _prepare_bound(self) -> None:
+        """Compute node positions in metres and the fastest speed of any edge.
+
+        The straight chord between two points never exceeds their distance
+        along the earth, so ``chord / max_speed`` is an admissible A* bound
+        that avoids trigonometry during the search.
+        """
+        if len(self._xyz) != 3 * len(self.ids):
+            xyz = array("d", bytes(24 * len(self.ids)))
+            for i, (lat, lon) in enumerate(zip(self.lats, self.lons)):
+                phi, lam = radians(lat), radians(lon)
+                xyz[3 * i] = _EARTH_M * cos(phi) * cos(lam)
+                xyz[3 * i + 1] = _EARTH_M * cos(phi) * sin(lam)
+                xyz[3 * i + 2] = _EARTH_M * sin(phi)
+            self._xyz = xyz
+
+        speed = 0.0
+        for u in range(len(self.ids)):
+            for k in range(self.offsets[u], self.offsets[u + 1]):
+                metres, seconds = self._chord(u, self.targets[k]), self.weights[k]
+                if seconds <= 0:
+                    if metres > 0:
+                        speed = float("inf")
+                elif metres / seconds > speed:
+                    speed = metres / seconds
+        self._max_speed = speed
+
+    def _chord(self, u: int, v: int) -> float:
+        xyz = self._xyz
+        dx = xyz[3 * u] - xyz[3 * v]
+        dy = xyz[3 * u + 1] - xyz[3 * v + 1]
+        dz = xyz[3 * u + 2] - xyz[3 * v + 2]
+        return sqrt(dx * dx + dy * dy + dz * dz)
+
+    @property
+    def max_speed(self) -> float:
+        """Fastest straight-line speed in m/s of any edge (bound for A*)."""
+        if self._max_speed is None:
+            self._prepare_bound()
+        return self._max_speed
+
+    def covers(self, coords: Coords, margin: float = 0.0) -> bool:
+        """Return whether ``coords`` lies ``margin`` degrees inside the node bbox."""
+        if self.bbox is None:
+            return False
+        south, west, north, east = self.bbox
+        lat, lon = coords
+        return south + margin <= lat <= north - margin and west + margin <= lon <= east - margin
+
+    def _node_grid(self) -> _NodeGrid:
+        """Bucket the usable nodes into a grid with about two nodes per cell."""
+        if self._grid is not None:
+            return self._grid
+        south, west, north, east = self.bbox
+        kx = max(cos(radians((south + north) / 2)), 0.01)
+        # cell side in degrees of latitude
+        side = max(sqrt((north - south) * (east - west) * kx * 2 / len(self.ids)), 1e-5)
+        lat_step, lon_step = side, side / kx
+        cells: Dict[Tuple[int, int], List[int]] = {}
+        usable = self._usable
+        for i, (lat, lon) in enumerate(zip(self.lats, self.lons)):
+            if usable is None or usable[i]:
+                cells.setdefault((int(lat // lat_step), int(lon // lon_step)), []).append(i)
+        rows = [r for r, _ in cells] or [0]
+        cols = [c for _, c in cells] or [0]
+        self._grid = (lat_step, lon_step, (min(rows), max(rows), min(cols), max(cols)), cells)
+        return self._grid
+
+    def nearest_node(self, coords: Coords) -> int:
+        """Return the index of the node closest to ``(lat, lon)``.
+
+        The nodes are bucketed into a grid on the first call; a query scans
+        rings of cells around the point until no closer node can follow.
+        """
+        if not self.ids:
+            raise RouteNotFoundError("Road network is empty")
+        lat_step, lon_step, (row_min, row_max, col_min, col_max), cells = self._node_grid()
+        if not cells:
+            raise RouteNotFoundError("Road network is empty")
+        lat, lon = coords
+        kx = cos(radians(lat))
+        lats, lons = self.lats, self.lons
+        row, col = int(lat // lat_step), int(lon // lon_step)
+        # rings of cells around (row, col) that contain grid cells at all
+        first = max(0, row_min - row, row - row_max, col_min - col, col - col_max)
+        last = max(row - row_min, row_max - row, col - col_min, col_max - col)
+        # nodes in ring r are more than (r - 1) * ring_gap away
+        ring_gap = min(lat_step, lon_step * kx)
+        best, best_d = -1, float("inf")
+        for r in range(first, last + 1):
+            if best >= 0 and best_d <= ((r - 1) * ring_gap) ** 2:
+                break
+            for dr in range(-r, r + 1):
+                for dc in (range(-r, r + 1) if abs(dr) == r else (-r, r)):
+                    for i in cells.get((row + dr, col + dc), ()):
+                        d = (lats[i] - lat) ** 2 + ((lons[i] - lon) * kx) ** 2
+                        if d < best_d:
+                            best, best_d = i, d
+        return best
+
+    def shortest_path(
+        self, source: int, target: int, astar: bool = True
+    ) -> Tuple[List[int], float]:
+        """Return the fastest node sequence and its travel time in seconds.
+
+        With ``astar`` the straight-line distance to ``target`` at the fastest
+        speed of the network guides the search.
+        """
+        offsets, targets, weights = self.offsets, self.targets, self.weights
+        n = len(self.ids)
+        dist = array("d", [float("inf")]) * n
+        parent = array("l", [-1]) * n
+        done = bytearray(n)
+        dist[source] = 0.0
+        max_speed = self.max_speed if astar else 0.0
+        if 0 < max_speed < float("inf"):
+            xyz = self._xyz
+            tx, ty, tz = xyz[3 * target], xyz[3 * target + 1], xyz[3 * target + 2]
+            inv_speed = 1.0 / max_speed
+        else:
+            inv_speed = 0.0
+        heap = [(0.0, source)]
+        while heap:
+            _, u = heapq.heappop(heap)
+            if done[u]:
+                continue
+            if u == target:
+                break
+            done[u] = 1
+            du = dist[u]
+            for k in range(offsets[u], offsets[u + 1]):
+                v = targets[k]
+                dv = du + weights[k]
+                if dv < dist[v]:
+                    dist[v] = dv
+                    parent[v] = u
+                    if inv_speed:
+                        i = 3 * v
+                        dx, dy, dz = xyz[i] - tx, xyz[i + 1] - ty, xyz[i + 2] - tz
+                        chord = sqrt(dx * dx + dy * dy + dz * dz)
+                        heapq.heappush(heap, (dv + chord * inv_speed, v))
+                    else:
+                        heapq.heappush(heap, (dv, v))
+        if dist[target] == float("inf"):
+            raise RouteNotFoundError("No route found between the given coordinates")
+
+        path = [target]
+        while path[-1] != source:
+            path.append(parent[path[-1]])
+        path.reverse()
+        return path, dist[target]
+
+    def route(self, start_coords: Coords, goal_coords: Coords) -> Tuple[List[Coords], float]:
+        """Return ``(coords, travel_time_min)`` like :func:`osm_routing.find_osm_route`."""
+        source = self.nearest_node(start_coords)
+        target = self.nearest_node(goal_coords)
+        path, seconds = self.shortest_path(source, target)
+        return [(self.lats[i], self.lons[i]) for i in path], seconds / 60.0
+
+
+# recently used networks, newest last: (key, network)
+_NETWORKS: List[Tuple[Hashable, Any]] = []
+_MAX_NETWORKS = 4
+
+
+def cached_network(
+    key: Hashable,
+    start_coords: Coords,
+    goal_coords: Coords,
+    margin: float,
+    build: Callable[[], Any],
+) -> Any:
+    """Return the cached network for ``key`` covering both points or build one.
+
+    ``margin`` (degrees) keeps points near the edge of a downloaded area from
+    reusing it.
+    """
+    for i, (cached_key, network) in enumerate(_NETWORKS):
+        if cached_key != key:
+            continue
+        if network.covers(start_coords, margin) and network.covers(goal_coords, margin):
+            _NETWORKS.append(_NETWORKS.pop(i))
+            return network
+
+    network = build()
+    _NETWORKS.append((key, network))
+    del _NETWORKS[:-_MAX_NETWORKS]
+    return network
+
+
+def load_csr_network(
+    start_coords: Coords,
+    goal_coords: Coords,
+    network_type: str = "drive",
+    *,
+    osm_file: Optional[str] = None,
+    box_margin: float = 0.02,
+    fallback_dist: int = 3000,
+) -> CSRRoadGraph:
+    """Return a CSR network covering both points.
+
+    A network loaded before is reused as long as it covers both points, so
+    follow-up queries in the same area neither download nor convert again.
+    With ``osm_file`` the network is read from a local extract instead.
+    """
+
+    def build() -> CSRRoadGraph:
+        if osm_file is not None:
+            return CSRRoadGraph.from_osm_file(osm_file, network_type)
+        G = load_osm_network(
+            start_coords,
+            goal_coords,
+            network_type,
+            box_margin=box_margin,
+            fallback_dist=fallback_dist,
+        )
+        return CSRRoadGraph.from_networkx(G)
+
+    margin = 0.0 if osm_file is not None else box_margin / 2
+    return cached_network(
+        ("csr", network_type, osm_file), start_coords, goal_coords, margin, build
+    )
+
+
+def find_csr_route(
+    start_coords: Coords,
+    goal_coords: Coords,
+    network_type: str = "drive",
+    *,
+    osm_file: Optional[str] = None,
+    box_margin: float = 0.02,
+    fallback_dist: int = 3000,
+) -> Tuple[List[Coords], float]:
+    """Drop-in replacement for :func:`osm_routing.find_osm_route` on CSR arrays."""
+    csr = load_csr_network(
+        start_coords,
+        goal_coords,
+        network_type,
+        osm_file=osm_file,
+        box_margin=box_margin,
+        fallback_dist=fallback_dist,
+    )
+    return csr.route(start_coords, goal_coords)
@@ -0,0 +1,182 @@
+"""Memoisation of transit route queries.
+
+Results are keyed by stops, search direction, sort mode, service day, the
+number of searched days, the requested time rounded to a bucket and the
+graph version.  A stored journey is only reused if it is still valid for the
+exact requested time: in a forward search the new time must lie between the
+original request and the first departure of the journey, in a backward
+search between the final arrival and the original request.  In that window
+no other journey becomes possible, so the stored one is still optimal.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, List, Optional, Tuple
+
+from graph import Day, Graph, WALK_LINE
+from routing import find_route, shift_day
+from search_context import DAY
+
+Path = List[Tuple[str, Optional[str], float]]
+Entry = Tuple[float, Optional[Path], float]
+_EPS = 1e-9
+
+
+def _first_departure(
+    graph: Graph, path: Path, date: Optional[Day] = None, days: int = 1
+) -> float:
+    """Return the departure of the first vehicle leg of a forward ``path``.
+
+    With ``days > 1`` that leg may run on another day than ``date``, so
+    the timetable of every searched day is shifted by its offset, like in
+    :meth:`SearchContext.astar_days`.
+    """
+    start, _, requested = path[0]
+    if len(path) < 2:
+        return requested
+    target, line, arrival = path[1]
+    if line == WALK_LINE:
+        return requested
+    departures = []
+    for day in range(-1, days) if days > 1 else (0,):
+        searched = graph.for_day(shift_day(date, day)) if date is not None else graph
+        offset = day * DAY
+        departures.extend(
+            e.departure + offset
+            for e in searched.nodes[start].edges
+            if e.target == target
+            and e.line == line
+            and e.departure + offset >= requested
+            and abs(e.departure + offset + e.travel_time - arrival) < _EPS
+        )
+    return max(departures, default=requested)
+
+
+def _last_arrival(graph: Graph, path: Path) -> float:
+    """Return the arrival of the last vehicle leg of a backward ``path``."""
+    goal, line, requested = path[-1]
+    if len(path) < 2 or line == WALK_LINE:
+        return requested
+    source, _, departure = path[-2]
+    arrivals = [
+        e.departure + e.travel_time
+        for e in graph.nodes[source].edges
+        if e.target == goal
+        and e.line == line
+        and abs(e.departure - departure) < _EPS
+        and e.departure + e.travel_time <= requested
+    ]
+    return min(arrivals, default=requested)
+
+
+class RouteCache:
+    """LRU cache in front of :func:`routing.find_route`."""
+
+    def __init__(self, maxsize: int = 1024, bucket_minutes: float = 15.0) -> None:
+        self.maxsize = maxsize
+        self.bucket_minutes = bucket_minutes
+        self.hits = 0
+        self.misses = 0
+        # key -> (requested minutes, path, first departure / last arrival)
+        self._entries: "OrderedDict[Tuple[Any, ...], Entry]" = OrderedDict()
+        self._version: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _lookup(
+        self, key: Tuple[Any, ...], minutes: float, reverse: bool
+    ) -> Tuple[bool, Optional[Path]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            requested, path, bound = entry
+            valid = bound <= minutes <= requested if reverse else requested <= minutes <= bound
+            if not valid:
+                return False, None
+            self._entries.move_to_end(key)
+        if path is None:
+            return True, None
+        path = list(path)
+        if reverse:
+            stop, line, _ = path[-1]
+            path[-1] = (stop, line, minutes)
+        else:
+            stop, line, _ = path[0]
+            path[0] = (stop, line, minutes)
+        return True, path
+
+    def _store(self, key: Tuple[Any, ...], entry: Entry) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def find_route(
+        self,
+        graph: Graph,
+        start: str,
+        goal: str,
+        start_minutes: float,
+        *,
+        reverse: bool = False,
+        sort_by: str = "time",
+        date: Optional[Day] = None,
+        days: int = 1,
+        **kwargs: Any,
+    ) -> Optional[Path]:
+        """Cached variant of :func:`routing.find_route`.
+
+        Extra keyword arguments (e.g. ``heuristic``) bypass the cache.
+        """
+        if kwargs:
+            return find_route(
+                graph,
+                start,
+                goal,
+                start_minutes,
+                reverse=reverse,
+                sort_by=sort_by,
+                date=date,
+                days=days,
+                **kwargs,
+            )
+
+        if graph.version != self._version:
+            # the timetable changed, none of the stored journeys can be trusted
+            self.clear()
+            self._version = graph.version
+
+        bucket = int(start_minutes // self.bucket_minutes)
+        key = (start, goal, reverse, sort_by, date, days, bucket, graph.version)
+        hit, path = self._lookup(key, start_minutes, reverse)
+        if hit:
+            self.hits += 1
+            return path
+
+        self.misses += 1
+        path = find_route(
+            graph,
+            start,
+            goal,
+            start_minutes,
+            reverse=reverse,
+            sort_by=sort_by,
+            date=date,
+            days=days,
+        )
+        if path is None:
+            bound = float("-inf") if reverse else float("inf")
+        elif reverse:
+            bound = _last_arrival(graph.for_day(date) if date is not None else graph, path)
+        else:
+            bound = _first_departure(graph, path, date, days)
+        self._store(key, (start_minutes, path, bound))
+        return path
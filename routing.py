@@ -1,11 +1,18 @@
 from dataclasses import dataclass, field
-from typing import Any, Callable, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from bisect import bisect_left, bisect_right
+from operator import attrgetter
 import heapq
 import csv
 import difflib
 from math import radians, sin, cos, sqrt, atan2
+from datetime import date, timedelta
 
-from graph import Graph
+from graph import Day, Graph, WALK_LINE, WEEKDAYS
+from search_context import ServiceMask, context_for
+
+
+_departure = attrgetter("departure")
 
 
 @dataclass(order=True)
@@ -42,14 +49,27 @@ def parse_time_to_minutes(time_str: str) -> float:
     return parse_travel_time(time_str)
 
 
-def minutes_to_hhmm(minutes: float) -> str:
-    """Format minutes past midnight as ``HH:MM``."""
+def minutes_to_hhmm(minutes: float, show_day: bool = False) -> str:
+    """Format minutes past midnight as ``HH:MM``.
+
+    With ``show_day`` times on following days get a suffix like ``" (+1)"``.
+    """
+    day = int(minutes // (24 * 60))
     minutes = minutes % (24 * 60)
     hours = int(minutes // 60)
     mins = int(minutes % 60)
+    if show_day and day > 0:
+        return f"{hours:02d}:{mins:02d} (+{day})"
     return f"{hours:02d}:{mins:02d}"
 
 
+def shift_day(day: Day, days: int) -> Day:
+    """Return the service day ``days`` days after ``day``."""
+    if isinstance(day, date):
+        return day + timedelta(days=days)
+    return day + days
+
+
 def resolve_stop(query: str, stop_names: List[str], cutoff: float = 0.6) -> Optional[str]:
     """Return the closest matching stop name for ``query`` or ``None``."""
     matches = difflib.get_close_matches(query, stop_names, n=1, cutoff=cutoff)
@@ -81,35 +101,79 @@ def find_nearest_stop(graph: Graph, coords: Tuple[float, float]) -> Optional[str
     return best_stop
 
 
+def _int_or_none(value: Optional[str]) -> Optional[int]:
+    return int(value) if value else None
+
+
+# source, target, line, departure, travel_time, source/target lat/lon,
+# service_id, trip_id, stop_sequence
+EdgeArgs = Tuple[
+    str,
+    str,
+    str,
+    float,
+    float,
+    Optional[float],
+    Optional[float],
+    Optional[float],
+    Optional[float],
+    Optional[str],
+    str,
+    Optional[int],
+]
+
+
+def csv_edges(
+    rows: Iterable[Dict[str, str]],
+    services: Dict[str, List[bool]],
+    headsigns: Optional[Dict[str, str]] = None,
+) -> Iterator[EdgeArgs]:
+    """Yield the :meth:`Graph.add_edge` arguments for consecutive CSV rows.
+
+    The weekday flags of every ``service_id`` seen are stored in
+    ``services`` and non-empty ``trip_headsign`` values in ``headsigns``.
+    Rows of one trip must follow each other.
+    """
+    prev_row = None
+    for row in rows:
+        service_id = row.get("service_id") or None
+        if service_id is not None and service_id not in services and "monday" in row:
+            services[service_id] = [row[d] == "1" for d in WEEKDAYS]
+        if headsigns is not None and row.get("trip_headsign"):
+            headsigns[row["trip_id"]] = row["trip_headsign"]
+        if prev_row and row["trip_id"] == prev_row["trip_id"]:
+            yield (
+                prev_row["stop_name"],
+                row["stop_name"],
+                row["route_short_name"],
+                parse_time_to_minutes(prev_row["departure_time"]),
+                parse_travel_time(prev_row["travel_time_to_next_stop"]),
+                float(prev_row["stop_lat"]) if prev_row["stop_lat"] else None,
+                float(prev_row["stop_lon"]) if prev_row["stop_lon"] else None,
+                float(row["stop_lat"]) if row["stop_lat"] else None,
+                float(row["stop_lon"]) if row["stop_lon"] else None,
+                prev_row.get("service_id") or None,
+                prev_row["trip_id"],
+                _int_or_none(prev_row.get("stop_sequence")),
+            )
+        prev_row = row
+
+
 def load_graph_from_csv(path: str) -> Graph:
-    """Create a graph from a CSV generated by GTFS with travel times."""
+    """Create a graph from a CSV generated by GTFS with travel times.
+
+    The ``service_id`` and weekday columns are recorded so that
+    :meth:`Graph.for_day` can restrict searches to one service day.
+    """
     g = Graph()
+    services: Dict[str, List[bool]] = {}
     with open(path, newline="", encoding="utf-8") as fh:
-        reader = csv.DictReader(fh)
-        prev_row = None
-        for row in reader:
-            if prev_row and row["trip_id"] == prev_row["trip_id"]:
-                source = prev_row["stop_name"]
-                target = row["stop_name"]
-                line = row["route_short_name"]
-                travel_time = parse_travel_time(prev_row["travel_time_to_next_stop"])
-                departure = parse_time_to_minutes(prev_row["departure_time"])
-                s_lat = float(prev_row["stop_lat"]) if prev_row["stop_lat"] else None
-                s_lon = float(prev_row["stop_lon"]) if prev_row["stop_lon"] else None
-                t_lat = float(row["stop_lat"]) if row["stop_lat"] else None
-                t_lon = float(row["stop_lon"]) if row["stop_lon"] else None
-                g.add_edge(
-                    source,
-                    target,
-                    line,
-                    departure,
-                    travel_time,
-                    s_lat,
-                    s_lon,
-                    t_lat,
-                    t_lon,
-                )
-            prev_row = row
+        for args in csv_edges(csv.DictReader(fh), services, g.headsigns):
+            g.add_edge(*args)
+    for service_id, weekdays in services.items():
+        g.add_service(service_id, weekdays)
+    g.sort_edges()
+    g.touch()
     return g
 
 
@@ -173,6 +237,26 @@ def astar(
                     PrioritizedItem(priority=f_score, node=neighbor_state),
                 )
 
+        if current_line == WALK_LINE:
+            continue
+        for target, walk_time in graph.walking_neighbors(current_node):
+            arrival_actual = current_arrival + walk_time
+            if arrival_actual >= best_arrival.get(target, float("inf")):
+                continue
+            neighbor_state = (target, WALK_LINE)
+            transfer_cost = transfer_penalty if current_line is not None else 0
+            tentative_g_score = current_arrival + walk_time * time_weight + transfer_cost
+            if tentative_g_score < g_score.get(neighbor_state, float("inf")):
+                came_from[neighbor_state] = (current_node, current_line)
+                g_score[neighbor_state] = tentative_g_score
+                arrival_times[neighbor_state] = arrival_actual
+                best_arrival[target] = arrival_actual
+                f_score = tentative_g_score + heuristic(target, goal)
+                heapq.heappush(
+                    open_set,
+                    PrioritizedItem(priority=f_score, node=neighbor_state),
+                )
+
     return None
 
 
@@ -241,16 +325,289 @@ def astar_reverse(
                     PrioritizedItem(priority=f_score, node=neighbor_state),
                 )
 
+        if current_line == WALK_LINE:
+            continue
+        for target, walk_time in rev_graph.walking_neighbors(current_node):
+            departure_actual = arrival_times[current_state] - walk_time
+            if departure_actual <= best_departure.get(target, float("-inf")):
+                continue
+            neighbor_state = (target, WALK_LINE)
+            transfer_cost = transfer_penalty if current_line is not None else 0
+            tentative_time = current_time - walk_time * time_weight - transfer_cost
+            if tentative_time > best_time.get(neighbor_state, float("-inf")):
+                came_from[neighbor_state] = (current_node, current_line)
+                best_time[neighbor_state] = tentative_time
+                arrival_times[neighbor_state] = departure_actual
+                best_departure[target] = departure_actual
+                f_score = -tentative_time + heuristic(target, start)
+                heapq.heappush(
+                    open_set,
+                    PrioritizedItem(priority=f_score, node=neighbor_state),
+                )
+
     return None
 
 
+State = Tuple[str, bool]
+
+
+@dataclass
+class ArrivalTree:
+    """Result of :func:`earliest_arrival_search`.
+
+    Every stop has up to two labels, ``(stop, False)`` for arriving by
+    vehicle (or being a source) and ``(stop, True)`` for arriving on foot.
+    """
+
+    labels: Dict[State, float]
+    parents: Dict[State, Tuple[State, str]]
+
+    @property
+    def arrival(self) -> Dict[str, float]:
+        """Earliest arrival per stop."""
+        best: Dict[str, float] = {}
+        for (stop, _), t in self.labels.items():
+            if t < best.get(stop, float("inf")):
+                best[stop] = t
+        return best
+
+    def best_state(self, stop: str) -> Optional[State]:
+        states = [s for s in ((stop, False), (stop, True)) if s in self.labels]
+        return min(states, key=self.labels.__getitem__, default=None)
+
+    def path(
+        self, target: str, walked: Optional[bool] = None
+    ) -> Optional[List[Tuple[str, Optional[str], float]]]:
+        """Return the path to ``target`` in the format of :func:`find_route`.
+
+        With ``walked`` the path to that label of ``target`` is returned if
+        it exists, otherwise the one to the earliest label.
+        """
+        state = (target, walked)
+        if walked is None or state not in self.labels:
+            state = self.best_state(target)
+        if state is None:
+            return None
+        path: List[Tuple[str, Optional[str], float]] = []
+        while state in self.parents:
+            prev, line = self.parents[state]
+            path.append((state[0], line, self.labels[state]))
+            state = prev
+        path.append((state[0], None, self.labels[state]))
+        return list(reversed(path))
+
+    def root(self, target: str, walked: Optional[bool] = None) -> Optional[State]:
+        """Return the source state the path to ``target`` starts at."""
+        state = (target, walked)
+        if walked is None or state not in self.labels:
+            state = self.best_state(target)
+        if state is None:
+            return None
+        while state in self.parents:
+            state = self.parents[state][0]
+        return state
+
+
+def earliest_arrival_search(
+    graph: Graph,
+    sources: Dict[str, float],
+    targets: Optional[Iterable[str]] = None,
+    walked_sources: Optional[Dict[str, float]] = None,
+) -> ArrivalTree:
+    """One-to-many earliest arrival search from one or more source stops.
+
+    ``sources`` maps stops to their start times.  If ``targets`` is given,
+    the search stops once all of them are settled.  As in :func:`astar`
+    footpaths are not chained; ``walked_sources`` are sources that were
+    themselves reached on foot, so no footpath is taken from them.
+    """
+    inf = float("inf")
+    labels: Dict[State, float] = {(stop, False): t for stop, t in sources.items()}
+    for stop, t in (walked_sources or {}).items():
+        labels[(stop, True)] = t
+    parents: Dict[State, Tuple[State, str]] = {}
+    heap = [(t, stop, walked) for (stop, walked), t in labels.items()]
+    heapq.heapify(heap)
+    remaining = set(targets) if targets is not None else None
+    settled = set()
+
+    while heap:
+        t, stop, walked = heapq.heappop(heap)
+        if (stop, walked) in settled:
+            continue
+        settled.add((stop, walked))
+        if remaining is not None:
+            remaining.discard(stop)
+            if not remaining:
+                break
+
+        node = graph.nodes.get(stop)
+        if node is not None:
+            edges = node.edges
+            first = bisect_left(edges, t, key=_departure) if graph.edges_sorted else 0
+            for edge in edges[first:]:
+                if edge.departure < t:
+                    continue
+                arr = edge.departure + edge.travel_time
+                state = (edge.target, False)
+                if arr < labels.get(state, inf):
+                    labels[state] = arr
+                    parents[state] = ((stop, walked), edge.line)
+                    heapq.heappush(heap, (arr, edge.target, False))
+
+        if walked:
+            continue
+        for target, walk_time in graph.walking_neighbors(stop):
+            arr = t + walk_time
+            state = (target, True)
+            if arr < labels.get(state, inf) and arr < labels.get((target, False), inf):
+                labels[state] = arr
+                parents[state] = ((stop, False), WALK_LINE)
+                heapq.heappush(heap, (arr, target, True))
+
+    return ArrivalTree(labels, parents)
+
+
+Path = List[Tuple[str, Optional[str], float]]
+# legs of a journey so far as (line, boarding stop)
+Legs = Tuple[Tuple[str, str], ...]
+
+
+def _label_path(labels: List[Tuple[Any, ...]], index: int, reverse: bool) -> Path:
+    chain = []
+    while index >= 0:
+        stop, line, tau, _, _, _, parent = labels[index]
+        chain.append((stop, line, -tau if reverse else tau))
+        index = parent
+    if not reverse:
+        return list(reversed(chain))
+    # backward labels run from the start to the goal, the line of a label
+    # is the one used to reach the following stop
+    return [
+        (stop, chain[i - 1][1] if i else None, t) for i, (stop, _, t) in enumerate(chain)
+    ]
+
+
+def alternative_routes(
+    graph: Graph,
+    start: str,
+    goal: str,
+    start_minutes: float,
+    k: int = 3,
+    *,
+    reverse: bool = False,
+    sort_by: str = "time",
+    slack: float = 30.0,
+) -> List[Path]:
+    """Return up to ``k`` meaningfully different journeys from one search.
+
+    Journeys differ if they use different lines or transfer stops; later
+    trips with the same legs are not returned.  Only journeys arriving at
+    most ``slack`` minutes after the best one (departing at most ``slack``
+    minutes earlier with ``reverse``) are considered.  The journeys are
+    ordered like :func:`find_route` would rank them, the first one being
+    the optimum.
+
+    Instead of one label per ``(stop, line)`` state as in :func:`astar`,
+    each state keeps up to ``k`` labels with distinct legs, so all
+    alternatives come out of a single multi-label search.
+    """
+    if sort_by.startswith("time"):
+        penalty = 0.1
+    elif sort_by.startswith("transfers"):
+        # one transfer weighs more than any difference in time
+        penalty = 24 * 60.0
+    else:
+        raise ValueError(f"Invalid sort mode: {sort_by}")
+    if start not in graph.nodes or goal not in graph.nodes:
+        return []
+
+    # search backwards on the reversed graph with negated times, so the
+    # same code handles both directions
+    if reverse:
+        search_graph = graph.reversed()
+        search_graph.sort_edges()
+        source, target, sign = goal, start, -1.0
+    else:
+        search_graph = graph
+        source, target, sign = start, goal, 1.0
+    tau0 = sign * start_minutes
+
+    # label: (stop, line, tau, transfers, legs, visited stops, parent label)
+    labels: List[Tuple[Any, ...]] = [(source, None, tau0, 0, (), frozenset([source]), -1)]
+    heap = [(tau0, 0)]
+    settled: Dict[Tuple[str, Optional[str]], set] = {}
+    found: List[Tuple[float, int]] = []
+    limit = float("inf")
+
+    def push(stop: str, line: str, tau: float, transfers: int, legs: Legs, parent: int) -> None:
+        visited = labels[parent][5]
+        if tau > limit or stop in visited:
+            return
+        labels.append((stop, line, tau, transfers, legs, visited | {stop}, parent))
+        heapq.heappush(heap, (tau + penalty * transfers, len(labels) - 1))
+
+    while heap and len(found) < k:
+        key, index = heapq.heappop(heap)
+        stop, line, tau, transfers, legs, _, _ = labels[index]
+        if tau > limit:
+            continue
+        state_legs = settled.setdefault((stop, line), set())
+        if legs in state_legs or len(state_legs) >= k:
+            continue
+        state_legs.add(legs)
+
+        if stop == target:
+            # the legs were checked per state above, so this journey is new
+            found.append((key, index))
+            if len(found) == 1:
+                limit = tau + slack
+            continue
+
+        node = search_graph.nodes.get(stop)
+        edges = node.edges if node is not None else []
+        if reverse:
+            edges = edges[: bisect_right(edges, -tau, key=_departure)]
+        elif search_graph.edges_sorted:
+            edges = edges[bisect_left(edges, tau, key=_departure) :]
+        # later trips of a line to the same stop have the same legs, so only
+        # the earliest one per (target, line) is worth a label
+        earliest: Dict[Tuple[str, str], float] = {}
+        for edge in edges:
+            if sign * edge.departure < tau:
+                continue
+            new_tau = sign * (edge.departure + sign * edge.travel_time)
+            hop = (edge.target, edge.line)
+            if new_tau < earliest.get(hop, float("inf")):
+                earliest[hop] = new_tau
+        for (hop_target, hop_line), new_tau in earliest.items():
+            if hop_line == line:
+                push(hop_target, hop_line, new_tau, transfers, legs, index)
+            else:
+                boarded = legs + ((hop_line, stop),)
+                extra = 1 if any(leg != WALK_LINE for leg, _ in legs) else 0
+                push(hop_target, hop_line, new_tau, transfers + extra, boarded, index)
+
+        if line == WALK_LINE:
+            continue
+        for walk_target, walk_time in search_graph.walking_neighbors(stop):
+            walked = legs + ((WALK_LINE, stop),)
+            push(walk_target, WALK_LINE, tau + walk_time, transfers, walked, index)
+
+    return [_label_path(labels, index, reverse) for _, index in found]
+
+
 def null_heuristic(node: str, goal: str) -> float:
     return 0
 
 
+DEFAULT_CSV = "Vollständige_CSV_mit_Zeiten.csv"
+FALLBACK_CSV = "Test_CSV_with_travel_times.csv"
+
+
 def load_default_graph(
-    csv_file: str = "Vollständige_CSV_mit_Zeiten.csv",
-    fallback: str = "Test_CSV_with_travel_times.csv",
+    csv_file: str = DEFAULT_CSV,
+    fallback: str = FALLBACK_CSV,
 ) -> Graph:
     """Load the transit graph, falling back to a small test file."""
     try:
@@ -269,8 +626,32 @@ def find_route(
     reverse: bool = False,
     sort_by: str = "time",
     heuristic: Callable[[str, str], float] = null_heuristic,
-) -> Optional[List[Tuple[str, Optional[str], float]]]:
-    """Return a route computed by ``astar`` or ``astar_reverse``."""
+    date: Optional[Day] = None,
+    k: Optional[int] = None,
+    slack: float = 30.0,
+    reuse: bool = True,
+    days: int = 1,
+) -> Union[Optional[Path], List[Path]]:
+    """Return a route computed by ``astar`` or ``astar_reverse``.
+
+    If ``date`` (a :class:`datetime.date` or weekday number, ``0`` = Monday)
+    is given, only trips running on that day are searched.
+
+    With ``k`` a list of up to ``k`` alternative journeys within ``slack``
+    minutes of the best one is returned instead, see
+    :func:`alternative_routes`.
+
+    Forward searches run on the thread's :class:`search_context.SearchContext`
+    of the graph, which is built on the first query and reused afterwards.
+    Pass ``reuse=False`` for one-off graphs such as overlays.
+
+    With ``days > 1`` such a forward search may continue on the following
+    ``days - 1`` days, with times counting on past 1440 minutes, and may
+    also board trips of the previous day that run past midnight (24:xx
+    times).  The timetable of a following day (restricted to its services
+    if ``date`` is given) is only looked at when the search reaches the end
+    of the previous one.  Reverse and alternative searches ignore ``days``.
+    """
     if sort_by.startswith("time"):
         time_weight = 1.0
         penalty = 0.1
@@ -280,6 +661,24 @@ def find_route(
     else:
         raise ValueError(f"Invalid sort mode: {sort_by}")
 
+    multi_day = days > 1 and reuse and not reverse and k is None
+    service_mask: Optional[ServiceMask] = None
+    if date is not None and multi_day:
+        base = graph
+
+        def running_services(day: int) -> List[bool]:
+            running = shift_day(date, day)
+            return [base.service_active(s, running) for s in context_for(base).services]
+
+        service_mask = running_services
+    elif date is not None:
+        graph = graph.for_day(date)
+
+    if k is not None:
+        return alternative_routes(
+            graph, start, goal, start_minutes, k, reverse=reverse, sort_by=sort_by, slack=slack
+        )
+
     if reverse:
         return astar_reverse(
             graph,
@@ -290,6 +689,26 @@ def find_route(
             time_weight=time_weight,
             transfer_penalty=penalty,
         )
+    elif multi_day:
+        return context_for(graph).astar_days(
+            start,
+            goal,
+            start_minutes,
+            days,
+            time_weight=time_weight,
+            transfer_penalty=penalty,
+            heuristic=None if heuristic is null_heuristic else heuristic,
+            service_mask=service_mask,
+        )
+    elif reuse:
+        return context_for(graph).astar(
+            start,
+            goal,
+            start_minutes,
+            time_weight=time_weight,
+            transfer_penalty=penalty,
+            heuristic=None if heuristic is null_heuristic else heuristic,
+        )
     else:
         return astar(
             graph,
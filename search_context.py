@@ -0,0 +1,437 @@
+"""Reusable, allocation-free state for repeated ``astar`` queries.
+
+:func:`routing.astar` builds new dictionaries keyed by ``(stop, line)``
+tuples and pushes dataclass instances onto its heap for every query.  A
+:class:`SearchContext` instead numbers all ``(stop, line)`` states of a
+graph once and keeps the labels in flat arrays indexed by state number.
+Every array entry carries the number of the query (epoch) that wrote it, so
+starting a new query only increments the epoch instead of clearing the
+arrays.  The heap holds plain ``(priority, counter, state)`` tuples.
+
+:meth:`SearchContext.astar_days` lets journeys run into the following days.
+The timetable is then repeated with offsets of 1440 minutes, starting with
+the trips of the previous day that run past midnight, but a later day is
+only expanded at the stops where the search actually waits past the last
+departure of the day before.
+
+A context belongs to one graph and one thread; :func:`context_for` returns
+the calling thread's context for a graph and rebuilds it when the graph's
+:attr:`graph.Graph.version` changed.
+"""
+
+import threading
+import weakref
+from array import array
+from bisect import bisect_left
+from heapq import heappop, heappush
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from graph import Graph, WALK_LINE
+
+Path = List[Tuple[str, Optional[str], float]]
+
+# line numbers of the start state and of footpaths
+_NO_LINE = 0
+_WALK = 1
+DAY = 1440.0
+# for day ``k`` of a search: one flag per service of SearchContext.services
+ServiceMask = Callable[[int], Sequence[bool]]
+
+
+class SearchContext:
+    """Integer-indexed timetable and label arrays of one graph."""
+
+    def __init__(self, graph: Graph) -> None:
+        self.version = graph.version
+        self.stops: List[str] = list(graph.nodes)
+        self.stop_index: Dict[str, int] = {name: i for i, name in enumerate(self.stops)}
+        self.lines: List[Optional[str]] = [None, WALK_LINE]
+        # services with known operating days; other edges run every day
+        self.services: List[str] = list(graph.services)
+        service_index = {service: i for i, service in enumerate(self.services)}
+        line_index: Dict[Optional[str], int] = {None: _NO_LINE, WALK_LINE: _WALK}
+
+        # states: the start state of every stop first, further (stop, line)
+        # states are numbered as the edges and footpaths reach them
+        state_of: Dict[Tuple[int, int], int] = {}
+        state_stop = list(range(len(self.stops)))
+        state_line = [_NO_LINE] * len(self.stops)
+
+        def state(stop: int, line: int) -> int:
+            key = (stop, line)
+            s = state_of.get(key)
+            if s is None:
+                s = state_of[key] = len(state_stop)
+                state_stop.append(stop)
+                state_line.append(line)
+            return s
+
+        edge_offsets = [0]
+        departures: List[float] = []
+        travel_times: List[float] = []
+        edge_targets: List[int] = []
+        edge_lines: List[int] = []
+        edge_states: List[int] = []
+        edge_services: List[int] = []
+        walk_offsets = [0]
+        walk_times: List[float] = []
+        walk_targets: List[int] = []
+        walk_states: List[int] = []
+        for name in self.stops:
+            edges = graph.nodes[name].edges
+            if not graph.edges_sorted:
+                edges = sorted(edges, key=lambda e: e.departure)
+            for edge in edges:
+                line = line_index.get(edge.line)
+                if line is None:
+                    line = line_index[edge.line] = len(self.lines)
+                    self.lines.append(edge.line)
+                target = self.stop_index[edge.target]
+                departures.append(edge.departure)
+                travel_times.append(edge.travel_time)
+                edge_targets.append(target)
+                edge_lines.append(line)
+                edge_states.append(state(target, line))
+                edge_services.append(service_index.get(edge.service_id, -1))
+            edge_offsets.append(len(departures))
+            for target_name, walk_time in graph.walking_neighbors(name):
+                target = self.stop_index.get(target_name)
+                if target is None:
+                    continue
+                walk_times.append(walk_time)
+                walk_targets.append(target)
+                walk_states.append(state(target, _WALK))
+            walk_offsets.append(len(walk_times))
+
+        self.edge_offsets = array("l", edge_offsets)
+        self.departures = array("d", departures)
+        self.travel_times = array("d", travel_times)
+        self.edge_targets = array("l", edge_targets)
+        self.edge_lines = array("l", edge_lines)
+        self.edge_states = array("l", edge_states)
+        self.edge_services = array("l", edge_services)
+        self.walk_offsets = array("l", walk_offsets)
+        self.walk_times = array("d", walk_times)
+        self.walk_targets = array("l", walk_targets)
+        self.walk_states = array("l", walk_states)
+        self.state_stop = array("l", state_stop)
+        self.state_line = array("l", state_line)
+
+        # labels, valid only where the stamp equals the current epoch
+        n_states, n_stops = len(state_stop), len(self.stops)
+        self.g_score = array("d", bytes(8 * n_states))
+        self.arrival = array("d", bytes(8 * n_states))
+        self.came_from = array("l", bytes(8 * n_states))
+        self.stamp = array("l", bytes(8 * n_states))
+        self.best_arrival = array("d", bytes(8 * n_stops))
+        self.best_stamp = array("l", bytes(8 * n_stops))
+        # earliest arrival by vehicle, used by astar_days
+        self.best_ride = array("d", bytes(8 * n_stops))
+        self.ride_stamp = array("l", bytes(8 * n_stops))
+        self.epoch = 0
+
+    def _path(self, state: int) -> Path:
+        path = []
+        while state >= 0:
+            stop = self.stops[self.state_stop[state]]
+            path.append((stop, self.lines[self.state_line[state]], self.arrival[state]))
+            state = self.came_from[state]
+        return list(reversed(path))
+
+    def _first_day(self, stop: int, t: float, days: int) -> int:
+        """Return the first day whose last departure at ``stop`` is not missed yet.
+
+        This is ``-1`` if a trip of the previous day running past midnight
+        can still be caught, and ``days`` if there is none within the search
+        horizon.
+        """
+        lo, hi = self.edge_offsets[stop], self.edge_offsets[stop + 1]
+        if lo == hi:
+            return days
+        return min(days, max(-1, -int((self.departures[hi - 1] - t) // DAY)))
+
+    def _day_range(self, stop: int, t: float, day: int, first_day: int, masked: bool) -> range:
+        """Return the edges of ``stop`` to scan on ``day`` when waiting there from ``t``.
+
+        On the first usable day these are all edges departing after ``t``.
+        Without service masks a later day only adds the edges already
+        missed on the day before, all others are dominated by their earlier
+        copies.  With masks an edge not running on one day may run on the
+        next, so later days are scanned in full.
+        """
+        lo, hi = self.edge_offsets[stop], self.edge_offsets[stop + 1]
+        first = bisect_left(self.departures, t - day * DAY, lo, hi)
+        if day == first_day or masked:
+            return range(first, hi)
+        return range(first, bisect_left(self.departures, t - (day - 1) * DAY, first, hi))
+
+    def astar(
+        self,
+        start: str,
+        goal: str,
+        start_time: float,
+        time_weight: float = 1.0,
+        transfer_penalty: float = 5.0,
+        heuristic: Optional[Callable[[str, str], float]] = None,
+    ) -> Optional[Path]:
+        """Same search and result as :func:`routing.astar` on the context's graph.
+
+        ``heuristic`` may be left out for a plain Dijkstra search.
+        """
+        source = self.stop_index.get(start)
+        target = self.stop_index.get(goal)
+        if source is None:
+            return [(start, None, start_time)] if start == goal else None
+        if target is None:
+            target = -1
+
+        self.epoch += 1
+        epoch = self.epoch
+        g_score, arrival, came_from, stamp = self.g_score, self.arrival, self.came_from, self.stamp
+        best_arrival, best_stamp = self.best_arrival, self.best_stamp
+        departures, travel_times = self.departures, self.travel_times
+        edge_offsets, edge_targets = self.edge_offsets, self.edge_targets
+        edge_lines, edge_states = self.edge_lines, self.edge_states
+        walk_offsets, walk_times = self.walk_offsets, self.walk_times
+        walk_targets, walk_states = self.walk_targets, self.walk_states
+        state_stop, state_line = self.state_stop, self.state_line
+        stops = self.stops
+
+        # the start state of a stop has the same number as the stop
+        g_score[source] = arrival[source] = start_time
+        came_from[source] = -1
+        stamp[source] = epoch
+        best_arrival[source] = start_time
+        best_stamp[source] = epoch
+        heap = [(start_time, 0, source)]
+        counter = 1
+
+        while heap:
+            current = heappop(heap)[2]
+            stop = state_stop[current]
+            if stop == target:
+                return self._path(current)
+            line = state_line[current]
+            current_arrival = arrival[current]
+
+            hi = edge_offsets[stop + 1]
+            for k in range(bisect_left(departures, current_arrival, edge_offsets[stop], hi), hi):
+                departure = departures[k]
+                arrival_actual = departure + travel_times[k]
+                to = edge_targets[k]
+                if best_stamp[to] == epoch and arrival_actual >= best_arrival[to]:
+                    continue
+                neighbor = edge_states[k]
+                tentative = departure + travel_times[k] * time_weight
+                if line != _NO_LINE and edge_lines[k] != line:
+                    tentative += transfer_penalty
+                if stamp[neighbor] != epoch or tentative < g_score[neighbor]:
+                    stamp[neighbor] = epoch
+                    came_from[neighbor] = current
+                    g_score[neighbor] = tentative
+                    arrival[neighbor] = arrival_actual
+                    best_arrival[to] = arrival_actual
+                    best_stamp[to] = epoch
+                    if heuristic is not None:
+                        tentative += heuristic(stops[to], goal)
+                    heappush(heap, (tentative, counter, neighbor))
+                    counter += 1
+
+            if line == _WALK:
+                continue
+            for k in range(walk_offsets[stop], walk_offsets[stop + 1]):
+                arrival_actual = current_arrival + walk_times[k]
+                to = walk_targets[k]
+                if best_stamp[to] == epoch and arrival_actual >= best_arrival[to]:
+                    continue
+                neighbor = walk_states[k]
+                tentative = current_arrival + walk_times[k] * time_weight
+                if line != _NO_LINE:
+                    tentative += transfer_penalty
+                if stamp[neighbor] != epoch or tentative < g_score[neighbor]:
+                    stamp[neighbor] = epoch
+                    came_from[neighbor] = current
+                    g_score[neighbor] = tentative
+                    arrival[neighbor] = arrival_actual
+                    best_arrival[to] = arrival_actual
+                    best_stamp[to] = epoch
+                    if heuristic is not None:
+                        tentative += heuristic(stops[to], goal)
+                    heappush(heap, (tentative, counter, neighbor))
+                    counter += 1
+
+        return None
+
+    def astar_days(
+        self,
+        start: str,
+        goal: str,
+        start_time: float,
+        days: int,
+        time_weight: float = 1.0,
+        transfer_penalty: float = 5.0,
+        heuristic: Optional[Callable[[str, str], float]] = None,
+        service_mask: Optional[ServiceMask] = None,
+    ) -> Optional[Path]:
+        """Like :meth:`astar`, but journeys may continue for ``days`` days.
+
+        Times keep counting past 1440 minutes.  Day ``k`` is only looked at
+        once the search waits at a stop past its last departure of day
+        ``k - 1``.  Day ``-1`` are the trips of the previous day that run
+        past midnight (times of 24:00 and later), so a query shortly after
+        midnight can still board them.  ``service_mask(k)`` returns the
+        flags of :attr:`services` running on day ``k``; without it every day
+        runs the whole timetable.
+
+        Unlike :meth:`astar`, arrivals by vehicle are only pruned by earlier
+        arrivals by vehicle: a stop reached early on foot must not hide the
+        vehicle arrival the next morning, from which a footpath may continue.
+        """
+        source = self.stop_index.get(start)
+        target = self.stop_index.get(goal)
+        if source is None:
+            return [(start, None, start_time)] if start == goal else None
+        if target is None:
+            target = -1
+
+        self.epoch += 1
+        epoch = self.epoch
+        g_score, arrival, came_from, stamp = self.g_score, self.arrival, self.came_from, self.stamp
+        best_arrival, best_stamp = self.best_arrival, self.best_stamp
+        best_ride, ride_stamp = self.best_ride, self.ride_stamp
+        departures, travel_times = self.departures, self.travel_times
+        edge_offsets, edge_targets = self.edge_offsets, self.edge_targets
+        edge_lines, edge_states = self.edge_lines, self.edge_states
+        walk_offsets, walk_times = self.walk_offsets, self.walk_times
+        walk_targets, walk_states = self.walk_targets, self.walk_states
+        state_stop, state_line = self.state_stop, self.state_line
+        stops = self.stops
+
+        # the start state of a stop has the same number as the stop
+        g_score[source] = arrival[source] = start_time
+        came_from[source] = -1
+        stamp[source] = epoch
+        best_arrival[source] = best_ride[source] = start_time
+        best_stamp[source] = ride_stamp[source] = epoch
+        heap = [(start_time, 0, source)]
+        counter = 1
+
+        mask: Optional[ServiceMask] = None
+        if service_mask is not None:
+            masks: Dict[int, Sequence[bool]] = {}
+
+            def running_on(day: int) -> Sequence[bool]:
+                # one extra flag for edges without a known service (index -1)
+                if day not in masks:
+                    masks[day] = list(service_mask(day)) + [True]
+                return masks[day]
+
+            mask = running_on
+
+        edge_services = self.edge_services
+
+        while heap:
+            item = heappop(heap)
+            current = item[2]
+            stop = state_stop[current]
+            line = state_line[current]
+            current_arrival = arrival[current]
+            if len(item) == 4:
+                # waited at the stop until the timetable of a later day
+                day = item[3]
+                first_day = self._first_day(stop, current_arrival, days)
+            else:
+                if stop == target:
+                    return self._path(current)
+                day = first_day = self._first_day(stop, current_arrival, days)
+            if day >= days:
+                edges = range(0)
+            else:
+                edges = self._day_range(stop, current_arrival, day, first_day, mask is not None)
+                later = edges.start > edge_offsets[stop] or mask is not None
+                if day + 1 < days and later:
+                    # expanded lazily, only once the search gets there
+                    priority = departures[edge_offsets[stop]] + (day + 1) * DAY
+                    heappush(heap, (priority, counter, current, day + 1))
+                    counter += 1
+            offset = day * DAY
+            running = mask(day) if mask is not None else None
+
+            for k in edges:
+                if running is not None and not running[edge_services[k]]:
+                    continue
+                departure = departures[k] + offset
+                arrival_actual = departure + travel_times[k]
+                to = edge_targets[k]
+                if ride_stamp[to] == epoch and arrival_actual >= best_ride[to]:
+                    continue
+                neighbor = edge_states[k]
+                tentative = departure + travel_times[k] * time_weight
+                if line != _NO_LINE and edge_lines[k] != line:
+                    tentative += transfer_penalty
+                if stamp[neighbor] != epoch or tentative < g_score[neighbor]:
+                    stamp[neighbor] = epoch
+                    came_from[neighbor] = current
+                    g_score[neighbor] = tentative
+                    arrival[neighbor] = arrival_actual
+                    best_ride[to] = arrival_actual
+                    ride_stamp[to] = epoch
+                    if best_stamp[to] != epoch or arrival_actual < best_arrival[to]:
+                        best_arrival[to] = arrival_actual
+                        best_stamp[to] = epoch
+                    if heuristic is not None:
+                        tentative += heuristic(stops[to], goal)
+                    heappush(heap, (tentative, counter, neighbor))
+                    counter += 1
+
+            if len(item) == 4:
+                continue
+            if line == _WALK:
+                continue
+            for k in range(walk_offsets[stop], walk_offsets[stop + 1]):
+                arrival_actual = current_arrival + walk_times[k]
+                to = walk_targets[k]
+                if best_stamp[to] == epoch and arrival_actual >= best_arrival[to]:
+                    continue
+                neighbor = walk_states[k]
+                tentative = current_arrival + walk_times[k] * time_weight
+                if line != _NO_LINE:
+                    tentative += transfer_penalty
+                if stamp[neighbor] != epoch or tentative < g_score[neighbor]:
+                    stamp[neighbor] = epoch
+                    came_from[neighbor] = current
+                    g_score[neighbor] = tentative
+                    arrival[neighbor] = arrival_actual
+                    best_arrival[to] = arrival_actual
+                    best_stamp[to] = epoch
+                    if heuristic is not None:
+                        tentative += heuristic(stops[to], goal)
+                    heappush(heap, (tentative, counter, neighbor))
+                    counter += 1
+
+        return None
+
+
+_local = threading.local()
+_MAX_CONTEXTS = 4
+
+
+def context_for(graph: Graph) -> SearchContext:
+    """Return the calling thread's context for ``graph``.
+
+    Contexts of the last few graphs (e.g. day slices) are kept; a context is
+    rebuilt once its graph's version changed.  Graphs are referenced weakly,
+    so a replaced timetable is not kept alive by its contexts.
+    """
+    contexts: "weakref.WeakKeyDictionary[Graph, SearchContext]" = getattr(
+        _local, "contexts", None
+    )
+    if contexts is None:
+        contexts = _local.contexts = weakref.WeakKeyDictionary()
+    ctx = contexts.pop(graph, None)
+    if ctx is None or ctx.version != graph.version:
+        ctx = SearchContext(graph)
+    contexts[graph] = ctx
+    while len(contexts) > _MAX_CONTEXTS:
+        del contexts[next(iter(contexts))]
+    return ctx
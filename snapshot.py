@@ -0,0 +1,127 @@
+"""Hot reloading of the timetable for long-running processes.
+
+A :class:`TimetableStore` always holds one immutable graph snapshot.  New
+timetables are built in a background thread and then swapped in with a
+single reference assignment.  Queries read the reference once and keep
+working on that snapshot, so a reload never blocks them; old snapshots are
+freed as soon as the last query using them has finished.  The per-graph
+caches (search contexts, departure boards, direct connections) hold their
+graphs weakly and do not keep old snapshots alive.
+"""
+
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Tuple
+
+from graph import Graph
+from routing import DEFAULT_CSV, FALLBACK_CSV, find_route, load_graph_from_csv
+
+
+class TimetableStore:
+    """Holds the current timetable snapshot and replaces it on reload."""
+
+    def __init__(
+        self,
+        path: str,
+        loader: Callable[[str], Graph] = load_graph_from_csv,
+        prepare: Optional[Callable[[Graph], Any]] = None,
+    ) -> None:
+        self.path = path
+        self.loader = loader
+        self.prepare = prepare
+        self._listeners: List[Callable[[Graph], None]] = []
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="timetable-reload")
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._stamp = self._file_stamp()
+        self._graph = self._build(path)
+
+    @classmethod
+    def from_default(
+        cls,
+        csv_file: str = DEFAULT_CSV,
+        fallback: str = FALLBACK_CSV,
+        **kwargs: Any,
+    ) -> "TimetableStore":
+        """Create a store like :func:`routing.load_default_graph`."""
+        if not os.path.exists(csv_file):
+            print(f"CSV '{csv_file}' not found. Using test data instead.")
+            csv_file = fallback
+        return cls(csv_file, **kwargs)
+
+    @property
+    def graph(self) -> Graph:
+        """The current snapshot.  Hold on to it for the duration of a query."""
+        return self._graph
+
+    def add_listener(self, callback: Callable[[Graph], None]) -> None:
+        """Call ``callback`` with every new snapshot after it was swapped in.
+
+        Listeners run in the reload thread.
+        """
+        self._listeners.append(callback)
+
+    def _build(self, path: str) -> Graph:
+        graph = self.loader(path)
+        if self.prepare is not None:
+            self.prepare(graph)
+        return graph
+
+    def _file_stamp(self, path: Optional[str] = None) -> Optional[Tuple[float, int]]:
+        try:
+            st = os.stat(path or self.path)
+        except OSError:
+            return None
+        return st.st_mtime, st.st_size
+
+    def _reload(self, path: str) -> Graph:
+        # taken before loading, so a change while loading triggers another reload
+        stamp = self._file_stamp(path)
+        graph = self._build(path)
+        self.path = path
+        self._stamp = stamp
+        self._graph = graph
+        for callback in self._listeners:
+            callback(graph)
+        return graph
+
+    def reload_async(self, path: Optional[str] = None) -> "Future[Graph]":
+        """Build a new snapshot from ``path`` (default: current file) off-thread.
+
+        The returned future resolves to the new graph.  If loading fails the
+        old snapshot stays active and the future carries the exception.
+        """
+        return self._executor.submit(self._reload, path or self.path)
+
+    def find_route(self, start: str, goal: str, start_minutes: float, **kwargs: Any):
+        """Run :func:`routing.find_route` on the current snapshot."""
+        return find_route(self._graph, start, goal, start_minutes, **kwargs)
+
+    def _watch_loop(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            stamp = self._file_stamp()
+            if stamp is not None and stamp != self._stamp:
+                self._stamp = stamp
+                future = self.reload_async()
+                exc = future.exception()
+                if exc is not None:
+                    print(f"Reloading '{self.path}' failed: {exc}")
+
+    def watch(self, interval: float = 5.0) -> None:
+        """Reload automatically whenever the timetable file changes."""
+        if self._watcher is not None:
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(
+            target=self._watch_loop, args=(interval,), name="timetable-watch", daemon=True
+        )
+        self._watcher.start()
+
+    def close(self) -> None:
+        """Stop watching and wait for a running reload to finish."""
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,68 @@
+"""Prefix index over stop names for type-ahead suggestions.
+
+Stop names are normalised (case- and accent-folded, split into words) and
+every word starts one key that runs to the end of the name, so ``"zob"``
+finds ``"Knittlingen ZOB / Schule"`` as well as ``"knitt"``.  The keys are
+kept in one sorted list; a query is answered with a binary search for the
+first key starting with the normalised input and a scan over the matching
+range.  Matches are ranked by the number of departures of the stop.
+"""
+
+import heapq
+import re
+import unicodedata
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from graph import Graph
+
+_WORD = re.compile(r"\w+")
+
+
+def normalize(text: str) -> str:
+    """Return ``text`` case- and accent-folded with single spaces between words."""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    folded = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(_WORD.findall(folded))
+
+
+class StopIndex:
+    """Sorted word-prefix keys of all stop names."""
+
+    def __init__(self, names: Iterable[str], weights: Optional[Dict[str, float]] = None) -> None:
+        self.names: List[str] = list(names)
+        weights = weights or {}
+        self.weights = [weights.get(name, 0.0) for name in self.names]
+        keys: List[Tuple[str, int]] = []
+        for i, name in enumerate(self.names):
+            words = normalize(name).split(" ")
+            for w in range(len(words)):
+                keys.append((" ".join(words[w:]), i))
+        keys.sort()
+        self._keys = [key for key, _ in keys]
+        self._stops = [i for _, i in keys]
+
+    @classmethod
+    def from_graph(cls, graph: Graph) -> "StopIndex":
+        """Index all stops of ``graph`` weighted by their departures."""
+        weights = {name: float(len(node.edges)) for name, node in graph.nodes.items()}
+        return cls(graph.nodes, weights)
+
+    def suggest(self, query: str, limit: int = 8) -> List[str]:
+        """Return up to ``limit`` stop names matching ``query``, most important first.
+
+        Every word of the query has to match consecutive words of the name,
+        the last one as a prefix.
+        """
+        prefix = normalize(query)
+        if not prefix or limit <= 0:
+            return []
+        keys = self._keys
+        matches = set()
+        i = bisect_left(keys, prefix)
+        while i < len(keys) and keys[i].startswith(prefix):
+            matches.add(self._stops[i])
+            i += 1
+        weights = self.weights
+        best = heapq.nsmallest(limit, matches, key=lambda s: (-weights[s], self.names[s]))
+        return [self.names[s] for s in best]
@@ -0,0 +1,63 @@
+import unittest
+
+from departures import board_for, format_departure, next_departures
+from graph import Graph
+from realtime import DelayUpdate, apply_delays
+from routing import load_graph_from_csv
+
+
+def board_graph():
+    g = Graph()
+    for trip, start in (("t1", 10.0), ("t2", 30.0), ("t3", 50.0)):
+        g.add_edge("A", "B", "1", start, 5.0, trip_id=trip, stop_sequence=1)
+        g.add_edge("B", "C", "1", start + 5.0, 5.0, trip_id=trip, stop_sequence=2)
+    # a loop serving A twice
+    g.add_edge("A", "D", "2", 20.0, 5.0, trip_id="loop", stop_sequence=1)
+    g.add_edge("D", "A", "2", 25.0, 5.0, trip_id="loop", stop_sequence=2)
+    g.add_edge("A", "E", "2", 30.0, 5.0, trip_id="loop", stop_sequence=3)
+    g.headsigns["t3"] = "Express C"
+    g.sort_edges()
+    return g
+
+
+class DepartureBoardTests(unittest.TestCase):
+    def test_next_departures(self):
+        departures = next_departures(board_graph(), "A", 15.0, limit=3)
+        self.assertEqual([d.time for d in departures], [20.0, 30.0, 50.0])
+        self.assertEqual([d.line for d in departures], ["2", "1", "1"])
+        # headsign from the feed or the last stop of the trip
+        self.assertEqual([d.headsign for d in departures], ["E", "C", "Express C"])
+
+    def test_loop_after_first_pass(self):
+        departures = next_departures(board_graph(), "A", 21.0)
+        self.assertEqual(
+            [(d.time, d.trip_id) for d in departures], [(30.0, "t2"), (30.0, "loop"), (50.0, "t3")]
+        )
+
+    def test_limit_and_end_of_day(self):
+        g = board_graph()
+        self.assertEqual(len(next_departures(g, "A", 0.0, limit=2)), 2)
+        self.assertEqual(next_departures(g, "A", 51.0), [])
+        self.assertEqual(next_departures(g, "unknown", 0.0), [])
+
+    def test_board_follows_delays(self):
+        g = board_graph()
+        board = board_for(g)
+        self.assertIs(board_for(g), board)
+        apply_delays(g, [DelayUpdate("t1", 25.0)])
+        departures = next_departures(g, "A", 0.0, limit=2)
+        self.assertIsNot(board_for(g), board)
+        self.assertEqual([(d.time, d.trip_id) for d in departures], [(20.0, "loop"), (30.0, "t2")])
+        delayed = next_departures(g, "A", 31.0, limit=1)[0]
+        self.assertEqual((delayed.trip_id, delayed.delay), ("t1", 25.0))
+        self.assertTrue(format_departure(delayed).endswith("(+25)"))
+
+    def test_duplicate_timetable_periods_listed_once(self):
+        g = load_graph_from_csv("Test_CSV_with_travel_times.csv")
+        departures = next_departures(g, "Knittlingen ZOB / Schule", 7 * 60, limit=5, date=0)
+        times = [d.time for d in departures]
+        self.assertEqual(times, sorted(set(times)))
+
+
+if __name__ == "__main__":
+    unittest.main()
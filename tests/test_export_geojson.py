@@ -0,0 +1,71 @@
+import json
+import os
+import tempfile
+import unittest
+
+from export_geojson import coords_route_feature, export_routes, transit_route_feature
+from routing import find_route, load_graph_from_csv
+from visualization_osmnx import save_geojson_map
+
+
+class ExportTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.graph = load_graph_from_csv("Test_CSV_with_travel_times.csv")
+        cls.path = find_route(
+            cls.graph, "Oberderdingen Freibad", "Knittlingen ZOB / Schule", 14 * 60 + 29
+        )
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def features(self):
+        yield transit_route_feature(self.graph, self.path, {"id": 1})
+        yield transit_route_feature(self.graph, [("Unbekannt", None, 0.0)])
+        yield coords_route_feature([(49.0, 8.4), (49.1, 8.5)], travel_time=12.345)
+
+    def test_feature_collection(self):
+        filename = os.path.join(self.tmpdir.name, "routes.geojson")
+        writer = export_routes(self.features(), filename)
+        with open(filename, encoding="utf-8") as fh:
+            data = json.load(fh)
+        self.assertEqual(writer.count, 2)
+        self.assertEqual(data["type"], "FeatureCollection")
+        transit, osm = data["features"]
+        self.assertEqual(transit["properties"]["stops"][0], "Oberderdingen Freibad")
+        self.assertEqual(transit["properties"]["id"], 1)
+        self.assertEqual(len(transit["geometry"]["coordinates"]), len(self.path))
+        self.assertEqual(osm["geometry"]["coordinates"][0], [8.4, 49.0])
+        self.assertEqual(osm["properties"]["travel_time_min"], 12.35)
+        self.assertEqual(data["bbox"], writer.bbox)
+        self.assertLessEqual(writer.bbox[0], 8.4)
+
+    def test_ndjson(self):
+        filename = os.path.join(self.tmpdir.name, "routes.ndjson")
+        export_routes(self.features(), filename)
+        with open(filename, encoding="utf-8") as fh:
+            lines = [json.loads(line) for line in fh]
+        self.assertEqual([f["properties"]["mode"] for f in lines], ["transit", "osm"])
+
+    def test_empty_export_is_valid(self):
+        filename = os.path.join(self.tmpdir.name, "empty.geojson")
+        export_routes([], filename)
+        with open(filename, encoding="utf-8") as fh:
+            self.assertEqual(json.load(fh)["features"], [])
+
+    def test_map_uses_writer_format(self):
+        data_file = os.path.join(self.tmpdir.name, "routes.txt")
+        writer = export_routes(self.features(), data_file, fmt="ndjson")
+        filename = os.path.join(self.tmpdir.name, "routes_map.html")
+        save_geojson_map(data_file, filename, writer.bbox, writer.fmt)
+        with open(filename, encoding="utf-8") as fh:
+            html = fh.read()
+        self.assertIn('fetch("routes.txt")', html)
+        self.assertIn("if (true)", html)
+
+
+if __name__ == "__main__":
+    unittest.main()
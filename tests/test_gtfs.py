@@ -0,0 +1,113 @@
+import csv
+import io
+import os
+import tempfile
+import unittest
+import zipfile
+
+from gtfs import load_graph_from_gtfs
+from routing import load_graph_from_csv, find_route
+
+CSV_FILE = "Test_CSV_with_travel_times.csv"
+DAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+
+def _gtfs_time(value):
+    return value.split(" days ")[-1]
+
+
+def write_gtfs_from_csv(csv_path, zip_path):
+    """Split the pre-joined test CSV into a minimal GTFS feed."""
+    with open(csv_path, newline="", encoding="utf-8") as fh:
+        rows = list(csv.DictReader(fh))
+
+    tables = {
+        "stops.txt": (["stop_id", "stop_name", "stop_lat", "stop_lon"], {}),
+        "routes.txt": (["route_id", "route_short_name", "route_type"], {}),
+        "trips.txt": (["route_id", "service_id", "trip_id", "trip_headsign"], {}),
+        "calendar.txt": (["service_id"] + DAYS + ["start_date", "end_date"], {}),
+    }
+    stop_times = []
+    for row in rows:
+        tables["stops.txt"][1][row["stop_id"]] = row
+        tables["routes.txt"][1][row["route_id"]] = row
+        tables["trips.txt"][1][row["trip_id"]] = row
+        tables["calendar.txt"][1][row["service_id"]] = dict(
+            row, start_date="20250101", end_date="20251231"
+        )
+        stop_times.append(
+            {
+                "trip_id": row["trip_id"],
+                "arrival_time": _gtfs_time(row["arrival_time"]),
+                "departure_time": _gtfs_time(row["departure_time"]),
+                "stop_id": row["stop_id"],
+                "stop_sequence": row["stop_sequence"],
+            }
+        )
+
+    with zipfile.ZipFile(zip_path, "w") as archive:
+        for name, (fields, entries) in tables.items():
+            with archive.open(name, "w") as raw, _text(raw) as fh:
+                writer = csv.DictWriter(fh, fieldnames=fields, extrasaction="ignore")
+                writer.writeheader()
+                writer.writerows(entries.values())
+        with archive.open("stop_times.txt", "w") as raw, _text(raw) as fh:
+            writer = csv.DictWriter(fh, fieldnames=list(stop_times[0]))
+            writer.writeheader()
+            writer.writerows(stop_times)
+
+
+def _text(raw):
+    return io.TextIOWrapper(raw, encoding="utf-8", newline="")
+
+
+class GTFSLoaderTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        cls.zip_path = os.path.join(cls.tmpdir.name, "feed.zip")
+        write_gtfs_from_csv(CSV_FILE, cls.zip_path)
+        cls.csv_graph = load_graph_from_csv(CSV_FILE)
+        cls.gtfs_graph = load_graph_from_gtfs(cls.zip_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmpdir.cleanup()
+
+    def test_same_stops(self):
+        self.assertEqual(set(self.csv_graph.nodes), set(self.gtfs_graph.nodes))
+        node = self.gtfs_graph.nodes["Oberderdingen Freibad"]
+        self.assertAlmostEqual(node.lat, 49.05840313, places=5)
+
+    def test_same_edges(self):
+        def edge_set(graph):
+            return sorted(
+                (src, e.target, e.line, e.departure, e.travel_time)
+                for src, node in graph.nodes.items()
+                for e in node.edges
+            )
+
+        self.assertEqual(edge_set(self.csv_graph), edge_set(self.gtfs_graph))
+
+    def test_calendar(self):
+        from datetime import date
+
+        self.assertEqual(set(self.gtfs_graph.services), set(self.csv_graph.services))
+        service = next(iter(self.gtfs_graph.services))
+        self.assertTrue(self.gtfs_graph.service_active(service, date(2025, 6, 6)))
+        # outside of the calendar validity range
+        self.assertFalse(self.gtfs_graph.service_active(service, date(2026, 6, 5)))
+
+    def test_find_route(self):
+        path = find_route(
+            self.gtfs_graph,
+            "Oberderdingen Freibad",
+            "Knittlingen ZOB / Schule",
+            start_minutes=14 * 60 + 29,
+        )
+        self.assertIsNotNone(path)
+        self.assertEqual(path[-1][0], "Knittlingen ZOB / Schule")
+
+
+if __name__ == "__main__":
+    unittest.main()
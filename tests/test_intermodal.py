@@ -0,0 +1,36 @@
+import unittest
+
+from graph import Graph, WALK_LINE
+from intermodal import find_intermodal_route, walking_times
+
+
+class IntermodalTests(unittest.TestCase):
+    def setUp(self):
+        self.graph = Graph()
+        self.graph.add_edge("A", "B", "1", 10.0, 5.0, 49.0, 8.0, 49.1, 8.0)
+        self.graph.add_edge("A2", "B", "2", 12.0, 1.0, 49.0, 8.004, 49.1, 8.0)
+
+    def test_walking_times(self):
+        times = walking_times(self.graph, (49.0, 8.002), radius_m=500.0)
+        self.assertEqual(set(times), {"A", "A2"})
+        self.assertAlmostEqual(times["A"], times["A2"], places=3)
+
+    def test_door_to_door(self):
+        path, view = find_intermodal_route(
+            self.graph, (49.0, 8.002), (49.1, 8.003), 0.0, radius_m=500.0
+        )
+        self.assertEqual([p[0] for p in path], ["Start", "A2", "B", "Ziel"])
+        self.assertEqual([p[1] for p in path], [None, WALK_LINE, "2", WALK_LINE])
+        self.assertIn("Ziel", view.nodes)
+        self.assertNotIn("Ziel", self.graph.nodes)
+        self.assertNotIn("Start", self.graph.footpaths)
+
+    def test_out_of_range(self):
+        path, _ = find_intermodal_route(
+            self.graph, (49.0, 8.1), (49.1, 8.003), 0.0, radius_m=500.0
+        )
+        self.assertIsNone(path)
+
+
+if __name__ == "__main__":
+    unittest.main()
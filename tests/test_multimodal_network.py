@@ -0,0 +1,109 @@
+import os
+import sys
+import tempfile
+import types
+import unittest
+
+sys.modules.setdefault("osmnx", types.ModuleType("osmnx"))
+sys.modules.setdefault("networkx", types.ModuleType("networkx"))
+
+import road_csr
+from multimodal_network import MultimodalRoadNetwork, compare_modes
+
+OSM_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6">
+  <node id="1" lat="49.000" lon="8.700"/>
+  <node id="2" lat="49.000" lon="8.710"/>
+  <node id="3" lat="49.010" lon="8.710"/>
+  <node id="4" lat="49.010" lon="8.700"/>
+  <node id="5" lat="49.0001" lon="8.6999"/>
+  <way id="10">
+    <nd ref="1"/><nd ref="2"/><nd ref="3"/>
+    <tag k="highway" v="residential"/><tag k="oneway" v="yes"/>
+  </way>
+  <way id="11">
+    <nd ref="3"/><nd ref="4"/>
+    <tag k="highway" v="primary"/><tag k="maxspeed" v="70"/>
+  </way>
+  <way id="12">
+    <nd ref="4"/><nd ref="5"/><nd ref="1"/>
+    <tag k="highway" v="footway"/>
+  </way>
+</osm>
+"""
+
+
+class FakeMultiDiGraph:
+    def __init__(self, nodes, edges):
+        self.nodes_data = nodes
+        self.edge_list = edges
+
+    def nodes(self, data=False):
+        return list(self.nodes_data.items())
+
+    def edges(self, data=False):
+        return list(self.edge_list)
+
+
+class MultimodalNetworkTests(unittest.TestCase):
+    def setUp(self):
+        fd, self.osm_file = tempfile.mkstemp(suffix=".osm")
+        with os.fdopen(fd, "w") as fh:
+            fh.write(OSM_XML)
+        road_csr._NETWORKS.clear()
+        self.network = MultimodalRoadNetwork.from_osm_file(self.osm_file)
+
+    def tearDown(self):
+        os.remove(self.osm_file)
+        road_csr._NETWORKS.clear()
+
+    def test_views_share_topology(self):
+        drive = self.network.view("drive")
+        walk = self.network.view("walk")
+        self.assertIs(drive.targets, walk.targets)
+        self.assertIs(drive.offsets, walk.offsets)
+        self.assertIs(self.network.view("drive"), drive)
+        with self.assertRaises(ValueError):
+            self.network.view("rail")
+
+    def test_mode_access(self):
+        # the car has to go round the block, walking uses the footway
+        coords, _ = self.network.route((49.0, 8.7), (49.01, 8.7), "drive")
+        self.assertEqual(len(coords), 4)
+        coords, _ = self.network.route((49.0, 8.7), (49.01, 8.7), "walk")
+        self.assertEqual(coords[-2], (49.0001, 8.6999))
+        # walking may go against the oneway street
+        coords, _ = self.network.route((49.0, 8.71), (49.0, 8.7), "walk")
+        self.assertEqual(len(coords), 2)
+
+    def test_drive_snaps_to_drivable_node(self):
+        coords, _ = self.network.route((49.0001, 8.6999), (49.01, 8.71), "drive")
+        self.assertEqual(coords[0], (49.0, 8.7))
+
+    def test_compare_modes_loads_once(self):
+        results = compare_modes((49.0, 8.7), (49.01, 8.7), osm_file=self.osm_file)
+        self.assertEqual(set(results), {"drive", "bike", "walk"})
+        self.assertEqual(len(road_csr._NETWORKS), 1)
+        self.assertLess(results["drive"][1], results["walk"][1] * 4)
+        self.assertLess(results["bike"][1], results["walk"][1])
+
+    def test_from_networkx_adds_walking_against_oneway(self):
+        G = FakeMultiDiGraph(
+            {1: {"y": 49.0, "x": 8.7}, 2: {"y": 49.0, "x": 8.71}},
+            [
+                (1, 2, {"highway": "residential", "oneway": True, "length": 730.0,
+                        "travel_time": 60.0}),
+                (1, 2, {"highway": ["footway", "path"], "length": 700.0}),
+            ],
+        )
+        network = MultimodalRoadNetwork.from_networkx(G)
+        _, minutes = network.route((49.0, 8.7), (49.0, 8.71), "drive")
+        self.assertAlmostEqual(minutes, 1.0)
+        _, minutes = network.route((49.0, 8.7), (49.0, 8.71), "walk")
+        self.assertAlmostEqual(minutes, 0.7 / 4.5 * 60)
+        _, minutes = network.route((49.0, 8.71), (49.0, 8.7), "walk")
+        self.assertAlmostEqual(minutes, 0.73 / 4.5 * 60)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import csv
+import unittest
+
+from parallel_loader import chunk_offsets, load_graph_from_csv_parallel
+from routing import load_graph_from_csv
+
+CSV_FILE = "Test_CSV_with_travel_times.csv"
+
+
+def edge_set(graph):
+    return sorted(
+        (src, e.target, e.line, e.departure, e.travel_time, e.trip_id)
+        for src, node in graph.nodes.items()
+        for e in node.edges
+    )
+
+
+class ParallelLoaderTests(unittest.TestCase):
+    def test_chunks_start_with_new_trip(self):
+        header, ranges = chunk_offsets(CSV_FILE, 5)
+        self.assertEqual(len(ranges), 5)
+        column = header.index("trip_id")
+        with open(CSV_FILE, "rb") as fh:
+            for (start, _), (prev_start, _) in zip(ranges[1:], ranges):
+                fh.seek(start)
+                first = next(csv.reader([fh.readline().decode("utf-8")]))
+                fh.seek(prev_start)
+                chunk = fh.read(start - prev_start).decode("utf-8").splitlines()
+                last = next(csv.reader([chunk[-1]]))
+                self.assertNotEqual(first[column], last[column])
+
+    def test_same_graph_as_sequential(self):
+        expected = load_graph_from_csv(CSV_FILE)
+        for workers in (1, 3):
+            graph = load_graph_from_csv_parallel(CSV_FILE, workers)
+            self.assertEqual(edge_set(graph), edge_set(expected))
+            self.assertEqual(graph.services, expected.services)
+            self.assertEqual(
+                {n: (v.lat, v.lon) for n, v in graph.nodes.items()},
+                {n: (v.lat, v.lon) for n, v in expected.nodes.items()},
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+
+from partition import PartitionedRouter, partition_graph
+from graph import Graph
+from routing import find_route, load_graph_from_csv
+from transfers import compute_footpaths
+
+
+class PartitionTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.graph = load_graph_from_csv("Test_CSV_with_travel_times.csv")
+        compute_footpaths(cls.graph)
+        cls.router = PartitionedRouter(cls.graph, parts=3)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.router.close()
+
+    def test_partition_covers_all_edges(self):
+        part = partition_graph(self.graph, parts=4)
+        self.assertEqual(len(part.cells), 4)
+        self.assertEqual(set(part.cell_of), set(self.graph.nodes))
+        inner = sum(len(n.edges) for c in part.cells for n in c.graph.nodes.values())
+        cut = sum(len(edges) for edges in part.cut_edges.values())
+        total = sum(len(n.edges) for n in self.graph.nodes.values())
+        self.assertEqual(inner + cut, total)
+        for source, edges in part.cut_edges.items():
+            for edge in edges:
+                self.assertIn(source, part.cells[part.cell_of[source]].boundary)
+                self.assertIn(edge.target, part.cells[part.cell_of[edge.target]].boundary)
+
+    def test_matches_single_process(self):
+        names = sorted(self.graph.nodes)
+        for start_minutes in (6 * 60, 12 * 60 + 5, 14 * 60 + 29):
+            for start in names[::3]:
+                for goal in names:
+                    if start == goal:
+                        continue
+                    expected = find_route(self.graph, start, goal, start_minutes)
+                    arrival = self.router.earliest_arrival(start, goal, start_minutes)
+                    if expected is None:
+                        self.assertIsNone(arrival)
+                    else:
+                        self.assertAlmostEqual(arrival, expected[-1][2])
+
+    def test_path(self):
+        start, goal = "Oberderdingen Freibad", "Knittlingen ZOB / Schule"
+        path = self.router.find_route(start, goal, 14 * 60 + 29)
+        expected = find_route(self.graph, start, goal, 14 * 60 + 29)
+        self.assertEqual(path[0][0], start)
+        self.assertEqual(path[-1][0], goal)
+        self.assertAlmostEqual(path[-1][2], expected[-1][2])
+        times = [t for _, _, t in path]
+        self.assertEqual(times, sorted(times))
+
+
+class FootpathChainTests(unittest.TestCase):
+    def test_no_chained_footpaths(self):
+        # A, B in one cell and C, D in the other; B -> C and C -> D are
+        # footpaths, which find_route does not chain
+        g = Graph()
+        g.add_edge("A", "B", "1", 5.0, 5.0, 49.0, 8.0, 49.0, 8.01)
+        g.add_edge("C", "D", "2", 30.0, 5.0, 49.0, 8.02, 49.0, 8.03)
+        g.add_edge("D", "C", "2", 40.0, 5.0)
+        g.add_footpath("B", "C", 2.0)
+        g.add_footpath("C", "B", 2.0)
+        g.add_footpath("C", "D", 2.0)
+        g.add_footpath("D", "C", 2.0)
+        with PartitionedRouter(g, parts=2) as router:
+            self.assertEqual(router.cell_of["A"], router.cell_of["B"])
+            self.assertNotEqual(router.cell_of["B"], router.cell_of["C"])
+            for start in g.nodes:
+                for goal in g.nodes:
+                    if start == goal:
+                        continue
+                    for start_minutes in (0.0, 8.0, 20.0, 33.0):
+                        expected = find_route(g, start, goal, start_minutes)
+                        arrival = router.earliest_arrival(start, goal, start_minutes)
+                        path = router.find_route(start, goal, start_minutes)
+                        if expected is None:
+                            self.assertIsNone(arrival, (start, goal, start_minutes))
+                            continue
+                        self.assertEqual(arrival, expected[-1][2], (start, goal, start_minutes))
+                        self.assertEqual(path[-1][2], arrival)
+                        lines = [line for _, line, _ in path]
+                        self.assertNotIn(("walk", "walk"), list(zip(lines, lines[1:])))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import threading
+import time
+import unittest
+
+from pipeline import QueryPipeline
+
+
+class QueryPipelineTests(unittest.TestCase):
+    def setUp(self):
+        self.pipeline = QueryPipeline()
+        self.pipeline.begin()
+
+    def tearDown(self):
+        self.pipeline.close()
+
+    def test_resolves_concurrently(self):
+        def resolve(query):
+            time.sleep(0.2)
+            return query.upper()
+
+        started = time.perf_counter()
+        start, goal = self.pipeline.resolve_pair(resolve, "a", "b")
+        self.assertLess(time.perf_counter() - started, 0.35)
+        self.assertEqual((start.result(), goal.result()), ("A", "B"))
+        self.assertIn("Geokodierung", self.pipeline.timings)
+
+    def test_on_resolved_runs_before_other_side(self):
+        seen = []
+        goal_done = threading.Event()
+
+        def resolve(query):
+            if query == "goal":
+                time.sleep(0.2)
+                goal_done.set()
+            return query
+
+        def on_resolved(index, result):
+            seen.append((index, result, goal_done.is_set()))
+
+        self.pipeline.resolve_pair(resolve, "start", "goal", on_resolved)
+        time.sleep(0.05)
+        self.assertIn((0, "start", False), seen)
+        self.assertEqual(sorted(i for i, _, _ in seen), [0, 1])
+
+    def test_failed_side_raises_on_result(self):
+        def resolve(query):
+            if query == "bad":
+                raise ValueError("not found")
+            return query
+
+        start, goal = self.pipeline.resolve_pair(resolve, "ok", "bad")
+        self.assertEqual(start.result(), "ok")
+        with self.assertRaises(ValueError):
+            goal.result()
+
+    def test_map_written_in_background(self):
+        done = []
+
+        def write(name):
+            time.sleep(0.2)
+            return name
+
+        started = time.perf_counter()
+        future = self.pipeline.write_map(write, "map.html", on_done=lambda f, s: done.append(f))
+        self.assertLess(time.perf_counter() - started, 0.1)
+        self.assertEqual(future.result(), "map.html")
+        self.assertEqual(done, ["map.html"])
+
+    def test_map_errors_are_passed_on(self):
+        def write():
+            raise OSError("disk full")
+
+        errors = []
+        future = self.pipeline.write_map(write, on_error=errors.append)
+        self.assertIsInstance(future.exception(), OSError)
+        self.assertEqual([str(exc) for exc in errors], ["disk full"])
+
+    def test_report_lists_stages(self):
+        with self.pipeline.stage("Route"):
+            pass
+        report = self.pipeline.report()
+        self.assertTrue(report.startswith("Zeiten: Route "))
+        self.assertIn("gesamt", report)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import json
+import os
+import tempfile
+import unittest
+
+from realtime import DelayUpdate, apply_delays, load_delay_feed
+from routing import load_graph_from_csv
+
+TRIP = "1.T0.10-143-C-j25-1.10.R"
+
+
+class DelayTests(unittest.TestCase):
+    def setUp(self):
+        self.graph = load_graph_from_csv("Test_CSV_with_travel_times.csv")
+
+    def assert_sorted(self):
+        for node in self.graph.nodes.values():
+            deps = [e.departure for e in node.edges]
+            self.assertEqual(deps, sorted(deps))
+
+    def test_apply_from_stop_sequence(self):
+        before = [(seq, e.departure) for seq, _, e in self.graph.trips[TRIP]]
+        version = self.graph.version
+        changed = apply_delays(self.graph, [DelayUpdate(TRIP, 7.0, stop_sequence=3)])
+        after = [(seq, e.departure) for seq, _, e in self.graph.trips[TRIP]]
+        self.assertEqual(changed, len([s for s, _ in before if s >= 3]))
+        for (seq, old), (_, new) in zip(before, after):
+            self.assertEqual(new - old, 7.0 if seq >= 3 else 0.0)
+        self.assertNotEqual(self.graph.version, version)
+        self.assert_sorted()
+
+    def test_updates_replace_previous_delay(self):
+        first = self.graph.trips[TRIP][0][2]
+        scheduled = first.departure
+        apply_delays(self.graph, [DelayUpdate(TRIP, 30.0)])
+        apply_delays(self.graph, [DelayUpdate(TRIP, 2.0)])
+        self.assertEqual(first.departure, scheduled + 2.0)
+        self.assertEqual(apply_delays(self.graph, [DelayUpdate(TRIP, 2.0)]), 0)
+        self.assert_sorted()
+
+    def test_load_feed_formats(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            plain = os.path.join(tmp, "delays.json")
+            with open(plain, "w", encoding="utf-8") as fh:
+                json.dump([{"trip_id": TRIP, "delay": 4, "stop_sequence": 2}], fh)
+            self.assertEqual(load_delay_feed(plain), [DelayUpdate(TRIP, 4.0, 2)])
+
+            rt = os.path.join(tmp, "feed.json")
+            entity = {
+                "trip_update": {
+                    "trip": {"trip_id": TRIP},
+                    "stop_time_update": [{"stop_sequence": 5, "departure": {"delay": 180}}],
+                }
+            }
+            with open(rt, "w", encoding="utf-8") as fh:
+                json.dump({"entity": [entity]}, fh)
+            self.assertEqual(load_delay_feed(rt), [DelayUpdate(TRIP, 3.0, 5)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+import heapq
+import math
+import os
+import random
+import sys
+import tempfile
+import types
+import unittest
+
+sys.modules.setdefault("osmnx", types.ModuleType("osmnx"))
+sys.modules.setdefault("networkx", types.ModuleType("networkx"))
+
+import road_csr
+from osm_routing import RouteNotFoundError
+from road_csr import CSRRoadGraph, load_csr_network
+
+OSM_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6">
+  <node id="1" lat="49.000" lon="8.700"/>
+  <node id="2" lat="49.000" lon="8.710"/>
+  <node id="3" lat="49.010" lon="8.710"/>
+  <node id="4" lat="49.010" lon="8.700"/>
+  <way id="10">
+    <nd ref="1"/><nd ref="2"/><nd ref="3"/>
+    <tag k="highway" v="residential"/><tag k="oneway" v="yes"/>
+  </way>
+  <way id="11">
+    <nd ref="3"/><nd ref="4"/>
+    <tag k="highway" v="primary"/><tag k="maxspeed" v="70"/>
+  </way>
+  <way id="12">
+    <nd ref="4"/><nd ref="1"/>
+    <tag k="highway" v="footway"/>
+  </way>
+</osm>
+"""
+
+
+def brute_force(coords, edges, source, target):
+    dist = {source: 0.0}
+    heap = [(0.0, source)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        for a, b, w in edges:
+            if a == u and d + w < dist.get(b, float("inf")):
+                dist[b] = d + w
+                heapq.heappush(heap, (d + w, b))
+    return dist.get(target)
+
+
+class FakeMultiDiGraph:
+    def __init__(self, nodes, edges):
+        self._nodes = nodes
+        self._edges = edges
+
+    def nodes(self, data=False):
+        return list(self._nodes.items())
+
+    def edges(self, data=None):
+        return [(u, v, attrs.get(data)) for u, v, attrs in self._edges]
+
+
+class CSRRoadGraphTests(unittest.TestCase):
+    def setUp(self):
+        fd, self.osm_file = tempfile.mkstemp(suffix=".osm")
+        with os.fdopen(fd, "w") as fh:
+            fh.write(OSM_XML)
+        road_csr._NETWORKS.clear()
+
+    def tearDown(self):
+        os.remove(self.osm_file)
+
+    def test_parallel_edges_collapse_to_minimum(self):
+        coords = {"a": (49.0, 8.7), "b": (49.0, 8.71)}
+        csr = CSRRoadGraph.from_edges(coords, [("a", "b", 30.0), ("a", "b", 20.0)])
+        self.assertEqual(csr.edge_count, 1)
+        self.assertEqual(list(csr.weights), [20.0])
+
+    def test_from_networkx(self):
+        G = FakeMultiDiGraph(
+            {1: {"y": 49.0, "x": 8.7}, 2: {"y": 49.0, "x": 8.71}},
+            [(1, 2, {"travel_time": 60.0}), (1, 2, {"travel_time": 45.0})],
+        )
+        csr = CSRRoadGraph.from_networkx(G)
+        coords, minutes = csr.route((49.0, 8.7), (49.0, 8.71))
+        self.assertEqual(coords, [(49.0, 8.7), (49.0, 8.71)])
+        self.assertAlmostEqual(minutes, 0.75)
+
+    def test_matches_brute_force(self):
+        rng = random.Random(3)
+        n = 12
+        coords = {(i, j): (49.0 + i * 0.001, 8.7 + j * 0.0015) for i in range(n) for j in range(n)}
+        edges = []
+        for (i, j) in coords:
+            for di, dj in ((0, 1), (1, 0), (0, -1), (-1, 0)):
+                if (i + di, j + dj) in coords and rng.random() < 0.8:
+                    edges.append(((i, j), (i + di, j + dj), rng.uniform(5, 30)))
+        csr = CSRRoadGraph.from_edges(coords, edges)
+        for _ in range(30):
+            s, t = rng.sample(list(csr.index), 2)
+            expected = brute_force(coords, edges, s, t)
+            for astar in (False, True):
+                if expected is None:
+                    with self.assertRaises(RouteNotFoundError):
+                        csr.shortest_path(csr.index[s], csr.index[t], astar)
+                    continue
+                path, seconds = csr.shortest_path(csr.index[s], csr.index[t], astar)
+                self.assertAlmostEqual(seconds, expected)
+                self.assertEqual((csr.ids[path[0]], csr.ids[path[-1]]), (s, t))
+
+    def test_nearest_node_matches_scan(self):
+        rng = random.Random(5)
+        coords = {
+            i: (49.0 + rng.uniform(0, 0.05), 8.7 + rng.uniform(0, 0.08)) for i in range(400)
+        }
+        edges = [(i, i + 1, 10.0) for i in range(399)]
+        csr = CSRRoadGraph.from_edges(coords, edges)
+        # a view without the edges leaving the first 200 nodes
+        weights = [0.0] * csr.edge_count
+        for u in range(len(csr)):
+            for k in range(csr.offsets[u], csr.offsets[u + 1]):
+                weights[k] = float("inf") if csr.ids[u] < 200 else 10.0
+        view = csr.with_weights(weights)
+
+        def scan(graph, lat, lon, usable):
+            kx = math.cos(math.radians(lat))
+            return min(
+                (i for i in range(len(graph)) if usable(i)),
+                key=lambda i: (graph.lats[i] - lat) ** 2 + ((graph.lons[i] - lon) * kx) ** 2,
+            )
+
+        for _ in range(200):
+            # also points well outside the network
+            lat, lon = 49.0 + rng.uniform(-0.1, 0.15), 8.7 + rng.uniform(-0.1, 0.2)
+            self.assertEqual(csr.nearest_node((lat, lon)), scan(csr, lat, lon, lambda i: True))
+            self.assertEqual(
+                view.nearest_node((lat, lon)), scan(view, lat, lon, lambda i: view.ids[i] >= 200)
+            )
+
+    def test_osm_file_respects_mode_rules(self):
+        drive = CSRRoadGraph.from_osm_file(self.osm_file, "drive")
+        walk = CSRRoadGraph.from_osm_file(self.osm_file, "walk")
+        # oneway residential plus two-way primary, no footway
+        self.assertEqual(drive.edge_count, 4)
+        self.assertEqual(walk.edge_count, 8)
+
+        coords, minutes = drive.route((49.0, 8.7), (49.01, 8.7))
+        self.assertEqual(len(coords), 4)
+        # against the oneway direction the car cannot get back to node 1
+        with self.assertRaises(RouteNotFoundError):
+            drive.route((49.01, 8.7), (49.0, 8.7))
+        coords, minutes = walk.route((49.0, 8.7), (49.01, 8.7))
+        self.assertEqual(len(coords), 2)
+        self.assertAlmostEqual(minutes, 1.112 / 4.5 * 60, places=0)
+
+    def test_network_reused_while_covering(self):
+        first = load_csr_network((49.0, 8.7), (49.01, 8.71), "walk", osm_file=self.osm_file)
+        again = load_csr_network((49.005, 8.705), (49.01, 8.7), "walk", osm_file=self.osm_file)
+        self.assertIs(first, again)
+        other = load_csr_network((49.0, 8.7), (49.01, 8.71), "drive", osm_file=self.osm_file)
+        self.assertIsNot(first, other)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+
+from graph import Graph
+from realtime import DelayUpdate, apply_delays
+from route_cache import RouteCache
+from routing import find_route, load_graph_from_csv
+
+START = "Oberderdingen Freibad"
+GOAL = "Knittlingen ZOB / Schule"
+
+
+class RouteCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.graph = load_graph_from_csv("Test_CSV_with_travel_times.csv")
+        self.cache = RouteCache(maxsize=4, bucket_minutes=30.0)
+
+    def test_hit_matches_fresh_search(self):
+        for minutes in (14 * 60 + 20, 14 * 60 + 25, 14 * 60 + 29, 14 * 60 + 31):
+            for reverse in (False, True):
+                cached = self.cache.find_route(self.graph, START, GOAL, minutes, reverse=reverse)
+                fresh = find_route(self.graph, START, GOAL, minutes, reverse=reverse)
+                self.assertEqual(cached, fresh)
+        self.assertGreater(self.cache.hits, 0)
+
+    def test_lru_eviction(self):
+        for minutes in range(6 * 60, 12 * 60, 60):
+            self.cache.find_route(self.graph, START, GOAL, minutes)
+        self.assertEqual(len(self.cache), 4)
+
+    def test_invalidated_on_timetable_change(self):
+        minutes = 14 * 60 + 20
+        self.cache.find_route(self.graph, START, GOAL, minutes)
+        trip = next(iter(self.graph.trips))
+        apply_delays(self.graph, [DelayUpdate(trip, 3.0)])
+        path = self.cache.find_route(self.graph, START, GOAL, minutes)
+        self.assertEqual(self.cache.hits, 0)
+        self.assertEqual(path, find_route(self.graph, START, GOAL, minutes))
+
+    def test_hit_for_next_morning_journey(self):
+        g = Graph()
+        g.add_edge("A", "B", "1", 6 * 60.0, 10.0)
+        for minutes in (23 * 60 + 5, 23 * 60 + 20):
+            cached = self.cache.find_route(g, "A", "B", minutes, days=2)
+            self.assertEqual(cached, find_route(g, "A", "B", minutes, days=2))
+        self.assertEqual(cached[-1], ("B", "1", 1440 + 6 * 60.0 + 10.0))
+        self.assertEqual(self.cache.hits, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,5 @@
 import unittest
+from datetime import date
 from routing import (
     parse_travel_time,
     parse_time_to_minutes,
@@ -6,7 +7,24 @@ from routing import (
     load_graph_from_csv,
     find_route,
     find_nearest_stop,
+    astar,
+    null_heuristic,
 )
+from graph import Graph
+from search_context import SearchContext, context_for
+
+
+def alternatives_graph():
+    """A -> C directly with line 1, or via B with lines 2 and 3."""
+    g = Graph()
+    g.add_edge("A", "C", "1", 10.0, 20.0)
+    g.add_edge("A", "C", "1", 40.0, 20.0)
+    g.add_edge("A", "B", "2", 5.0, 5.0)
+    g.add_edge("B", "C", "3", 12.0, 10.0)
+    g.add_edge("A", "B", "4", 6.0, 5.0)
+    g.sort_edges()
+    return g
+
 
 class RoutingTests(unittest.TestCase):
     @classmethod
@@ -24,6 +42,8 @@ class RoutingTests(unittest.TestCase):
     def test_minutes_to_hhmm(self):
         self.assertEqual(minutes_to_hhmm(75), "01:15")
         self.assertEqual(minutes_to_hhmm(24 * 60 + 5), "00:05")
+        self.assertEqual(minutes_to_hhmm(24 * 60 + 5, show_day=True), "00:05 (+1)")
+        self.assertEqual(minutes_to_hhmm(75, show_day=True), "01:15")
 
     def test_load_graph(self):
         self.assertIn("Oberderdingen Freibad", self.graph.nodes)
@@ -40,11 +60,160 @@ class RoutingTests(unittest.TestCase):
         self.assertEqual(path[0][0], start)
         self.assertEqual(path[-1][0], goal)
 
+    def test_service_day_slicing(self):
+        def edge_count(graph):
+            return sum(len(node.edges) for node in graph.nodes.values())
+
+        monday = self.graph.for_day(0)
+        friday = self.graph.for_day(4)
+        saturday = self.graph.for_day(5)
+        self.assertLess(edge_count(monday), edge_count(friday))
+        self.assertLessEqual(edge_count(friday), edge_count(self.graph))
+        self.assertEqual(edge_count(saturday), 0)
+        self.assertIs(self.graph.for_day(1), monday)
+
+    def test_find_route_with_date(self):
+        from datetime import date
+
+        start = "Oberderdingen Freibad"
+        goal = "Knittlingen ZOB / Schule"
+        start_time = 14 * 60 + 29
+        # 2025-06-02 is a Monday, 2025-06-07 a Saturday
+        path = find_route(self.graph, start, goal, start_time, date=date(2025, 6, 2))
+        self.assertIsNotNone(path)
+        self.assertIsNone(find_route(self.graph, start, goal, start_time, date=date(2025, 6, 7)))
+
+    def test_alternatives_match_single_route(self):
+        start = "Oberderdingen Freibad"
+        goal = "Knittlingen ZOB / Schule"
+        path = find_route(self.graph, start, goal, 14 * 60 + 29)
+        alternatives = find_route(self.graph, start, goal, 14 * 60 + 29, k=3)
+        self.assertGreaterEqual(len(alternatives), 1)
+        self.assertEqual(alternatives[0][-1][2], path[-1][2])
+
     def test_find_nearest_stop(self):
         stop = find_nearest_stop(self.graph, (49.0584, 8.7970))
         self.assertEqual(stop, "Oberderdingen Freibad")
 
 
+class AlternativeRouteTests(unittest.TestCase):
+    def test_distinct_journeys_in_cost_order(self):
+        alternatives = find_route(alternatives_graph(), "A", "C", 0.0, k=5)
+        lines = [[line for _, line, _ in path[1:]] for path in alternatives]
+        self.assertEqual(lines, [["2", "3"], ["4", "3"], ["1"]])
+        # the later trip of line 1 has the same legs and is left out
+        self.assertEqual(alternatives[2][-1][2], 30.0)
+
+    def test_slack_limits_alternatives(self):
+        alternatives = find_route(alternatives_graph(), "A", "C", 0.0, k=5, slack=5.0)
+        self.assertEqual(len(alternatives), 2)
+
+    def test_fewest_transfers_first(self):
+        alternatives = find_route(alternatives_graph(), "A", "C", 0.0, k=2, sort_by="transfers")
+        self.assertEqual([line for _, line, _ in alternatives[0]], [None, "1"])
+
+    def test_reverse_alternatives(self):
+        alternatives = find_route(alternatives_graph(), "A", "C", 35.0, k=5, reverse=True)
+        self.assertEqual(alternatives[0], [("A", None, 10.0), ("C", "1", 35.0)])
+        self.assertEqual(alternatives[1][0], ("A", None, 6.0))
+        self.assertEqual(len(alternatives), 3)
+
+
+class SearchContextTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.graph = load_graph_from_csv("Test_CSV_with_travel_times.csv")
+
+    def test_same_paths_as_astar(self):
+        ctx = SearchContext(self.graph)
+        stops = list(self.graph.nodes)
+        for time_weight, penalty in ((1.0, 0.1), (0.0, 1.0)):
+            for start in stops:
+                for goal in stops:
+                    expected = astar(
+                        self.graph, start, goal, null_heuristic, 14 * 60, time_weight, penalty
+                    )
+                    path = ctx.astar(start, goal, 14 * 60, time_weight, penalty)
+                    self.assertEqual(path, expected, (start, goal))
+
+    def test_footpaths(self):
+        g = Graph()
+        g.add_edge("A", "B", "1", 0.0, 5.0)
+        g.add_edge("C", "D", "2", 10.0, 5.0)
+        g.add_footpath("B", "C", 3.0)
+        path = SearchContext(g).astar("A", "D", 0.0)
+        self.assertEqual(
+            path, [("A", None, 0.0), ("B", "1", 5.0), ("C", "walk", 8.0), ("D", "2", 15.0)]
+        )
+
+    def test_context_rebuilt_after_change(self):
+        g = alternatives_graph()
+        ctx = context_for(g)
+        self.assertIs(context_for(g), ctx)
+        g.add_edge("A", "C", "5", 1.0, 2.0)
+        g.touch()
+        self.assertIsNot(context_for(g), ctx)
+        self.assertEqual(find_route(g, "A", "C", 0.0)[-1], ("C", "5", 3.0))
+
+
+class MultiDayTests(unittest.TestCase):
+    def night_graph(self):
+        g = Graph()
+        g.add_service("weekdays", [True] * 5 + [False] * 2)
+        g.add_edge("A", "B", "1", 7 * 60.0, 10.0, service_id="weekdays")
+        g.add_edge("B", "C", "2", 8 * 60.0, 10.0)
+        g.add_edge("B", "C", "3", 23 * 60.0, 10.0)
+        g.sort_edges()
+        return g
+
+    def test_next_morning(self):
+        g = self.night_graph()
+        self.assertIsNone(find_route(g, "A", "C", 23 * 60 + 40))
+        path = find_route(g, "A", "C", 23 * 60 + 40, days=2)
+        self.assertEqual(path[1], ("B", "1", 24 * 60 + 430.0))
+        self.assertEqual(path[-1], ("C", "2", 24 * 60 + 490.0))
+
+    def test_later_copy_of_missed_trip(self):
+        # line 3 is missed on the first day, but its next-day copy beats waiting
+        g = self.night_graph()
+        path = find_route(g, "B", "C", 23 * 60 + 30, days=3)
+        self.assertEqual(path[-1], ("C", "2", 24 * 60 + 490.0))
+        path = find_route(g, "B", "C", 9 * 60, days=2)
+        self.assertEqual(path[-1], ("C", "3", 23 * 60 + 10.0))
+
+    def test_services_of_following_days(self):
+        g = self.night_graph()
+        # Friday evening: line 1 runs again on Monday
+        friday = date(2025, 6, 6)
+        self.assertIsNone(find_route(g, "A", "C", 23 * 60, date=friday, days=3))
+        path = find_route(g, "A", "C", 23 * 60, date=friday, days=4)
+        self.assertEqual(path[1], ("B", "1", 3 * 24 * 60 + 430.0))
+        path = find_route(g, "A", "C", 23 * 60, date=4, days=4)
+        self.assertEqual(path[1], ("B", "1", 3 * 24 * 60 + 430.0))
+
+    def test_night_trips_of_previous_day(self):
+        g = Graph()
+        g.add_service("weekdays", [True] * 5 + [False] * 2)
+        g.add_edge("A", "B", "N", 24 * 60 + 15.0, 10.0, service_id="weekdays")
+        g.sort_edges()
+        self.assertEqual(find_route(g, "A", "B", 10.0, days=2)[-1], ("B", "N", 25.0))
+        # Saturday 00:10 still has Friday's night trip, Sunday only Monday's
+        saturday = find_route(g, "A", "B", 10.0, date=date(2025, 6, 7), days=2)
+        self.assertEqual(saturday[-1][2], 25.0)
+        sunday = find_route(g, "A", "B", 10.0, date=date(2025, 6, 8), days=2)
+        self.assertEqual(sunday[-1][2], 2 * 24 * 60 + 25.0)
+
+    def test_same_day_unchanged(self):
+        graph = load_graph_from_csv("Test_CSV_with_travel_times.csv")
+        stops = list(graph.nodes)[:15]
+        for start in stops:
+            for goal in stops:
+                expected = find_route(graph, start, goal, 10 * 60)
+                path = find_route(graph, start, goal, 10 * 60, days=2)
+                if expected is not None:
+                    self.assertEqual(path[-1][2], expected[-1][2], (start, goal))
+
+
 class ClassifyQueryTests(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
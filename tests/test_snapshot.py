@@ -0,0 +1,77 @@
+import gc
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import weakref
+
+from departures import board_for
+from search_context import context_for
+from snapshot import TimetableStore
+from transfer_patterns import connections_for
+
+CSV_FILE = "Test_CSV_with_travel_times.csv"
+
+
+class TimetableStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "timetable.csv")
+        shutil.copy(CSV_FILE, self.path)
+        self.store = TimetableStore(self.path)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmpdir.cleanup()
+
+    def truncate_timetable(self):
+        with open(CSV_FILE, encoding="utf-8") as fh:
+            lines = fh.readlines()[:3]
+        with open(self.path, "w", encoding="utf-8") as fh:
+            fh.writelines(lines)
+
+    def test_reload_swaps_snapshot(self):
+        old = self.store.graph
+        self.truncate_timetable()
+        new = self.store.reload_async().result()
+        self.assertIs(self.store.graph, new)
+        self.assertLess(len(new.nodes), len(old.nodes))
+        # queries holding the old snapshot still see the old timetable
+        self.assertIn("Knittlingen ZOB / Schule", old.nodes)
+
+    def test_failed_reload_keeps_snapshot(self):
+        old = self.store.graph
+        future = self.store.reload_async(os.path.join(self.tmpdir.name, "missing.csv"))
+        self.assertIsInstance(future.exception(), FileNotFoundError)
+        self.assertIs(self.store.graph, old)
+
+    def test_old_snapshot_freed(self):
+        old = self.store.graph
+        context_for(old)
+        board_for(old).next_departures("Oberderdingen Freibad", 0.0)
+        connections_for(old)
+        ref = weakref.ref(old)
+        del old
+        self.store.reload_async().result()
+        gc.collect()
+        self.assertIsNone(ref())
+
+    def test_manual_reload_updates_stamp(self):
+        self.truncate_timetable()
+        self.store.reload_async().result()
+        self.assertEqual(self.store._stamp, self.store._file_stamp())
+
+    def test_watch_triggers_reload(self):
+        old = self.store.graph
+        self.store.watch(interval=0.01)
+        self.truncate_timetable()
+        os.utime(self.path, (time.time() + 10, time.time() + 10))
+        deadline = time.time() + 5
+        while self.store.graph is old and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertIsNot(self.store.graph, old)
+
+
+if __name__ == "__main__":
+    unittest.main()
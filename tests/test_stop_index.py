@@ -0,0 +1,39 @@
+import unittest
+
+from graph import Graph
+from routing import load_graph_from_csv
+from stop_index import StopIndex, normalize
+
+
+class StopIndexTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.index = StopIndex.from_graph(load_graph_from_csv("Test_CSV_with_travel_times.csv"))
+
+    def test_normalize(self):
+        self.assertEqual(normalize("Großvillars  Bühl / Ort"), "grossvillars buhl ort")
+
+    def test_inner_word_prefix(self):
+        self.assertEqual(self.index.suggest("ZOB"), ["Knittlingen ZOB / Schule"])
+        self.assertEqual(self.index.suggest("zob sch"), ["Knittlingen ZOB / Schule"])
+
+    def test_prefix_of_first_word(self):
+        names = self.index.suggest("knitt", limit=20)
+        self.assertIn("Knittlingen ZOB / Schule", names)
+        self.assertTrue(all(name.startswith("Knittlingen") for name in names))
+        self.assertEqual(self.index.suggest("knitt", limit=2), names[:2])
+
+    def test_ranked_by_departures(self):
+        g = Graph()
+        g.add_edge("Bahnhof Süd", "Markt", "1", 0.0, 5.0)
+        for departure in range(3):
+            g.add_edge("Bahnhof Nord", "Markt", "1", float(departure), 5.0)
+        index = StopIndex.from_graph(g)
+        self.assertEqual(index.suggest("bahnhof"), ["Bahnhof Nord", "Bahnhof Süd"])
+        self.assertEqual(index.suggest("sud"), ["Bahnhof Süd"])
+        self.assertEqual(index.suggest(""), [])
+        self.assertEqual(index.suggest("xyz"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
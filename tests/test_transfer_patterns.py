@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+
+from graph import Graph
+from routing import earliest_arrival_search, load_graph_from_csv
+from transfer_patterns import (
+    TransferPatterns,
+    compute_transfer_patterns,
+    find_route_with_patterns,
+    journey_pattern,
+)
+from transfers import compute_footpaths
+
+
+def same_line_graph():
+    """Line 1 runs A -> B twice and B -> C once, so A -> C changes at B."""
+    g = Graph()
+    g.add_edge("A", "B", "1", 10.0, 5.0, trip_id="t1", stop_sequence=1)
+    g.add_edge("A", "B", "1", 40.0, 5.0, trip_id="t2", stop_sequence=1)
+    g.add_edge("B", "C", "1", 20.0, 5.0, trip_id="t3", stop_sequence=1)
+    g.add_edge("C", "D", "2", 30.0, 5.0, trip_id="t4", stop_sequence=1)
+    g.sort_edges()
+    return g
+
+
+class TransferPatternTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.graph = load_graph_from_csv("Test_CSV_with_travel_times.csv")
+        compute_footpaths(cls.graph, radius_m=600.0)
+        cls.patterns = compute_transfer_patterns(cls.graph)
+
+    def test_change_between_trips_of_one_line(self):
+        g = same_line_graph()
+        path = earliest_arrival_search(g, {"A": 0.0}).path("C")
+        self.assertEqual(journey_pattern(path), (("A", False), ("C", False)))
+        self.assertEqual(journey_pattern(path, g), (("A", False), ("B", False), ("C", False)))
+        route = compute_transfer_patterns(g, ["A"]).route(g, "A", "D", 0.0)
+        self.assertEqual(route[-1], ("D", "2", 35.0))
+
+    def test_matches_earliest_arrival(self):
+        monday = self.graph.for_day(0)
+        stops = list(monday.nodes)
+        for start_time in (6 * 60, 14 * 60 + 29, 20 * 60):
+            for start in stops:
+                arrival = earliest_arrival_search(monday, {start: start_time}).arrival
+                for goal in stops:
+                    path = self.patterns.route(monday, start, goal, start_time)
+                    found = path[-1][2] if path else None
+                    self.assertEqual(found, arrival.get(goal), (start, goal, start_time))
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, "patterns.json.gz")
+            self.patterns.save(filename)
+            self.assertEqual(TransferPatterns.load(filename).patterns, self.patterns.patterns)
+
+    def test_fallback_for_uncovered_origin(self):
+        start = "Oberderdingen Freibad"
+        goal = "Knittlingen ZOB / Schule"
+        partial = compute_transfer_patterns(self.graph, [goal])
+        self.assertFalse(partial.covers(start))
+        path = find_route_with_patterns(partial, self.graph, start, goal, 14 * 60 + 29, date=0)
+        self.assertEqual(path[0][0], start)
+        self.assertEqual(path[-1][0], goal)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import itertools
+import unittest
+
+from graph import Graph, WALK_LINE
+from routing import find_route, haversine, load_graph_from_csv
+from transfers import compute_footpaths
+
+
+class FootpathTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.graph = load_graph_from_csv("Test_CSV_with_travel_times.csv")
+
+    def test_matches_brute_force(self):
+        radius = 1500.0
+        compute_footpaths(self.graph, radius_m=radius)
+        found = {(s, t) for s, paths in self.graph.footpaths.items() for t, _ in paths}
+        expected = set()
+        for (a, na), (b, nb) in itertools.permutations(self.graph.nodes.items(), 2):
+            if haversine(na.lat, na.lon, nb.lat, nb.lon) * 1000.0 <= radius:
+                expected.add((a, b))
+        self.assertEqual(found, expected)
+
+    def test_route_uses_footpath(self):
+        g = Graph()
+        g.add_edge("A", "B", "1", 10.0, 5.0, 49.0, 8.0, 49.05, 8.0)
+        g.add_edge("C", "D", "2", 20.0, 5.0, 49.0511, 8.0, 49.1, 8.0)
+        self.assertIsNone(find_route(g, "A", "D", 0.0))
+
+        compute_footpaths(g, radius_m=300.0)
+        for reverse, time in ((False, 0.0), (True, 30.0)):
+            path = find_route(g, "A", "D", time, reverse=reverse)
+            self.assertIsNotNone(path)
+            self.assertEqual([p[0] for p in path], ["A", "B", "C", "D"])
+            self.assertEqual(path[2][1], WALK_LINE)
+
+    def test_recompute_drops_old_footpaths(self):
+        g = Graph()
+        g.add_edge("A", "B", "1", 10.0, 5.0, 49.0, 8.0, 49.05, 8.0)
+        g.add_edge("C", "D", "2", 20.0, 5.0, 49.0511, 8.0, 49.1, 8.0)
+        compute_footpaths(g, radius_m=300.0)
+        self.assertIsNotNone(find_route(g, "A", "D", 0.0))
+
+        compute_footpaths(g, radius_m=1.0)
+        self.assertIsNone(find_route(g, "A", "D", 0.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
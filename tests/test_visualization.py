@@ -0,0 +1,46 @@
+import math
+import unittest
+
+from routing import haversine
+from visualization_osmnx import simplify_coords, zoom_tolerance
+
+
+def _distance_to_polyline(point, line):
+    lat, lon = point
+    return min(
+        haversine(lat, lon, a_lat + t * (b_lat - a_lat), a_lon + t * (b_lon - a_lon)) * 1000.0
+        for (a_lat, a_lon), (b_lat, b_lon) in zip(line, line[1:])
+        for t in (i / 50 for i in range(51))
+    )
+
+
+class SimplifyTests(unittest.TestCase):
+    def setUp(self):
+        self.coords = [
+            (49.0 + i * 5e-5, 8.4 + 3e-4 * math.sin(i / 40)) for i in range(400)
+        ]
+
+    def test_straight_line_collapses(self):
+        line = [(49.0 + i * 1e-4, 8.4) for i in range(100)]
+        self.assertEqual(simplify_coords(line, 1.0), [line[0], line[-1]])
+
+    def test_within_tolerance(self):
+        tolerance = zoom_tolerance(15, 49.0)
+        simplified = simplify_coords(self.coords, tolerance)
+        self.assertLess(len(simplified), len(self.coords) / 4)
+        self.assertEqual(simplified[0], self.coords[0])
+        self.assertEqual(simplified[-1], self.coords[-1])
+        for point in self.coords[::7]:
+            self.assertLessEqual(_distance_to_polyline(point, simplified), tolerance * 1.1)
+
+    def test_keeps_leg_boundaries(self):
+        simplified = simplify_coords(self.coords, 50.0, keep=[123, 321])
+        self.assertIn(self.coords[123], simplified)
+        self.assertIn(self.coords[321], simplified)
+
+    def test_zoom_tolerance_halves_per_level(self):
+        self.assertAlmostEqual(zoom_tolerance(14, 49.0), 2 * zoom_tolerance(15, 49.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
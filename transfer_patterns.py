@@ -0,0 +1,399 @@
+"""Transfer patterns: precomputed journey shapes for fast repeated queries.
+
+For an origin stop every earliest-arrival journey of the day is reduced to
+its *transfer pattern*, the sequence of stops where the journey boards,
+alights or walks, e.g. ``A -> X -> B``.  The few distinct patterns per
+destination are computed offline with :func:`compute_transfer_patterns`
+and stored in a gzip-compressed JSON index.
+
+A query combines the patterns of the destination into a small query graph
+whose hops are evaluated against the timetable: a vehicle hop ``X -> Y``
+looks up the next direct trip from ``X`` to ``Y`` in
+:class:`DirectConnections` with a binary search, a walking hop adds the
+footpath time.  Only the few stops of the query graph are visited instead
+of running a full :func:`routing.astar` search.  Origins without patterns
+fall back to :func:`routing.find_route`.
+
+Build an index from the command line with::
+
+    python transfer_patterns.py fahrplan.csv patterns.json.gz [Haltestelle ...]
+"""
+
+import gzip
+import heapq
+import json
+import sys
+import threading
+import weakref
+from bisect import bisect_left
+from operator import attrgetter
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from graph import Day, Edge, Graph, WALK_LINE
+from routing import Path, earliest_arrival_search, find_route, load_graph_from_csv
+
+_departure = attrgetter("departure")
+
+# (stop, reached on foot)
+State = Tuple[str, bool]
+# states from the origin to the destination
+Pattern = Tuple[State, ...]
+# departure, arrival and the stops passed as (stop, line, arrival)
+Hop = Tuple[float, float, Path]
+
+
+def _ride_trip(
+    graph: Graph,
+    source: str,
+    step: Tuple[str, Optional[str], float],
+    ready: float,
+    previous: Optional[str],
+) -> Optional[str]:
+    """Return the trip of the edge that produced ``step`` from ``source``."""
+    target, line, arrival = step
+    edges = graph.nodes[source].edges
+    first = bisect_left(edges, ready, key=_departure) if graph.edges_sorted else 0
+    found = None
+    for edge in edges[first:]:
+        if graph.edges_sorted and edge.departure > arrival:
+            break
+        if (
+            edge.target == target
+            and edge.line == line
+            and edge.departure >= ready
+            and edge.departure + edge.travel_time == arrival
+        ):
+            if previous is not None and edge.trip_id == previous:
+                return previous
+            found = found or edge.trip_id
+    return found
+
+
+def journey_pattern(path: Path, graph: Optional[Graph] = None) -> Pattern:
+    """Return the transfer pattern of a path in the format of ``find_route``.
+
+    Consecutive legs of the same line belong to one vehicle unless ``graph``
+    shows that the path changes between two trips of that line.
+    """
+    pattern = [(path[0][0], False)]
+    current = trip = None
+    for (prev_stop, _, ready), step in zip(path, path[1:]):
+        stop, line, _ = step
+        if line == WALK_LINE:
+            pattern.append((stop, True))
+            current = line
+            continue
+        previous = trip
+        trip = _ride_trip(graph, prev_stop, step, ready, trip) if graph is not None else None
+        if line == current and not pattern[-1][1] and (trip is None or trip == previous):
+            # still on the same vehicle, move the alighting stop
+            pattern[-1] = (stop, False)
+        else:
+            pattern.append((stop, False))
+        current = line
+    return tuple(pattern)
+
+
+def _departure_candidates(graph: Graph, stop: str) -> List[float]:
+    """All times at which a journey from ``stop`` may usefully start."""
+    times = {e.departure for e in graph.neighbors(stop)}
+    for target, walk_time in graph.walking_neighbors(stop):
+        times.update(e.departure - walk_time for e in graph.neighbors(target))
+    return sorted(times)
+
+
+class _RoutePattern:
+    """Trips with the same line and stop sequence that do not overtake."""
+
+    def __init__(self, line: str, stops: Tuple[str, ...]) -> None:
+        self.line = line
+        self.stops = stops
+        self.positions: Dict[str, List[int]] = {}
+        for i, stop in enumerate(stops):
+            self.positions.setdefault(stop, []).append(i)
+        # departures[i][k] / arrivals[i][k]: trip k at stop i
+        self.departures: List[List[float]] = [[] for _ in stops]
+        self.arrivals: List[List[float]] = [[] for _ in stops]
+
+    def accepts(self, times: List[Tuple[float, float]]) -> bool:
+        if not self.departures[0]:
+            return True
+        return all(
+            dep >= self.departures[i][-1] and arr >= self.arrivals[i][-1]
+            for i, (arr, dep) in enumerate(times)
+        )
+
+    def append(self, times: List[Tuple[float, float]]) -> None:
+        for i, (arr, dep) in enumerate(times):
+            self.arrivals[i].append(arr)
+            self.departures[i].append(dep)
+
+
+class DirectConnections:
+    """Next direct trip between two stops of one graph (or day slice)."""
+
+    def __init__(self, graph: Graph) -> None:
+        self.version = graph.version
+        trips: Dict[Any, List[Tuple[str, Edge]]] = {}
+        for name, node in graph.nodes.items():
+            for edge in node.edges:
+                # edges without a trip are single-hop trips of their own
+                key = edge.trip_id if edge.trip_id is not None else (name, id(edge))
+                trips.setdefault(key, []).append((name, edge))
+
+        grouped: Dict[Tuple[str, Tuple[str, ...]], List[List[Tuple[float, float]]]] = {}
+        for legs in trips.values():
+            legs.sort(key=lambda leg: leg[1].departure)
+            stops = tuple(name for name, _ in legs) + (legs[-1][1].target,)
+            # (arrival, departure) per stop of the trip
+            times = [(legs[0][1].departure, legs[0][1].departure)]
+            for i, (_, edge) in enumerate(legs):
+                arrival = edge.departure + edge.travel_time
+                departure = legs[i + 1][1].departure if i + 1 < len(legs) else arrival
+                times.append((arrival, departure))
+            grouped.setdefault((legs[0][1].line, stops), []).append(times)
+
+        self.patterns: List[_RoutePattern] = []
+        self.at_stop: Dict[str, List[Tuple[_RoutePattern, int]]] = {}
+        for (line, stops), timetables in grouped.items():
+            timetables.sort(key=lambda times: times[0][1])
+            groups: List[_RoutePattern] = []
+            for times in timetables:
+                group = next((g for g in groups if g.accepts(times)), None)
+                if group is None:
+                    group = _RoutePattern(line, stops)
+                    groups.append(group)
+                group.append(times)
+            for group in groups:
+                self.patterns.append(group)
+                for i, stop in enumerate(stops[:-1]):
+                    self.at_stop.setdefault(stop, []).append((group, i))
+
+    def connection(self, source: str, target: str, t: float) -> Optional[Hop]:
+        """Return the earliest direct trip from ``source`` to ``target`` after ``t``.
+
+        The result is ``(departure, arrival, steps)``, where ``steps`` lists
+        the stops passed after ``source`` as ``(stop, line, arrival)``.
+        """
+        best: Optional[Tuple[float, _RoutePattern, int, int, int]] = None
+        for pattern, i in self.at_stop.get(source, ()):
+            later = [j for j in pattern.positions.get(target, ()) if j > i]
+            if not later:
+                continue
+            k = bisect_left(pattern.departures[i], t)
+            if k == len(pattern.departures[i]):
+                continue
+            arrival = pattern.arrivals[later[0]][k]
+            if best is None or arrival < best[0]:
+                best = (arrival, pattern, k, i, later[0])
+        if best is None:
+            return None
+        arrival, pattern, k, i, j = best
+        steps = [
+            (pattern.stops[p], pattern.line, pattern.arrivals[p][k]) for p in range(i + 1, j + 1)
+        ]
+        return pattern.departures[i][k], arrival, steps
+
+
+_connections: "weakref.WeakKeyDictionary[Graph, DirectConnections]" = weakref.WeakKeyDictionary()
+_connections_lock = threading.Lock()
+_MAX_CONNECTIONS = 4
+
+
+def connections_for(graph: Graph) -> DirectConnections:
+    """Return the direct-connection index of ``graph``, rebuilt after changes.
+
+    Graphs are referenced weakly, like in :func:`search_context.context_for`.
+    """
+    with _connections_lock:
+        index = _connections.pop(graph, None)
+        if index is None or index.version != graph.version:
+            index = DirectConnections(graph)
+        _connections[graph] = index
+        while len(_connections) > _MAX_CONNECTIONS:
+            del _connections[next(iter(_connections))]
+        return index
+
+
+class TransferPatterns:
+    """Transfer patterns per origin and destination."""
+
+    def __init__(self, patterns: Dict[str, Dict[str, List[Pattern]]]) -> None:
+        self.patterns = patterns
+
+    def covers(self, origin: str) -> bool:
+        return origin in self.patterns
+
+    def query_graph(self, start: str, goal: str) -> Dict[State, Set[State]]:
+        """Return the hops of all patterns from ``start`` to ``goal``.
+
+        Stops are kept apart by whether they were reached on foot, so that
+        merged patterns never chain two footpaths.
+        """
+        hops: Dict[State, Set[State]] = {}
+        for pattern in self.patterns.get(start, {}).get(goal, ()):
+            for state, nxt in zip(pattern, pattern[1:]):
+                hops.setdefault(state, set()).add(nxt)
+        return hops
+
+    def route(self, graph: Graph, start: str, goal: str, start_minutes: float) -> Optional[Path]:
+        """Evaluate the query graph of ``start`` and ``goal`` on ``graph``.
+
+        Returns the earliest-arrival path in the format of
+        :func:`routing.find_route` or ``None``.
+        """
+        if start == goal:
+            return [(start, None, start_minutes)]
+        hops = self.query_graph(start, goal)
+        if not hops:
+            return None
+        connections = connections_for(graph)
+        origin = (start, False)
+        arrival = {origin: start_minutes}
+        parents: Dict[State, Tuple[State, Path]] = {}
+        heap = [(start_minutes, origin)]
+        done = set()
+        reached = None
+        while heap:
+            t, state = heapq.heappop(heap)
+            if state in done:
+                continue
+            done.add(state)
+            stop = state[0]
+            if stop == goal:
+                reached = state
+                break
+            for target in hops.get(state, ()):
+                if target[1]:
+                    walk = [w for s, w in graph.walking_neighbors(stop) if s == target[0]]
+                    if not walk:
+                        continue
+                    arr = t + min(walk)
+                    steps: Path = [(target[0], WALK_LINE, arr)]
+                else:
+                    hop = connections.connection(stop, target[0], t)
+                    if hop is None:
+                        continue
+                    _, arr, steps = hop
+                if arr < arrival.get(target, float("inf")):
+                    arrival[target] = arr
+                    parents[target] = (state, steps)
+                    heapq.heappush(heap, (arr, target))
+
+        if reached is None:
+            return None
+        path: Path = []
+        state = reached
+        while state != origin:
+            state, steps = parents[state]
+            path[:0] = steps
+        return [(start, None, start_minutes)] + path
+
+    def save(self, filename: str) -> None:
+        """Write the index as gzip-compressed JSON with numbered stops."""
+        stops = set(self.patterns)
+        for targets in self.patterns.values():
+            for patterns in targets.values():
+                stops.update(stop for pattern in patterns for stop, _ in pattern)
+        names = sorted(stops)
+        number = {stop: i for i, stop in enumerate(names)}
+
+        def encode(pattern: Pattern) -> List[int]:
+            # stops reached on foot are stored as the negative number minus one
+            return [~number[stop] if walked else number[stop] for stop, walked in pattern]
+
+        data = {
+            "stops": names,
+            "patterns": {
+                number[origin]: {
+                    number[goal]: [encode(p) for p in patterns]
+                    for goal, patterns in targets.items()
+                }
+                for origin, targets in self.patterns.items()
+            },
+        }
+        with gzip.open(filename, "wt", encoding="utf-8") as fh:
+            json.dump(data, fh, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, filename: str) -> "TransferPatterns":
+        with gzip.open(filename, "rt", encoding="utf-8") as fh:
+            data = json.load(fh)
+        stops = data["stops"]
+        patterns = {
+            stops[int(origin)]: {
+                stops[int(goal)]: [
+                    tuple((stops[~n], True) if n < 0 else (stops[n], False) for n in p) for p in ps
+                ]
+                for goal, ps in targets.items()
+            }
+            for origin, targets in data["patterns"].items()
+        }
+        return cls(patterns)
+
+
+def compute_transfer_patterns(
+    graph: Graph,
+    origins: Optional[Iterable[str]] = None,
+    days: Iterable[Day] = range(7),
+) -> TransferPatterns:
+    """Compute the transfer patterns of ``origins`` (default: all stops).
+
+    One earliest-arrival search is run per origin and useful departure time
+    on every distinct day slice of ``days``.  Only journeys not dominated by
+    a later departure arriving as early contribute a pattern.
+    """
+    slices = {id(s): s for s in (graph.for_day(day) for day in days)}
+    if not graph.services:
+        slices = {id(graph): graph}
+    origins = list(origins) if origins is not None else list(graph.nodes)
+    patterns: Dict[str, Dict[str, List[Pattern]]] = {}
+    for origin in origins:
+        found: Dict[str, Set[Pattern]] = {}
+        for day_graph in slices.values():
+            best: Dict[str, float] = {}
+            for dep in reversed(_departure_candidates(day_graph, origin)):
+                tree = earliest_arrival_search(day_graph, {origin: dep})
+                for target, arr in tree.arrival.items():
+                    if target == origin or arr >= best.get(target, float("inf")):
+                        continue
+                    best[target] = arr
+                    pattern = journey_pattern(tree.path(target), day_graph)
+                    found.setdefault(target, set()).add(pattern)
+        # walking does not depend on the time and needs no search
+        for target, _ in graph.walking_neighbors(origin):
+            found.setdefault(target, set()).add(((origin, False), (target, True)))
+        patterns[origin] = {target: sorted(ps) for target, ps in found.items()}
+    return TransferPatterns(patterns)
+
+
+def find_route_with_patterns(
+    index: TransferPatterns,
+    graph: Graph,
+    start: str,
+    goal: str,
+    start_minutes: float,
+    *,
+    date: Optional[Day] = None,
+    **kwargs: Any,
+) -> Optional[Path]:
+    """Answer a forward earliest-arrival query from the transfer patterns.
+
+    Uncovered origins, other sort modes or reverse searches (``kwargs``)
+    and queries the patterns cannot answer use :func:`routing.find_route`.
+    """
+    if index.covers(start) and not kwargs:
+        searched = graph.for_day(date) if date is not None else graph
+        path = index.route(searched, start, goal, start_minutes)
+        if path is not None:
+            return path
+    return find_route(graph, start, goal, start_minutes, date=date, **kwargs)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Aufruf: python transfer_patterns.py FAHRPLAN.csv INDEX.json.gz [HALTESTELLE ...]")
+        sys.exit(1)
+    timetable = load_graph_from_csv(sys.argv[1])
+    selected = sys.argv[3:] or None
+    compute_transfer_patterns(timetable, selected).save(sys.argv[2])
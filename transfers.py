@@ -0,0 +1,115 @@
+"""Precompute walking transfers between nearby stops.
+
+Stops are bucketed into a grid whose cells are as large as the search
+radius, so every stop is only compared with the stops of the neighbouring
+cells.  This keeps the preprocessing close to linear in
+the number of stops instead of comparing all pairs.
+"""
+
+from collections import defaultdict
+from math import cos, radians
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from graph import Graph
+from routing import haversine
+
+# Metres per degree of latitude
+_M_PER_DEG = 111_320.0
+
+Cell = Tuple[int, int]
+
+
+class StopGrid:
+    """Uniform lat/lon grid for radius queries over stop coordinates."""
+
+    def __init__(self, cell_size_m: float, ref_lat: float = 49.0) -> None:
+        self.cell_size_m = cell_size_m
+        self.lat_step = cell_size_m / _M_PER_DEG
+        self.lon_step = cell_size_m / (_M_PER_DEG * max(cos(radians(ref_lat)), 0.01))
+        self.cells: Dict[Cell, List[Tuple[str, float, float]]] = defaultdict(list)
+
+    @classmethod
+    def from_graph(cls, graph: Graph, cell_size_m: float) -> "StopGrid":
+        lats = [n.lat for n in graph.nodes.values() if n.lat is not None]
+        ref_lat = sum(lats) / len(lats) if lats else 49.0
+        grid = cls(cell_size_m, ref_lat)
+        for name, node in graph.nodes.items():
+            if node.lat is not None and node.lon is not None:
+                grid.insert(name, node.lat, node.lon)
+        return grid
+
+    def _cell(self, lat: float, lon: float) -> Cell:
+        return int(lat // self.lat_step), int(lon // self.lon_step)
+
+    def insert(self, name: str, lat: float, lon: float) -> None:
+        self.cells[self._cell(lat, lon)].append((name, lat, lon))
+
+    def within(self, lat: float, lon: float, radius_m: float) -> Iterator[Tuple[str, float]]:
+        """Yield ``(stop, distance_m)`` for all stops within ``radius_m``."""
+        reach = int(radius_m // self.cell_size_m) + 1
+        row, col = self._cell(lat, lon)
+        for dr in range(-reach, reach + 1):
+            for dc in range(-reach, reach + 1):
+                for name, s_lat, s_lon in self.cells.get((row + dr, col + dc), ()):
+                    dist = haversine(lat, lon, s_lat, s_lon) * 1000.0
+                    if dist <= radius_m:
+                        yield name, dist
+
+
+def _network_distances(
+    graph: Graph, walk_network: Any, radius_m: float
+) -> Tuple[Dict[str, Any], Dict[str, Dict[Any, float]]]:
+    """Return each stop's nearest OSM node and the walking distances from it."""
+    import networkx as nx
+    import osmnx as ox
+
+    names = [n for n, node in graph.nodes.items() if node.lat is not None and node.lon is not None]
+    lats = [graph.nodes[n].lat for n in names]
+    lons = [graph.nodes[n].lon for n in names]
+    stop_nodes = dict(zip(names, ox.nearest_nodes(walk_network, lons, lats)))
+    lengths = {
+        name: nx.single_source_dijkstra_path_length(
+            walk_network, osm_node, cutoff=radius_m, weight="length"
+        )
+        for name, osm_node in stop_nodes.items()
+    }
+    return stop_nodes, lengths
+
+
+def compute_footpaths(
+    graph: Graph,
+    radius_m: float = 400.0,
+    walk_speed_kmh: float = 4.5,
+    walk_network: Optional[Any] = None,
+) -> int:
+    """Add footpaths between all stops within ``radius_m`` of each other.
+
+    Without ``walk_network`` the straight-line distance is used.  If an OSM
+    walk network (e.g. loaded via ``ox.load_graphml``) is passed, the walking
+    distance along the network is used instead and pairs further apart than
+    ``radius_m`` on the network are dropped.  Existing footpaths are
+    replaced.  Returns the number of footpaths added.
+    """
+    graph.footpaths.clear()
+    grid = StopGrid.from_graph(graph, radius_m)
+    network = None
+    if walk_network is not None:
+        network = _network_distances(graph, walk_network, radius_m)
+    metres_per_minute = walk_speed_kmh * 1000.0 / 60.0
+
+    count = 0
+    for cell in grid.cells.values():
+        for name, lat, lon in cell:
+            for other, dist in grid.within(lat, lon, radius_m):
+                if other == name:
+                    continue
+                if network is not None:
+                    stop_nodes, lengths = network
+                    dist = lengths[name].get(stop_nodes[other])
+                    if dist is None:
+                        continue
+                graph.add_footpath(name, other, dist / metres_per_minute)
+                count += 1
+    # also when no footpath was added, the old ones are gone
+    graph.touch()
+    return count
@@ -1,10 +1,81 @@
-from typing import List, Tuple, Optional
+import json
+import os
+from math import cos, radians
+from typing import List, Tuple, Optional, Sequence
 
 import folium
 
 from graph import Graph
 from routing import minutes_to_hhmm
 
+# Metres per degree of latitude
+_M_PER_DEG = 111_320.0
+
+
+def zoom_tolerance(zoom: int, lat: float, pixels: float = 1.0) -> float:
+    """Return the ground distance in metres covered by ``pixels`` at ``zoom``."""
+    return pixels * 156_543.03 * cos(radians(lat)) / (2 ** zoom)
+
+
+def simplify_coords(
+    coords: Sequence[Tuple[float, float]],
+    tolerance_m: float,
+    keep: Sequence[int] = (),
+) -> List[Tuple[float, float]]:
+    """Simplify a polyline with the Douglas-Peucker algorithm.
+
+    Points deviating less than ``tolerance_m`` metres from the simplified
+    line are dropped.  The first and last point and all indices in ``keep``
+    (e.g. leg boundaries) are always retained.
+    """
+    n = len(coords)
+    if n < 3 or tolerance_m <= 0:
+        return list(coords)
+
+    # project to a local plane in metres
+    lat0 = coords[0][0]
+    kx = _M_PER_DEG * cos(radians(lat0))
+    xs = [lon * kx for _, lon in coords]
+    ys = [lat * _M_PER_DEG for lat, _ in coords]
+
+    marked = [False] * n
+    anchors = sorted({0, n - 1, *(i for i in keep if 0 <= i < n)})
+    for i in anchors:
+        marked[i] = True
+
+    tol2 = tolerance_m * tolerance_m
+    stack = list(zip(anchors, anchors[1:]))
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        ax, ay = xs[first], ys[first]
+        dx, dy = xs[last] - ax, ys[last] - ay
+        seg2 = dx * dx + dy * dy
+        best, best_d2 = -1, tol2
+        for i in range(first + 1, last):
+            px, py = xs[i] - ax, ys[i] - ay
+            if seg2 == 0:
+                d2 = px * px + py * py
+            else:
+                cross = px * dy - py * dx
+                d2 = cross * cross / seg2
+            if d2 > best_d2:
+                best, best_d2 = i, d2
+        if best >= 0:
+            marked[best] = True
+            stack.append((first, best))
+            stack.append((best, last))
+
+    return [c for c, m in zip(coords, marked) if m]
+
+
+def _round_coords(
+    coords: Sequence[Tuple[float, float]], precision: int
+) -> List[Tuple[float, float]]:
+    return [(round(lat, precision), round(lon, precision)) for lat, lon in coords]
+
+
 def save_route_map(
     graph: Graph,
     path: List[Tuple[str, Optional[str], float]],
@@ -48,23 +119,109 @@ def save_coords_map(
     coords: List[Tuple[float, float]],
     filename: str = "osm_route_map.html",
     network_type: str = "drive",
+    *,
+    leg_boundaries: Sequence[int] = (),
+    detail_zoom: Optional[int] = 16,
+    precision: int = 5,
 ) -> Optional[str]:
     """Save a coordinate path as an interactive HTML map.
 
-    The provided coordinates are drawn directly as a polyline. The parameter
-    ``network_type`` is kept for API compatibility but no longer influences the
-    output.
+    The polyline is simplified with :func:`simplify_coords` so that it looks
+    unchanged up to ``detail_zoom`` (``None`` disables the simplification),
+    and coordinates are rounded to ``precision`` decimals (5 is about 1 m).
+    Markers are only drawn at the start, the end and the indices given in
+    ``leg_boundaries``. The parameter ``network_type`` is kept for API
+    compatibility but no longer influences the output.
     """
 
     if not coords:
         return None
 
-    m = folium.Map(location=coords[0], zoom_start=13)
-    folium.PolyLine(coords, color="blue").add_to(m)
+    line = coords
+    if detail_zoom is not None:
+        line = simplify_coords(coords, zoom_tolerance(detail_zoom, coords[0][0]), leg_boundaries)
+    line = _round_coords(line, precision)
 
-    for lat, lon in coords:
-        folium.Marker([lat, lon]).add_to(m)
+    m = folium.Map(location=line[0], zoom_start=13)
+    folium.PolyLine(line, color="blue").add_to(m)
+
+    last = len(coords) - 1
+    for i in sorted({0, last, *(i for i in leg_boundaries if 0 <= i <= last)}):
+        lat, lon = coords[i]
+        folium.Marker([round(lat, precision), round(lon, precision)]).add_to(m)
 
     m.save(filename)
     return filename
 
+
+_GEOJSON_LOADER = """
+fetch(%(url)s)
+    .then(function (response) { return response.text(); })
+    .then(function (text) {
+        var features;
+        if (%(ndjson)s) {
+            features = text.split("\\n").filter(function (line) {
+                return line.trim().length > 0;
+            }).map(JSON.parse);
+        } else {
+            features = JSON.parse(text).features;
+        }
+        var layer = L.geoJSON(features, {
+            style: function () { return {color: "blue", weight: 2, opacity: 0.6}; },
+            onEachFeature: function (feature, layer) {
+                var p = feature.properties || {};
+                var label = p.mode || "";
+                if (p.stops) {
+                    label = p.stops[0] + " " + p.departure + " \\u2192 "
+                        + p.stops[p.stops.length - 1] + " " + p.arrival;
+                } else if (p.travel_time_min !== undefined) {
+                    label += " " + p.travel_time_min + " min";
+                }
+                layer.bindTooltip(label);
+            }
+        }).addTo(%(map)s);
+        if (%(fit)s) {
+            %(map)s.fitBounds(layer.getBounds());
+        }
+    });
+"""
+
+
+def save_geojson_map(
+    data_file: str,
+    filename: str = "routes_map.html",
+    bbox: Optional[Sequence[float]] = None,
+    fmt: Optional[str] = None,
+) -> str:
+    """Save a map that loads exported routes from ``data_file`` at runtime.
+
+    ``data_file`` is a file written by :mod:`export_geojson` (GeoJSON or
+    NDJSON).  It is referenced by a relative URL and not embedded, so the
+    HTML file stays small regardless of the number of routes.  ``bbox``
+    (``west, south, east, north``, e.g. ``FeatureWriter.bbox``) sets the
+    initial view; without it the map zooms to the routes once loaded.
+    ``fmt`` is the format of the file (``FeatureWriter.fmt``); without it
+    the format is derived from the extension like in ``FeatureWriter``.
+    Browsers usually block loading local files, so serve the directory e.g.
+    with ``python -m http.server``.
+    """
+    url = os.path.relpath(data_file, os.path.dirname(os.path.abspath(filename)))
+    url = url.replace(os.sep, "/")
+    if fmt is None:
+        fmt = "ndjson" if data_file.endswith((".ndjson", ".jsonl")) else "geojson"
+    ndjson = fmt == "ndjson"
+
+    m = folium.Map(location=[0, 0], zoom_start=2)
+    if bbox is not None:
+        west, south, east, north = bbox
+        m.fit_bounds([[south, west], [north, east]])
+
+    script = _GEOJSON_LOADER % {
+        "url": json.dumps(url),
+        "ndjson": "true" if ndjson else "false",
+        "map": m.get_name(),
+        "fit": "false" if bbox is not None else "true",
+    }
+    m.get_root().script.add_child(folium.Element(script))
+    m.save(filename)
+    return filename